@@ -0,0 +1,101 @@
+"""
+Benchmark the batched augmentation against the per-sample albumentations pipeline.
+
+Both pipelines pad to 151 pixels, center-crop, rotate by a random angle and
+normalize batches of random 150x150 uint8 images, as in the finetuning
+notebook. Run with::
+
+    python -m benchmarks.augmentation --batch-size 64 --batches 20
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import argparse
+import time
+
+import albumentations
+import cv2
+import numpy as np
+import torch
+from albumentations.pytorch import ToTensorV2
+
+from rgc.utils.augmentation import BatchAugmentation
+from rgc.utils.datasets import Transforms
+
+MEAN, STD, SIZE = 0.0032, 0.0376, 151
+
+
+TRANSFORM = Transforms(
+    albumentations.Compose([
+        albumentations.PadIfNeeded(min_height=SIZE, min_width=SIZE, border_mode=cv2.BORDER_CONSTANT, fill=0),
+        albumentations.CenterCrop(height=SIZE, width=SIZE),
+        albumentations.Affine(rotate=(-360, 360), interpolation=cv2.INTER_LINEAR),
+        albumentations.Normalize(mean=(MEAN), std=(STD)),
+        ToTensorV2(),
+    ])
+)
+
+
+def per_sample(images: np.ndarray) -> torch.Tensor:
+    """
+    Augment a batch with the albumentations pipeline, one image at a time.
+
+    :param images: The images of shape (N, 150, 150).
+    :type images: np.ndarray
+
+    :return: The augmented batch.
+    :rtype: torch.Tensor
+    """
+    return torch.stack([TRANSFORM(img) for img in images])
+
+
+def measure(func, batches: list, repeat: int = 3) -> float:
+    """
+    Measure the best mean time per batch of a function over several runs.
+
+    :return: The time per batch in seconds.
+    :rtype: float
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for batch in batches:
+            func(batch)
+        best = min(best, (time.perf_counter() - start) / len(batches))
+    return best
+
+
+def main() -> None:
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=1, help="Torch intra-op threads, 1 matches a DataLoader worker.")
+    parser.add_argument("--device", default="cpu")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    rng = np.random.default_rng(0)
+    batches = [rng.integers(0, 256, size=(args.batch_size, 150, 150), dtype=np.uint8) for _ in range(args.batches)]
+    tensors = [torch.from_numpy(batch).to(args.device) for batch in batches]
+
+    augmentation = BatchAugmentation(SIZE, mean=MEAN, std=STD)
+
+    def batched(images: torch.Tensor) -> None:
+        augmentation(images)
+        if images.is_cuda:
+            torch.cuda.synchronize()
+
+    baseline = measure(per_sample, batches)
+    vectorized = measure(batched, tensors)
+
+    print(f"batch size {args.batch_size}, {args.threads} thread(s), device {args.device}")
+    print(f"per-sample albumentations: {baseline * 1e3:8.2f} ms/batch")
+    print(f"BatchAugmentation:         {vectorized * 1e3:8.2f} ms/batch ({baseline / vectorized:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark the epoch start-up latency of the DataModules with and without persistent workers.
+
+The latency is the time from starting an epoch to receiving its first
+batch, measured over several epochs of a synthetic in-memory dataset of
+150x150 uint8 images with the augmentation of the finetuning notebook. Run
+with::
+
+    python -m benchmarks.datamodule_startup --workers 2 --epochs 5
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import argparse
+import time
+from typing import Optional
+
+import albumentations
+import cv2
+import numpy as np
+from albumentations.pytorch import ToTensorV2
+from torch.utils.data import Dataset
+
+from rgc.utils.datamodules import RadioGalaxyDataModule
+from rgc.utils.datasets import Transforms, _transform_image
+
+TRANSFORM = albumentations.Compose([
+    albumentations.PadIfNeeded(min_height=151, min_width=151, border_mode=cv2.BORDER_CONSTANT, fill=0),
+    albumentations.CenterCrop(height=151, width=151),
+    albumentations.Affine(rotate=(-360, 360), interpolation=cv2.INTER_LINEAR),
+    albumentations.Normalize(mean=(0.0032), std=(0.0376)),
+    ToTensorV2(),
+])
+
+
+class SyntheticDataset(Dataset):
+    """
+    Random uint8 images with random binary targets, held in memory.
+    """
+
+    def __init__(self, size: int, transform: Transforms) -> None:
+        """
+        Generate the images and targets.
+        """
+        rng = np.random.default_rng(0)
+        self.data = rng.integers(0, 256, size=(size, 150, 150, 1), dtype=np.uint8)
+        self.targets = rng.integers(0, 2, size=size)
+        self.transform = transform
+
+    def __getitem__(self, index: int):
+        """
+        Get a transformed image and its target.
+        """
+        return _transform_image(self.transform, self.data[index]), self.targets[index]
+
+    def __len__(self) -> int:
+        """
+        Get the number of images.
+        """
+        return len(self.data)
+
+
+class SyntheticDataModule(RadioGalaxyDataModule):
+    """
+    A DataModule over :class:`SyntheticDataset`.
+    """
+
+    size = 1024
+
+    def _dataset(self, train: bool, transform: Optional[albumentations.Compose]) -> SyntheticDataset:
+        """
+        Build a synthetic split.
+        """
+        return SyntheticDataset(self.size, Transforms(transforms=transform))
+
+
+def startup_latencies(persistent_workers: bool, workers: int, epochs: int, batch_size: int) -> list[float]:
+    """
+    Measure the time to the first batch of every training epoch.
+
+    :return: The latency of every epoch in seconds.
+    :rtype: list[float]
+    """
+    datamodule = SyntheticDataModule(
+        "", batch_size=batch_size, num_workers=workers, transform=TRANSFORM, persistent_workers=persistent_workers
+    )
+    datamodule.setup("fit")
+    loader = datamodule.train_dataloader()
+
+    latencies = []
+    for _ in range(epochs):
+        start = time.perf_counter()
+        iterator = iter(loader)
+        next(iterator)
+        latencies.append(time.perf_counter() - start)
+        for _ in iterator:
+            pass
+    return latencies
+
+
+def main() -> None:
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{args.workers} worker(s), {args.epochs} epochs of {SyntheticDataModule.size} images")
+    for persistent_workers in (False, True):
+        latencies = startup_latencies(persistent_workers, args.workers, args.epochs, args.batch_size)
+        later = np.mean(latencies[1:]) if len(latencies) > 1 else float("nan")
+        print(
+            f"persistent_workers={persistent_workers!s:5}: first epoch {latencies[0] * 1e3:7.1f} ms, "
+            f"later epochs {later * 1e3:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
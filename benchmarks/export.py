@@ -0,0 +1,94 @@
+"""
+Benchmark the plain-PyTorch export of DSteerableLeNet against the e2cnn model.
+
+Measures the CPU latency per batch of the e2cnn model in evaluation mode, of
+its export and of the TorchScript-compiled export, and the time a fresh
+interpreter takes to import e2cnn or to load the scripted export, which needs
+torch only. Run with::
+
+    python -m benchmarks.export --batch-sizes 1 16 --threads 1
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import torch
+
+from rgc.models.dstreeablelenet import DSteerableLeNet
+
+
+def latency(model: torch.nn.Module, images: torch.Tensor, repeat: int = 10) -> float:
+    """
+    Measure the best time of a forward pass over several runs.
+
+    :return: The latency in seconds.
+    :rtype: float
+    """
+    best = float("inf")
+    with torch.no_grad():
+        model(images)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model(images)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def startup(code: str) -> float:
+    """
+    Measure the wall time of running code in a fresh interpreter.
+
+    :return: The time in seconds.
+    :rtype: float
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)  # noqa: S603
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--imsize", type=int, default=151)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    model = DSteerableLeNet(imsize=args.imsize).eval()
+    exported = model.export()
+    scripted = torch.jit.script(exported)
+
+    print(f"{args.threads} thread(s), image size {args.imsize}")
+    for batch_size in args.batch_sizes:
+        images = torch.randn(batch_size, 1, args.imsize, args.imsize)
+        eager = latency(model, images)
+        plain = latency(exported, images)
+        compiled = latency(scripted, images)
+        print(
+            f"batch {batch_size:4d}: e2cnn {eager * 1e3:8.2f} ms, export {plain * 1e3:8.2f} ms "
+            f"({eager / plain:.1f}x), scripted {compiled * 1e3:8.2f} ms ({eager / compiled:.1f}x)"
+        )
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "model.pt")
+        torch.jit.save(scripted, path)
+        torch_only = startup("import torch")
+        e2cnn = startup("import torch, e2cnn")
+        serve = startup(f"import sys, torch; torch.jit.load({path!r}); assert 'e2cnn' not in sys.modules")
+
+    print(f"import torch: {torch_only:.2f} s, import torch and e2cnn: {e2cnn:.2f} s")
+    print(f"import torch and load the scripted export: {serve:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark onnxruntime inference of DSteerableLeNet against the PyTorch models.
+
+Measures the CPU latency and throughput at several batch sizes of the e2cnn
+model in evaluation mode, of its plain-PyTorch export and of the exported
+ONNX graph run by onnxruntime, with the same number of intra-op threads for
+PyTorch and onnxruntime. Run with::
+
+    python -m benchmarks.onnx_inference --batch-sizes 1 16 256 --threads 1
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Any, Callable
+
+import numpy as np
+import torch
+
+from rgc.models.dstreeablelenet import DSteerableLeNet
+from rgc.models.inference import OnnxModel, export_onnx
+
+
+def latency(run: Callable[[Any], object], inputs: Any, repeat: int) -> float:
+    """
+    Measure the best time of a call over several runs, after a warm-up call.
+
+    :return: The latency in seconds.
+    :rtype: float
+    """
+    run(inputs)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(inputs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 256])
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--imsize", type=int, default=151)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    model = DSteerableLeNet(imsize=args.imsize).eval()
+    exported = model.export()
+
+    with tempfile.TemporaryDirectory() as folder:
+        onnx_model = OnnxModel(
+            export_onnx(model, os.path.join(folder, "model.onnx")),
+            intra_op_num_threads=args.threads,
+            inter_op_num_threads=1,
+        )
+
+        print(f"{args.threads} thread(s), image size {args.imsize}")
+        for batch_size in args.batch_sizes:
+            images = np.random.default_rng(0).standard_normal((batch_size, 1, args.imsize, args.imsize), np.float32)
+            tensor = torch.from_numpy(images)
+            with torch.no_grad():
+                timings = {
+                    "e2cnn": latency(model, tensor, args.repeat),
+                    "export": latency(exported, tensor, args.repeat),
+                    "onnxruntime": latency(onnx_model, images, args.repeat),
+                }
+            print(
+                f"batch {batch_size:4d}: "
+                + ", ".join(
+                    f"{name} {seconds * 1e3:9.1f} ms ({batch_size / seconds:6.1f} img/s)"
+                    for name, seconds in timings.items()
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
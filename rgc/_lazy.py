@@ -0,0 +1,90 @@
+"""
+Lazy imports for heavy optional dependencies.
+
+Modules such as ``bdsf``, ``torch`` or ``astropy`` take seconds to import. The
+:class:`LazyImport` proxy defers the import until the first attribute access or
+call, so importing :mod:`rgc` and its worker processes stays fast when those
+dependencies are not used.
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import importlib
+from typing import Any, Optional
+
+
+class LazyImport:
+    """
+    A proxy for a module, or an attribute of a module, imported on first use.
+
+    Attribute reads, writes and deletions as well as calls are forwarded to the
+    imported object, so ``unittest.mock.patch`` works through the proxy.
+    """
+
+    def __init__(self, module: str, attribute: Optional[str] = None) -> None:
+        """
+        Initialize the proxy.
+
+        :param module: The name of the module to import e.g. 'astropy.io.fits'.
+        :type module: str
+
+        :param attribute: The attribute of the module to proxy e.g. 'SkyCoord'.
+        :type attribute: Optional[str]
+        """
+        object.__setattr__(self, "_module", module)
+        object.__setattr__(self, "_attribute", attribute)
+        object.__setattr__(self, "_target", None)
+
+    def _load(self) -> Any:
+        """
+        Import the proxied object.
+
+        :return: The imported module or attribute.
+        :rtype: Any
+        """
+        target = object.__getattribute__(self, "_target")
+        if target is None:
+            target = importlib.import_module(object.__getattribute__(self, "_module"))
+            attribute = object.__getattribute__(self, "_attribute")
+            if attribute is not None:
+                target = getattr(target, attribute)
+            object.__setattr__(self, "_target", target)
+        return target
+
+    def __getattr__(self, name: str) -> Any:
+        """
+        Get an attribute of the proxied object.
+        """
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """
+        Set an attribute of the proxied object.
+        """
+        setattr(self._load(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        """
+        Delete an attribute of the proxied object.
+        """
+        delattr(self._load(), name)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        """
+        Call the proxied object.
+        """
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        """
+        Get the representation of the proxy.
+
+        :return: The representation of the proxy.
+        :rtype: str
+        """
+        name = object.__getattribute__(self, "_module")
+        attribute = object.__getattribute__(self, "_attribute")
+        if attribute is not None:
+            name = f"{name}.{attribute}"
+        return f"<lazy import {name!r}>"
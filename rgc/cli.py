@@ -0,0 +1,283 @@
+"""
+Command-line interface for the preprocessing utilities.
+
+The ``rgc`` command exposes the bulk functions of :mod:`rgc.utils.data` as
+subcommands so batch jobs can run them in parallel without glue code. Every run
+ends with a throughput and latency summary.
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+from contextlib import nullcontext
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from rgc.utils import data, metrics
+
+
+def _parse_classes(pairs: Optional[list[str]]) -> Optional[dict]:
+    """
+    Parse class labels given as ``NAME=LABEL`` pairs.
+
+    :param pairs: The class label pairs.
+    :type pairs: Optional[list[str]]
+
+    :return: A dictionary mapping class names to labels.
+    :rtype: Optional[dict]
+    """
+    if not pairs:
+        return None
+    return dict(pair.split("=", 1) for pair in pairs)
+
+
+def _read_catalog(catalog: str, vizier: bool) -> pd.DataFrame:  # type: ignore[no-any-unimported, unused-ignore]
+    """
+    Read a catalog from a CSV file or from VizieR.
+
+    :param catalog: The path to the CSV file, or the VizieR catalog name.
+    :type catalog: str
+
+    :param vizier: If True, fetches the catalog from VizieR.
+    :type vizier: bool
+
+    :return: The catalog.
+    :rtype: pd.DataFrame
+    """
+    if vizier:
+        return data.catalog_quest(catalog)
+    return pd.read_csv(catalog)
+
+
+def _capture(args: argparse.Namespace) -> data.BulkSummary:
+    """
+    Run the capture subcommand.
+    """
+    catalog = _read_catalog(args.catalog, args.vizier)
+    return data.celestial_capture_bulk(
+        catalog,
+        args.survey,
+        args.img_dir,
+        _parse_classes(args.classes),
+        args.cls_col,
+        workers=args.workers,
+        resume=args.resume,
+        retries=args.retries,
+    )
+
+
+def _mask(args: argparse.Namespace) -> Optional[data.BulkSummary]:
+    """
+    Run the mask subcommand.
+    """
+    catalog = _read_catalog(args.catalog, args.vizier)
+    return data.generate_mask_bulk(
+        catalog,
+        args.img_dir,
+        args.mask_dir,
+        args.freq,
+        tuple(args.beam),
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        resume=args.resume,
+    )
+
+
+def _convert(args: argparse.Namespace) -> data.BulkSummary:
+    """
+    Run the convert subcommand.
+    """
+    clip = tuple(args.clip) if args.clip else None
+    if args.clip_percentiles:
+        clip = data.fits_clip_bounds(
+            args.fits_dir,
+            tuple(args.clip_percentiles),
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+        )
+        print(f"Clipping to [{clip[0]:.6g}, {clip[1]:.6g}]")
+
+    return data.fits_to_png_bulk(
+        args.fits_dir,
+        args.png_dir,
+        tuple(args.img_size) if args.img_size else None,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        resume=args.resume,
+        clip=clip,
+    )
+
+
+def _apply_mask(args: argparse.Namespace) -> data.BulkSummary:
+    """
+    Run the apply-mask subcommand.
+    """
+    return data.mask_image_bulk(
+        args.image_dir,
+        args.mask_dir,
+        args.masked_dir,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        resume=args.resume,
+    )
+
+
+def format_summary(summary: data.BulkSummary) -> str:
+    """
+    Format the throughput and latency summary of a bulk operation.
+
+    :param summary: The summary of the operation.
+    :type summary: data.BulkSummary
+
+    :return: A human readable summary.
+    :rtype: str
+    """
+    processed = len(summary.latencies)
+    throughput = processed / summary.wall_time if summary.wall_time > 0 else 0.0
+
+    lines = [
+        f"Items: {summary.total} total, {processed - summary.failed} succeeded, "
+        f"{summary.failed} failed, {summary.skipped} skipped",
+        f"Wall time: {summary.wall_time:.2f} s, throughput: {throughput:.2f} items/s",
+    ]
+    if processed:
+        latencies = np.asarray(summary.latencies) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        lines.append(
+            f"Latency (ms): mean {latencies.mean():.1f}, p50 {p50:.1f}, p95 {p95:.1f}, "
+            f"p99 {p99:.1f}, max {latencies.max():.1f}"
+        )
+    return "\n".join(lines)
+
+
+def _add_common_arguments(parser: argparse.ArgumentParser, chunked: bool = True) -> None:
+    """
+    Add the parallelism options shared by all subcommands.
+    """
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Number of parallel workers (default: CPU count)."
+    )
+    if chunked:
+        parser.add_argument("--chunk-size", type=int, default=1, help="Items sent to a worker process at once.")
+    parser.add_argument("--resume", action="store_true", help="Skip items whose output already exists.")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the run and print the hottest functions. Implies --workers 1, as workers are not profiled.",
+    )
+    parser.add_argument("--metrics-json", metavar="PATH", help="Write per-stage metrics as a JSON summary.")
+    parser.add_argument("--metrics-prom", metavar="PATH", help="Write per-stage metrics as a Prometheus textfile.")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the argument parser of the ``rgc`` command.
+
+    :return: The argument parser.
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(prog="rgc", description="Radio galaxy preprocessing utilities.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    capture = subparsers.add_parser("capture", help="Capture images of a catalog from SkyView.")
+    capture.add_argument("catalog", help="Path to a CSV catalog, or a VizieR catalog name with --vizier.")
+    capture.add_argument("--vizier", action="store_true", help="Fetch the catalog from VizieR.")
+    capture.add_argument("--survey", default="VLA FIRST (1.4 GHz)", help="SkyView survey name.")
+    capture.add_argument("--img-dir", required=True, help="Directory to save the FITS images.")
+    capture.add_argument("--classes", nargs="*", metavar="NAME=LABEL", help="Class labels e.g. WAT=100 NAT=200.")
+    capture.add_argument("--cls-col", help="Catalog column containing the class names.")
+    capture.add_argument("--retries", type=int, default=0, help="Retries of a failed SkyView request.")
+    _add_common_arguments(capture, chunked=False)
+    capture.set_defaults(func=_capture)
+
+    mask = subparsers.add_parser("mask", help="Generate source masks with PyBDSF.")
+    mask.add_argument("catalog", help="Path to a CSV catalog, or a VizieR catalog name with --vizier.")
+    mask.add_argument("--vizier", action="store_true", help="Fetch the catalog from VizieR.")
+    mask.add_argument("--img-dir", required=True, help="Directory containing the FITS images.")
+    mask.add_argument("--mask-dir", required=True, help="Directory to save the masks.")
+    mask.add_argument("--freq", type=float, required=True, help="Frequency of the images in MHz.")
+    mask.add_argument("--beam", type=float, nargs=3, required=True, help="Beam size in arcsec.")
+    _add_common_arguments(mask)
+    mask.set_defaults(func=_mask)
+
+    convert = subparsers.add_parser("convert", help="Convert FITS files to PNG images.")
+    convert.add_argument("fits_dir", help="Directory containing the FITS files.")
+    convert.add_argument("png_dir", help="Directory to save the PNG images.")
+    convert.add_argument("--img-size", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"), help="Output image size.")
+    stretch = convert.add_mutually_exclusive_group()
+    stretch.add_argument(
+        "--clip", type=float, nargs=2, metavar=("LOW", "HIGH"), help="Clip and stretch to these values."
+    )
+    stretch.add_argument(
+        "--clip-percentiles",
+        type=float,
+        nargs=2,
+        metavar=("LOW", "HIGH"),
+        help="Clip and stretch to these percentiles of all FITS files, estimated in one streaming pass.",
+    )
+    _add_common_arguments(convert)
+    convert.set_defaults(func=_convert)
+
+    apply_mask = subparsers.add_parser("apply-mask", help="Mask PNG images with PNG masks.")
+    apply_mask.add_argument("image_dir", help="Directory containing the images.")
+    apply_mask.add_argument("mask_dir", help="Directory containing the masks.")
+    apply_mask.add_argument("masked_dir", help="Directory to save the masked images.")
+    _add_common_arguments(apply_mask)
+    apply_mask.set_defaults(func=_apply_mask)
+
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the ``rgc`` command.
+
+    :param argv: The command-line arguments, defaults to ``sys.argv[1:]``.
+    :type argv: Optional[list[str]]
+
+    :return: The exit status, non-zero if any item failed.
+    :rtype: int
+    """
+    args = build_parser().parse_args(argv)
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        # Pool workers are not profiled, the main process would only show it waiting on them
+        if args.workers > 1:
+            print("Profiling runs with a single worker in the main process.")
+            args.workers = 1
+        profiler.enable()
+
+    recorder = metrics.Metrics() if args.metrics_json or args.metrics_prom else None
+    with metrics.collect(recorder) if recorder is not None else nullcontext():
+        summary = args.func(args)
+
+    if profiler is not None:
+        profiler.disable()
+
+    if recorder is not None and args.metrics_json:
+        recorder.write_json(args.metrics_json)
+    if recorder is not None and args.metrics_prom:
+        recorder.write_prometheus(args.metrics_prom)
+
+    if summary is None:
+        print("Failed to read the catalog.")
+        return 1
+
+    print(format_summary(summary))
+
+    if profiler is not None:
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(25)
+
+    return 1 if summary.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
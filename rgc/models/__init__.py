@@ -1,2 +1,27 @@
-from .classifier import Classifier as Classifier
-from .dstreeablelenet import DSteerableLeNet as DSteerableLeNet
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .classifier import Classifier as Classifier
+    from .dstreeablelenet import DSteerableLeNet as DSteerableLeNet
+    from .inference import OnnxModel as OnnxModel
+    from .inference import export_onnx as export_onnx
+
+# The models depend on pytorch_lightning and e2cnn, which are slow to import,
+# so they are only imported when first accessed.
+_lazy_models = {
+    "Classifier": ".classifier",
+    "DSteerableLeNet": ".dstreeablelenet",
+    "OnnxModel": ".inference",
+    "export_onnx": ".inference",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _lazy_models:
+        module = importlib.import_module(_lazy_models[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")  # noqa: TRY003
+
+
+__all__ = ["Classifier", "DSteerableLeNet", "OnnxModel", "export_onnx"]
@@ -0,0 +1,67 @@
+"""
+NumPy 2 compatibility for e2cnn.
+
+e2cnn 0.2 hashes its kernel bases with ``ndarray.tostring`` and builds them
+with ``np.array(..., copy=False)``. NumPy 2 removed the former and made the
+latter raise when a copy is needed, so no steerable network can be built.
+:func:`patch_e2cnn` restores the NumPy 1 behaviour in e2cnn only.
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+from typing import Any
+
+import numpy as np
+
+# The kernel bases whose ``__hash__`` calls ``ndarray.tostring``
+_SOLUTIONS = (
+    "R2FlipsSolution",
+    "R2ContinuousRotationsSolution",
+    "R2FlipsDiscreteRotationsSolution",
+    "R2FlipsContinuousRotationsSolution",
+)
+
+
+class _NumPy1Array:
+    """
+    NumPy with the ``np.array(..., copy=False)`` of NumPy 1, copying only when needed.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(np, name)
+
+    @staticmethod
+    def array(obj: Any, *args: Any, copy: Any = True, **kwargs: Any) -> np.ndarray:
+        if copy is False:
+            return np.asarray(obj, *args, **kwargs)
+        return np.array(obj, *args, copy=copy, **kwargs)
+
+
+def _kernel_basis_hash(self: Any) -> int:
+    """
+    Hash a kernel basis as e2cnn does, with ``tobytes`` in place of ``tostring``.
+
+    :param self: The kernel basis.
+    :type self: e2cnn.kernels.IrrepBasis
+
+    :return: The hash of the basis.
+    :rtype: int
+    """
+    gamma = self.gamma.tobytes() if isinstance(self.gamma, np.ndarray) else self.gamma
+    return hash(self.in_irrep) + hash(self.out_irrep) + hash(self.mu.tobytes()) + hash(gamma)
+
+
+def patch_e2cnn() -> None:
+    """
+    Let e2cnn build its kernel bases under NumPy 2.
+
+    Does nothing under NumPy 1, and patching twice has no further effect.
+    """
+    if np.lib.NumpyVersion(np.__version__) < "2.0.0":
+        return
+
+    from e2cnn.kernels import irreps_basis, utils
+
+    utils.np = _NumPy1Array()
+    for name in _SOLUTIONS:
+        getattr(irreps_basis, name).__hash__ = _kernel_basis_hash
@@ -1,7 +1,5 @@
 import pytorch_lightning as pl
 import torch
-import wandb
-from sklearn.metrics import classification_report
 from torchmetrics.classification import (
     Accuracy,
     ConfusionMatrix,
@@ -95,6 +93,10 @@ class Classifier(pl.LightningModule):
         return loss
 
     def on_test_epoch_end(self):
+        # wandb and scikit-learn are only needed for the test report and are slow to import
+        import wandb
+        from sklearn.metrics import classification_report
+
         # Combine outputs from the test step
         y_hats = torch.cat([output["y_hat"] for output in self.test_outputs], dim=0)
         y_true = torch.cat([output["y"] for output in self.test_outputs], dim=0)
@@ -2,15 +2,45 @@
 
 __author__ = "Mir Sazzat Hossain"
 
+import copy
+import os
+from typing import Any, NamedTuple, Union
+
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from e2cnn import gspaces
 from e2cnn import nn as e2nn
 
+from rgc.models._e2cnn_compat import patch_e2cnn
+
+patch_e2cnn()
+
+# The modules of the pretraining and of the finetuning head
+_HEADS = {True: ("fc",), False: ("fc1", "fc2", "fc3")}
+
+
+class LoadedKeys(NamedTuple):
+    """
+    The keys left out when loading a checkpoint.
+
+    :param missing_keys: The keys of the head left at their initialization.
+    :type missing_keys: list[str]
+
+    :param unexpected_keys: The keys of the checkpoint that were ignored.
+    :type unexpected_keys: list[str]
+    """
+
+    missing_keys: list[str]
+    unexpected_keys: list[str]
+
 
 class DSteerableLeNet(nn.Module):
-    """Steerable CNN for image classification."""
+    """
+    Steerable CNN for image classification.
+
+    The network needs e2cnn, installed with the ``models`` extra, ``pip install rgc[models]``.
+    """
 
     def __init__(
         self, imsize: int = 151, kernel_size: int = 5, N: int = 16, pre_training: bool = False, num_classes: int = 2
@@ -44,7 +74,6 @@ class DSteerableLeNet(nn.Module):
         self.input_type = in_type
 
         out_type = e2nn.FieldType(self.r2_act, 6 * [self.r2_act.regular_repr])
-        self.mask = e2nn.MaskModule(in_type, self.imsize, margin=1)
         self.conv1 = e2nn.R2Conv(in_type, out_type, kernel_size=self.kernel_size, padding=1, bias=False)
         self.relu1 = e2nn.ReLU(out_type, inplace=True)
         self.pool1 = e2nn.PointwiseMaxPoolAntialiased(out_type, kernel_size=2)
@@ -59,11 +88,14 @@ class DSteerableLeNet(nn.Module):
 
         self.gpool = e2nn.GroupPooling(out_type)
 
-        self.fc = nn.Linear(16 * z * z, 2048)
-        self.fc1 = nn.Linear(16 * z * z, 120)
-        self.fc2 = nn.Linear(120, 84)
-        self.fc3 = nn.Linear(84, num_classes)
-        self.drop = nn.Dropout(p=0.5)
+        # Only the head of the current mode is built, the projection alone holds 42M parameters at imsize 151
+        if self.pre_training:
+            self.fc = nn.Linear(16 * z * z, 2048)
+        else:
+            self.fc1 = nn.Linear(16 * z * z, 120)
+            self.fc2 = nn.Linear(120, 84)
+            self.fc3 = nn.Linear(84, num_classes)
+            self.drop = nn.Dropout(p=0.5)
 
         # dummy parameter for tracking device
         self.dummy = nn.Parameter(torch.empty(0))
@@ -101,3 +133,144 @@ class DSteerableLeNet(nn.Module):
             x = self.fc3(x)
 
         return x
+
+    def load_checkpoint(self, checkpoint: Union[str, os.PathLike, dict[str, Any]]) -> LoadedKeys:
+        """
+        Load the weights of a pretraining or a finetuning checkpoint.
+
+        The backbone is always loaded. The head is loaded if the checkpoint was
+        saved in the same mode and keeps its initialization otherwise, so a
+        finetuning network can start from a pretraining checkpoint and the
+        other way round. The checkpoint may be a state dict of the network,
+        saved in either training or evaluation mode, a dict holding one under
+        ``"model_state_dict"``, or a PyTorch Lightning checkpoint of a
+        :class:`~rgc.models.Classifier`. Checkpoints of earlier versions, which
+        held both heads, load as well. Lightning checkpoints pickle their
+        hyperparameters, so a path is loaded in full and must be trusted.
+
+        :param checkpoint: The path to the checkpoint, or the loaded checkpoint.
+        :type checkpoint: Union[str, os.PathLike, dict[str, Any]]
+
+        :return: The keys of the head left at their initialization and the ignored keys of the checkpoint.
+        :rtype: LoadedKeys
+
+        :raises RuntimeError: If the checkpoint misses part of the backbone or of the head.
+        """
+        if not isinstance(checkpoint, dict):
+            checkpoint = torch.load(checkpoint, map_location=self.dummy.device, weights_only=False)
+        state_dict = _model_state_dict(checkpoint)  # type: ignore[arg-type]
+
+        # The expanded filters are only part of the state in evaluation mode, they are rebuilt from the weights
+        derived = {
+            f"{name}.{buffer}"
+            for name, module in self.named_modules()
+            if isinstance(module, e2nn.R2Conv)
+            for buffer in ("filter", "expanded_bias")
+        }
+        training = self.training
+        self.train()
+        try:
+            keys = self.state_dict().keys()
+            head = {key for key in keys if key.split(".", 1)[0] in _HEADS[self.pre_training]}
+            missing = [key for key in keys if key not in state_dict]
+            if missing and set(missing) != head:
+                raise RuntimeError(f"Missing keys in checkpoint: {', '.join(missing)}")  # noqa: TRY003
+
+            self.load_state_dict({key: value for key, value in state_dict.items() if key in keys}, strict=False)
+        finally:
+            self.train(training)
+
+        unexpected = [key for key in state_dict if key not in keys and key not in derived]
+        return LoadedKeys(missing, unexpected)
+
+    def export(self) -> nn.Sequential:
+        """
+        Convert the network into plain PyTorch modules for inference.
+
+        The steerable convolutions become ``Conv2d`` modules holding their
+        expanded filters, the anti-aliased max pooling a ``MaxPool2d`` followed
+        by a depthwise ``Conv2d`` with the fixed Gaussian filter, and the group
+        pooling a ``MaxPool3d`` over the channels of every field. Dropout is
+        left out, as in evaluation. The result is numerically equal to the
+        network in evaluation mode, and neither loading nor running it needs
+        e2cnn, e.g. after ``torch.jit.script`` or ``torch.save``.
+
+        :return: The network in evaluation mode, without gradients.
+        :rtype: nn.Sequential
+        """
+        training = self.training
+        # The filters of the steerable convolutions are expanded in evaluation mode
+        self.eval()
+        try:
+            group_size = self.r2_act.regular_repr.size
+            fields = self.gpool.out_type.size
+            layers = [
+                self.conv1.export(),
+                nn.ReLU(inplace=True),
+                *_export_pool(self.pool1),
+                self.conv2.export(),
+                nn.ReLU(inplace=True),
+                *_export_pool(self.pool2),
+                # Group pooling takes the maximum over the channels of every field
+                nn.Unflatten(1, (fields, group_size)),
+                nn.MaxPool3d(kernel_size=(group_size, 1, 1)),
+                nn.Flatten(),
+            ]
+            if self.pre_training:
+                layers.append(copy.deepcopy(self.fc))
+            else:
+                layers += [
+                    copy.deepcopy(self.fc1),
+                    nn.ReLU(),
+                    copy.deepcopy(self.fc2),
+                    nn.ReLU(),
+                    copy.deepcopy(self.fc3),
+                ]
+        finally:
+            self.train(training)
+
+        exported = nn.Sequential(*layers).eval()
+        for parameter in exported.parameters():
+            parameter.data = parameter.data.clone()
+        return exported.requires_grad_(False)
+
+
+def _export_pool(pool: Any) -> list[nn.Module]:
+    """
+    Convert an anti-aliased max pooling into plain PyTorch modules.
+
+    :param pool: The pooling module.
+    :type pool: e2nn.PointwiseMaxPoolAntialiased
+
+    :return: The dense max pooling and the strided Gaussian blur.
+    :rtype: list[nn.Module]
+    """
+    channels, _, size, _ = pool.filter.shape
+    blur = nn.Conv2d(channels, channels, size, stride=pool.stride, padding=pool._pad, groups=channels, bias=False)
+    blur.weight.data = pool.filter.detach().clone()
+
+    # The maximum is taken densely, the blur then downsamples
+    dense = nn.MaxPool2d(pool.kernel_size, stride=1, padding=pool.padding, ceil_mode=pool.ceil_mode)
+    return [dense, blur]
+
+
+def _model_state_dict(checkpoint: dict[str, Any]) -> dict[str, Any]:
+    """
+    Get the state dict of the network from a checkpoint.
+
+    :param checkpoint: A state dict, a dict holding one under ``"model_state_dict"``, or a Lightning checkpoint.
+    :type checkpoint: dict[str, Any]
+
+    :return: The state dict.
+    :rtype: dict[str, Any]
+    """
+    if "model_state_dict" in checkpoint:
+        return checkpoint["model_state_dict"]  # type: ignore[no-any-return]
+    if "state_dict" in checkpoint:
+        # The Classifier holds the network as its ``model`` attribute
+        return {
+            key.removeprefix("model."): value
+            for key, value in checkpoint["state_dict"].items()
+            if key.startswith("model.")
+        }
+    return checkpoint
@@ -0,0 +1,178 @@
+"""
+ONNX export and onnxruntime inference of the classifiers.
+
+:func:`export_onnx` writes a trained network to an ONNX graph with a dynamic
+batch dimension. :class:`OnnxModel` runs such a graph through onnxruntime on
+NumPy arrays, so serving needs neither PyTorch, PyTorch Lightning nor e2cnn:
+this module imports torch only when exporting. Both need the ``onnx`` extra,
+``pip install rgc[onnx]``.
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import inspect
+import os
+import tempfile
+from typing import TYPE_CHECKING, Any, Optional, Union, cast
+
+import numpy as np
+
+from rgc._lazy import LazyImport
+
+if TYPE_CHECKING:
+    import onnxruntime as ort
+    import torch
+else:
+    ort = LazyImport("onnxruntime")
+    torch = LazyImport("torch")
+
+INPUT_NAME = "images"
+OUTPUT_NAME = "logits"
+
+
+def export_onnx(
+    model: "torch.nn.Module",
+    path: Union[str, os.PathLike],
+    input_shape: Optional[tuple[int, ...]] = None,
+    opset_version: int = 17,
+) -> str:
+    """
+    Export a network to an ONNX graph taking a batch of images to logits.
+
+    A :class:`~rgc.models.Classifier` is exported through its backbone. A
+    :class:`~rgc.models.DSteerableLeNet` is first converted to plain PyTorch
+    modules with its ``export`` method, so the graph holds ordinary
+    convolutions instead of tracing the filter expansion of e2cnn. Other
+    backbones are traced as they are, in evaluation mode. The batch dimension
+    of the graph is dynamic. The file is written atomically. Exporting needs
+    the ``onnx`` extra, ``pip install rgc[onnx]``.
+
+    :param model: The network, a Classifier or a backbone.
+    :type model: torch.nn.Module
+
+    :param path: The path to the ONNX file.
+    :type path: Union[str, os.PathLike]
+
+    :param input_shape: The shape (C, H, W) of an image, by default (1, imsize, imsize) for a DSteerableLeNet.
+    :type input_shape: Optional[tuple[int, ...]]
+
+    :param opset_version: The ONNX opset of the graph.
+    :type opset_version: int
+
+    :return: The path to the ONNX file.
+    :rtype: str
+
+    :raises ValueError: If the input shape is not given for a backbone other than DSteerableLeNet.
+    """
+    if model.__class__.__name__ == "Classifier":
+        model = cast("torch.nn.Module", model.model)
+
+    training = model.training
+    if model.__class__.__name__ == "DSteerableLeNet":
+        imsize = cast(int, model.imsize)
+        input_shape = input_shape or (1, imsize, imsize)
+        network: torch.nn.Module = model.export()  # type: ignore[operator]
+    elif input_shape is None:
+        raise ValueError("The input shape must be given for this backbone.")  # noqa: TRY003
+    else:
+        network = model.eval()
+
+    tensor = next(network.parameters(), None)
+    images = torch.zeros((1, *input_shape), device=tensor.device if tensor is not None else None)
+
+    # torch 2.5 added the dynamo exporter, which later became the default
+    options: dict[str, Any] = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+    path = os.fspath(path)
+    folder = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=folder, suffix=".onnx", delete=False) as outfile:
+        try:
+            with torch.no_grad():
+                torch.onnx.export(
+                    network,
+                    (images,),
+                    outfile,
+                    input_names=[INPUT_NAME],
+                    output_names=[OUTPUT_NAME],
+                    dynamic_axes={INPUT_NAME: {0: "batch"}, OUTPUT_NAME: {0: "batch"}},
+                    opset_version=opset_version,
+                    **options,
+                )
+        except BaseException:
+            os.remove(outfile.name)
+            raise
+        finally:
+            model.train(training)
+    os.replace(outfile.name, path)
+    return path
+
+
+class OnnxModel:
+    """
+    A classifier running an ONNX graph through onnxruntime on the CPU.
+
+    The images are NumPy arrays of shape (N, C, H, W), normalized as for the
+    eager network. Batches of any size are accepted, the graph is optimized
+    once when the session is created. onnxruntime comes with the ``onnx``
+    extra, ``pip install rgc[onnx]``.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        intra_op_num_threads: int = 0,
+        inter_op_num_threads: int = 0,
+        providers: Optional[list[str]] = None,
+    ) -> None:
+        """
+        Create the inference session.
+
+        :param path: The path to the ONNX file, see :func:`export_onnx`.
+        :type path: Union[str, os.PathLike]
+
+        :param intra_op_num_threads: The number of threads within an operator, 0 for the onnxruntime default.
+        :type intra_op_num_threads: int
+
+        :param inter_op_num_threads: The number of threads across operators, 0 for the onnxruntime default.
+        :type inter_op_num_threads: int
+
+        :param providers: The execution providers, by default the CPU.
+        :type providers: Optional[list[str]]
+        """
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_num_threads
+        options.inter_op_num_threads = inter_op_num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(
+            os.fspath(path), sess_options=options, providers=providers or ["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_name = self.session.get_outputs()[0].name
+
+    def __call__(self, images: Any) -> np.ndarray:
+        """
+        Compute the logits of a batch of images.
+
+        :param images: The images of shape (N, C, H, W).
+        :type images: Any
+
+        :return: The logits of shape (N, classes).
+        :rtype: np.ndarray
+        """
+        images = np.ascontiguousarray(images, dtype=np.float32)
+        logits: np.ndarray = self.session.run([self.output_name], {self.input_name: images})[0]
+        return logits
+
+    def predict(self, images: Any) -> np.ndarray:
+        """
+        Predict the classes of a batch of images.
+
+        :param images: The images of shape (N, C, H, W).
+        :type images: Any
+
+        :return: The class indices of shape (N,).
+        :rtype: np.ndarray
+        """
+        return self(images).argmax(axis=1)  # type: ignore[no-any-return]
@@ -0,0 +1,43 @@
+"""
+File helpers shared by the modules of :mod:`rgc.utils`.
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import os
+import tempfile
+
+
+def write_atomic(path: str, content: str) -> None:
+    """
+    Write a text file atomically so readers never see a partial file.
+
+    :param path: Path to the file.
+    :type path: str
+
+    :param content: The content of the file.
+    :type content: str
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", dir=folder, delete=False, suffix=".tmp") as outfile:
+        outfile.write(content)
+    os.replace(outfile.name, path)
+
+
+def batch_signature(paths: list[str]) -> list[list]:
+    """
+    Get the name, size and modification time of batch files, used to detect stale caches.
+
+    :param paths: The paths to the batch files.
+    :type paths: list[str]
+
+    :return: The name, size and modification time in nanoseconds of every file.
+    :rtype: list[list]
+    """
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+    return signature
@@ -0,0 +1,274 @@
+"""
+Batched image augmentation.
+
+:class:`BatchAugmentation` applies the pad, center-crop, random rotation and
+normalization steps of the albumentations pipelines used for training to a
+whole uint8 batch in a few vectorized tensor operations, instead of sample by
+sample in the DataLoader workers. It runs either as the ``collate_fn`` of a
+DataLoader::
+
+    dataset = Bent("data/bent", transform=ToUint8Tensor())
+    loader = DataLoader(dataset, batch_size=64, collate_fn=BatchAugmentation(151).collate)
+
+or on the device after the batch is transferred, e.g. in the
+``on_after_batch_transfer`` hook of a LightningModule::
+
+    images = augmentation(images.to("cuda"))
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import math
+from typing import Any, Optional, Union
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+from torch.utils.data import default_collate
+
+
+class ToUint8Tensor:
+    """
+    A transform returning the raw image as a uint8 tensor of shape (H, W).
+
+    It accepts the NumPy arrays of the datasets directly, so no PIL image is
+    created, and leaves the augmentation to :class:`BatchAugmentation`.
+    """
+
+    accepts_arrays = True
+
+    def __call__(self, img: Union[Image.Image, np.ndarray]) -> torch.Tensor:
+        """
+        Convert the image to a tensor.
+
+        :param img: The image.
+        :type img: Union[Image.Image, np.ndarray]
+
+        :return: The image as a uint8 tensor.
+        :rtype: torch.Tensor
+        """
+        return torch.from_numpy(np.array(img, dtype=np.uint8, copy=True))
+
+
+class BatchAugmentation(torch.nn.Module):
+    """
+    Pad, center-crop, randomly rotate and normalize a batch of uint8 images.
+
+    The steps mirror ``PadIfNeeded``, ``CenterCrop``, ``Affine(rotate=...)``
+    and ``Normalize`` of albumentations: images are zero-padded to at least
+    ``size``, center-cropped to ``size``, rotated about their center by a
+    uniformly drawn angle with bilinear interpolation and zero fill, and
+    normalized as ``(x / max_pixel_value - mean) / std``.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        rotate: Optional[tuple[float, float]] = (-360.0, 360.0),
+        mean: float = 0.0,
+        std: float = 1.0,
+        max_pixel_value: float = 255.0,
+        generator: Optional[torch.Generator] = None,
+    ) -> None:
+        """
+        Initialize the augmentation.
+
+        :param size: The height and width of the output images.
+        :type size: int
+
+        :param rotate: The range of rotation angles in degrees, or None for no rotation.
+        :type rotate: Optional[tuple[float, float]]
+
+        :param mean: The mean subtracted after scaling to [0, 1].
+        :type mean: float
+
+        :param std: The standard deviation divided by after subtracting the mean.
+        :type std: float
+
+        :param max_pixel_value: The value scaled to 1.
+        :type max_pixel_value: float
+
+        :param generator: The random number generator of the rotation angles.
+        :type generator: Optional[torch.Generator]
+        """
+        super().__init__()
+        self.size = size
+        self.rotate = rotate
+        self.mean = mean
+        self.std = std
+        self.max_pixel_value = max_pixel_value
+        self.generator = generator
+        self._bases: dict[tuple[int, int, torch.device], torch.Tensor] = {}
+
+    @property
+    def deterministic(self) -> bool:
+        """
+        Whether the augmentation always gives the same output for the same input.
+
+        :return: True if no random rotation is applied.
+        :rtype: bool
+        """
+        return self.rotate is None
+
+    def forward(self, images: torch.Tensor) -> torch.Tensor:
+        """
+        Augment a batch of images.
+
+        :param images: The images of shape (N, H, W), (N, H, W, C) or (N, C, H, W).
+        :type images: torch.Tensor
+
+        :return: The float32 images of shape (N, C, size, size).
+        :rtype: torch.Tensor
+        """
+        images = _channels_first(images)
+
+        rotate = self.rotate
+        output = self._pad_and_crop(images) if rotate is None else self._rotate(images.float(), *rotate)
+
+        # Normalize in place with a single multiply-add
+        scale = 1 / (self.max_pixel_value * self.std)
+        return output.mul_(scale).sub_(self.mean / self.std)
+
+    def collate(self, batch: list[tuple[Any, Any]]) -> tuple[torch.Tensor, Any]:
+        """
+        Collate (image, target) samples into an augmented batch, for use as ``collate_fn``.
+
+        :param batch: The samples, whose images are arrays, tensors or PIL images.
+        :type batch: list[tuple[Any, Any]]
+
+        :return: The augmented images and the collated targets.
+        :rtype: tuple[torch.Tensor, Any]
+        """
+        images = torch.stack([torch.as_tensor(np.asarray(img)) for img in (sample[0] for sample in batch)])
+        targets = default_collate([target for _, target in batch])
+        return self(images), targets
+
+    def _offsets(self, height: int, width: int) -> tuple[int, int]:
+        """
+        Get the position of the input image in the padded and cropped output.
+
+        :param height: The height of the input images.
+        :type height: int
+
+        :param width: The width of the input images.
+        :type width: int
+
+        :return: The row and column of the output at which the input starts, negative if cropped.
+        :rtype: tuple[int, int]
+        """
+
+        def offset(length: int) -> int:
+            if length < self.size:
+                return (self.size - length) // 2
+            return -((length - self.size) // 2)
+
+        return offset(height), offset(width)
+
+    def _pad_and_crop(self, images: torch.Tensor) -> torch.Tensor:
+        """
+        Zero-pad the images to at least ``size`` and center-crop them to ``size``.
+
+        :param images: The images of shape (N, C, H, W).
+        :type images: torch.Tensor
+
+        :return: The float32 images of shape (N, C, size, size).
+        :rtype: torch.Tensor
+        """
+        height, width = images.shape[-2:]
+        top, left = self._offsets(height, width)
+        output = images.new_zeros((*images.shape[:2], self.size, self.size), dtype=torch.float32)
+
+        rows = slice(max(top, 0), min(top + height, self.size))
+        cols = slice(max(left, 0), min(left + width, self.size))
+        output[..., rows, cols] = images[
+            ..., rows.start - top : rows.stop - top, cols.start - left : cols.stop - left
+        ].float()
+        return output
+
+    def _grid_basis(self, height: int, width: int, device: torch.device) -> torch.Tensor:
+        """
+        Get the basis of the sampling grids for inputs of the given size.
+
+        A grid for the angle ``a`` is ``[cos(a), sin(a), 1] @ basis``, in the
+        normalized coordinates of ``grid_sample`` with ``align_corners=False``.
+        The basis is cached per input size and device.
+
+        :param height: The height of the input images.
+        :type height: int
+
+        :param width: The width of the input images.
+        :type width: int
+
+        :param device: The device of the input images.
+        :type device: torch.device
+
+        :return: The basis of shape (3, size * size * 2).
+        :rtype: torch.Tensor
+        """
+        key = (height, width, device)
+        if key not in self._bases:
+            top, left = self._offsets(height, width)
+            center = (self.size - 1) / 2
+            coords = torch.arange(self.size, dtype=torch.float64) - center
+            u, v = torch.meshgrid(coords, coords, indexing="xy")
+
+            # Scale pixel coordinates of the input to [-1, 1]
+            scale = torch.tensor([2 / width, 2 / height], dtype=torch.float64)
+            shift = torch.tensor([(2 * (center - left) + 1) / width - 1, (2 * (center - top) + 1) / height - 1])
+
+            cos_term = torch.stack([u, v], dim=-1) * scale
+            sin_term = torch.stack([-v, u], dim=-1) * scale
+            constant = shift.expand_as(cos_term)
+            basis = torch.stack([cos_term, sin_term, constant]).reshape(3, -1)
+            self._bases[key] = basis.to(device, torch.float32)
+        return self._bases[key]
+
+    def _rotate(self, images: torch.Tensor, low: float, high: float) -> torch.Tensor:
+        """
+        Pad, crop and rotate every image about its center by a random angle in one resampling.
+
+        The sampling grid maps every output pixel through the rotation and the
+        pad/crop offsets to the input image. Pixels falling outside it are
+        zero, which also provides the padding.
+
+        :param images: The float images of shape (N, C, H, W).
+        :type images: torch.Tensor
+
+        :param low: The smallest angle in degrees.
+        :type low: float
+
+        :param high: The largest angle in degrees.
+        :type high: float
+
+        :return: The float32 images of shape (N, C, size, size).
+        :rtype: torch.Tensor
+        """
+        height, width = images.shape[-2:]
+        angles = torch.rand(len(images), generator=self.generator, dtype=torch.float64)
+        angles = (low + (high - low) * angles) * (math.pi / 180)
+        coefficients = torch.stack([torch.cos(angles), torch.sin(angles), torch.ones_like(angles)], dim=1)
+
+        # One (N, 3) @ (3, size * size * 2) product builds every sampling grid
+        basis = self._grid_basis(height, width, images.device)
+        grid = (coefficients.to(images.device, torch.float32) @ basis).view(len(images), self.size, self.size, 2)
+
+        return F.grid_sample(images, grid, mode="bilinear", padding_mode="zeros", align_corners=False)
+
+
+def _channels_first(images: torch.Tensor) -> torch.Tensor:
+    """
+    Bring a batch of images into the (N, C, H, W) layout.
+
+    :param images: The images of shape (N, H, W), (N, H, W, C) or (N, C, H, W).
+    :type images: torch.Tensor
+
+    :return: The images of shape (N, C, H, W).
+    :rtype: torch.Tensor
+    """
+    if images.dim() == 3:
+        return images.unsqueeze(1)
+    if images.shape[-1] in (1, 3) and images.shape[1] not in (1, 3):
+        return images.permute(0, 3, 1, 2)
+    return images
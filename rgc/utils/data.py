@@ -9,20 +9,40 @@ __author__ = "Mir Sazzat Hossain"
 
 
 import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import Optional, cast
+from typing import TYPE_CHECKING, Callable, NamedTuple, Optional, cast
 
-import bdsf
 import numpy as np
 import pandas as pd
-import torch
-from astropy import units as u
-from astropy.coordinates import SkyCoord
-from astropy.io import fits
-from astroquery.skyview import SkyView
-from astroquery.vizier import Vizier
 from PIL import Image
 
+from rgc._lazy import LazyImport
+from rgc.utils import metrics
+from rgc.utils.stats import QuantileSketch, RunningMeanStd
+
+if TYPE_CHECKING:
+    import bdsf
+    import torch
+    from astropy import units as u
+    from astropy.coordinates import SkyCoord
+    from astropy.io import fits
+    from astroquery.skyview import SkyView
+    from astroquery.vizier import Vizier
+else:
+    # Heavy dependencies are imported on first use to keep `import rgc` fast.
+    bdsf = LazyImport("bdsf")
+    torch = LazyImport("torch")
+    u = LazyImport("astropy.units")
+    SkyCoord = LazyImport("astropy.coordinates", "SkyCoord")
+    fits = LazyImport("astropy.io.fits")
+    SkyView = LazyImport("astroquery.skyview", "SkyView")
+    Vizier = LazyImport("astroquery.vizier", "Vizier")
+
 
 def catalog_quest(name: str, service: str = "Vizier") -> pd.DataFrame:
     """
@@ -72,7 +92,8 @@ def celestial_capture(survey: str, ra: float, dec: float, filename: str) -> None
     :param filename: The name of the file to save the image.
     :type filename: str
     """
-    image = SkyView.get_images(position=f"{ra}, {dec}", survey=survey, coordinates="J2000", pixels=(150, 150))[0]
+    with metrics.timer("skyview"):
+        image = SkyView.get_images(position=f"{ra}, {dec}", survey=survey, coordinates="J2000", pixels=(150, 150))[0]
 
     comment = str(image[0].header["COMMENT"])
     comment = comment.replace("\n", " ")
@@ -83,7 +104,9 @@ def celestial_capture(survey: str, ra: float, dec: float, filename: str) -> None
 
     folder_path = Path(filename).parent
     Path(folder_path).mkdir(parents=True, exist_ok=True)
-    image.writeto(filename, overwrite=True)
+    with metrics.timer("fits_write"):
+        image.writeto(filename, overwrite=True)
+    metrics.count_file("fits_write", "bytes_written", filename)
 
 
 def celestial_tag(entry: pd.Series) -> str:
@@ -135,26 +158,180 @@ class _FileNotFoundError(Exception):
         super().__init__(message)
 
 
-def fits_to_png(fits_file: str, img_size: Optional[tuple[int, int]] = None) -> Image.Image:
+class BulkSummary(NamedTuple):
+    """
+    A summary of a bulk operation.
+
+    :param total: The number of items in the operation.
+    :type total: int
+
+    :param failed: The number of items that failed.
+    :type failed: int
+
+    :param skipped: The number of items skipped because their output already existed.
+    :type skipped: int
+
+    :param latencies: The wall time in seconds of every processed item.
+    :type latencies: list[float]
+
+    :param wall_time: The wall time in seconds of the whole operation.
+    :type wall_time: float
+    """
+
+    total: int
+    failed: int
+    skipped: int
+    latencies: list[float]
+    wall_time: float
+
+
+def _timed(
+    func: Callable[..., bool], args: tuple, collect: bool = False, stage: str = "task"
+) -> tuple[bool, float, Optional[metrics.Metrics]]:
+    """
+    Call a function and measure its wall time.
+
+    An exception raised by the call is reported and counted as a failure, so
+    one bad input does not abort the other tasks of a bulk operation.
+
+    :param func: The function to call, returning whether it succeeded.
+    :type func: Callable[..., bool]
+
+    :param args: The positional arguments of the call.
+    :type args: tuple
+
+    :param collect: If True, records the metrics of the call in a fresh recorder,
+        used in worker processes which cannot reach the recorder of the parent.
+    :type collect: bool
+
+    :param stage: The name of the stage, used to report failures.
+    :type stage: str
+
+    :return: Whether the call succeeded, its wall time in seconds and its metrics if collected.
+    :rtype: tuple[bool, float, Optional[metrics.Metrics]]
+    """
+    recorder = metrics.Metrics() if collect else None
+    previous = metrics.activate(recorder) if collect else None
+
+    start = time.perf_counter()
+    try:
+        succeeded = func(*args)
+    except Exception as err:
+        print(f"Failed to run {stage} for {args[0] if args else ''}. {err}")
+        succeeded = False
+    finally:
+        if collect:
+            metrics.activate(previous)
+
+    return succeeded, time.perf_counter() - start, recorder
+
+
+def _run_tasks(
+    stage: str,
+    func: Callable[..., bool],
+    tasks: list[tuple],
+    workers: int = 1,
+    chunk_size: int = 1,
+    threads: bool = False,
+    skipped: int = 0,
+) -> BulkSummary:
+    """
+    Run a function over a list of tasks, optionally in parallel.
+
+    With a single worker the tasks run in the calling process. Otherwise they
+    are spread over a process pool, or a thread pool for I/O-bound work. The
+    wall time and failures of every task are recorded under the stage name when
+    metrics are enabled.
+
+    :param stage: The name of the stage for metrics e.g. 'convert'.
+    :type stage: str
+
+    :param func: The function to run for every task, returning whether it succeeded.
+    :type func: Callable[..., bool]
+
+    :param tasks: The positional arguments of every call.
+    :type tasks: list[tuple]
+
+    :param workers: The number of parallel workers.
+    :type workers: int
+
+    :param chunk_size: The number of tasks sent to a worker process at once.
+    :type chunk_size: int
+
+    :param threads: If True, uses threads instead of processes.
+    :type threads: bool
+
+    :param skipped: The number of tasks already skipped by the caller.
+    :type skipped: int
+
+    :return: The summary of the run.
+    :rtype: BulkSummary
+    """
+    recorder = metrics.active()
+    start = time.perf_counter()
+    if workers <= 1:
+        results = [_timed(func, task, stage=stage) for task in tasks]
+    elif threads:
+        with ThreadPoolExecutor(workers) as executor:
+            results = list(executor.map(_timed, repeat(func), tasks, repeat(False), repeat(stage)))
+    else:
+        collect = recorder is not None
+        with ProcessPoolExecutor(workers) as executor:
+            results = list(
+                executor.map(_timed, repeat(func), tasks, repeat(collect), repeat(stage), chunksize=max(chunk_size, 1))
+            )
+
+    if recorder is not None:
+        for succeeded, elapsed, task_metrics in results:
+            recorder.observe(stage, elapsed)
+            if not succeeded:
+                recorder.add(stage, "failures")
+            if task_metrics is not None:
+                recorder.merge(task_metrics)
+
+    return BulkSummary(
+        total=len(tasks) + skipped,
+        failed=sum(not succeeded for succeeded, _, _ in results),
+        skipped=skipped,
+        latencies=[elapsed for _, elapsed, _ in results],
+        wall_time=time.perf_counter() - start,
+    )
+
+
+def fits_to_png(
+    fits_file: str,
+    img_size: Optional[tuple[int, int]] = None,
+    clip: Optional[tuple[float, float]] = None,
+) -> Image.Image:
     """
     Convert a FITS file to a PNG image.
 
+    By default every image is stretched between its own minimum and maximum.
+    With ``clip``, e.g. dataset percentiles from :func:`fits_clip_bounds`, the
+    values are clipped to the given bounds and stretched between them instead,
+    so bright outliers do not compress the rest of the image.
+
     :param fits_file: The path to the FITS file.
     :type fits_file: str
 
     :param img_size: The size of the output image.
     :type img_size: Optional[tuple[int, int]]
 
+    :param clip: The lower and upper bound of the linear stretch.
+    :type clip: Optional[tuple[float, float]]
+
     :return: A PIL Image object containing the PNG image.
     :rtype: Image.Image
 
     :raises _FileNotFoundError: If the FITS file is not found.
     """
     try:
-        image = fits.getdata(fits_file)
-        header = fits.getheader(fits_file)
+        with metrics.timer("fits_decode"):
+            image = fits.getdata(fits_file)
+            header = fits.getheader(fits_file)
     except FileNotFoundError as err:
         raise _FileNotFoundError(fits_file) from err
+    metrics.count_file("fits_decode", "bytes_read", fits_file)
 
     if img_size is not None:
         width, height = img_size
@@ -164,14 +341,51 @@ def fits_to_png(fits_file: str, img_size: Optional[tuple[int, int]] = None) -> I
     image = np.reshape(image, (height, width))
     image[np.isnan(image)] = np.nanmin(image)
 
-    image = (image - np.nanmin(image)) / (np.nanmax(image) - np.nanmin(image)) * 255
+    if clip is not None:
+        low, high = clip
+        image = np.clip(image, low, high)
+    else:
+        low, high = np.nanmin(image), np.nanmax(image)
+
+    # A constant image or degenerate bounds have nothing to stretch
+    image = (image - low) / (high - low) * 255 if high > low else np.zeros_like(image)
     image = image.astype(np.uint8)
     image = Image.fromarray(image, mode="L")
 
     return cast(Image.Image, image)
 
 
-def fits_to_png_bulk(fits_dir: str, png_dir: str, img_size: Optional[tuple[int, int]] = None) -> None:
+def _fits_to_png_one(
+    fits_file: str,
+    png_file: str,
+    img_size: Optional[tuple[int, int]],
+    clip: Optional[tuple[float, float]] = None,
+) -> bool:
+    """
+    Convert a single FITS file to a PNG image on disk.
+
+    :return: True if the image was written, False otherwise.
+    :rtype: bool
+    """
+    image = fits_to_png(fits_file, img_size, clip)
+
+    Path(png_file).parent.mkdir(parents=True, exist_ok=True)
+
+    with metrics.timer("png_encode"):
+        image.save(png_file)
+    metrics.count_file("png_encode", "bytes_written", png_file)
+    return True
+
+
+def fits_to_png_bulk(
+    fits_dir: str,
+    png_dir: str,
+    img_size: Optional[tuple[int, int]] = None,
+    workers: int = 1,
+    chunk_size: int = 1,
+    resume: bool = False,
+    clip: Optional[tuple[float, float]] = None,
+) -> BulkSummary:
     """
     Convert a directory of FITS files to PNG images.
 
@@ -183,16 +397,92 @@ def fits_to_png_bulk(fits_dir: str, png_dir: str, img_size: Optional[tuple[int,
 
     :param img_size: The size of the output image.
     :type img_size: Optional[tuple[int, int]]
+
+    :param workers: The number of worker processes.
+    :type workers: int
+
+    :param chunk_size: The number of files sent to a worker process at once.
+    :type chunk_size: int
+
+    :param resume: If True, skips files whose PNG image already exists.
+    :type resume: bool
+
+    :param clip: The lower and upper bound of the linear stretch, see :func:`fits_clip_bounds`.
+    :type clip: Optional[tuple[float, float]]
+
+    :return: The summary of the conversion.
+    :rtype: BulkSummary
+    """
+    tasks = []
+    for fits_file in Path(fits_dir).rglob("*.fits"):
+        png_file = os.path.join(png_dir, f"{fits_file.stem}.png")
+        tasks.append((str(fits_file), png_file, img_size, clip))
+
+    pending = [task for task in tasks if not (resume and os.path.exists(task[1]))]
+
+    return _run_tasks("convert", _fits_to_png_one, pending, workers, chunk_size, skipped=len(tasks) - len(pending))
+
+
+def _fits_sketch_one(fits_file: str, alpha: float) -> QuantileSketch:
+    """
+    Sketch the pixel values of a single FITS file.
+
+    :return: The quantile sketch of the pixel values.
+    :rtype: QuantileSketch
+    """
+    sketch = QuantileSketch(alpha)
+    with metrics.timer("fits_decode"):
+        sketch.update(fits.getdata(fits_file))
+    metrics.count_file("fits_decode", "bytes_read", fits_file)
+    return sketch
+
+
+def fits_clip_bounds(
+    fits_dir: str,
+    percentiles: tuple[float, float] = (0.5, 99.5),
+    workers: int = 1,
+    chunk_size: int = 1,
+    alpha: float = 0.01,
+) -> tuple[float, float]:
+    """
+    Estimate percentiles of the pixel values of a directory of FITS files.
+
+    Every file is reduced to a :class:`~rgc.utils.stats.QuantileSketch` of
+    bounded size, in worker processes if ``workers > 1``, and the sketches are
+    merged, so the whole dataset is never held in memory. The result is meant
+    for the ``clip`` option of :func:`fits_to_png` and :func:`fits_to_png_bulk`.
+
+    :param fits_dir: The path to the directory containing the FITS files.
+    :type fits_dir: str
+
+    :param percentiles: The lower and upper percentile.
+    :type percentiles: tuple[float, float]
+
+    :param workers: The number of worker processes.
+    :type workers: int
+
+    :param chunk_size: The number of files sent to a worker process at once.
+    :type chunk_size: int
+
+    :param alpha: The relative accuracy of the percentiles.
+    :type alpha: float
+
+    :return: The pixel values at the lower and upper percentile.
+    :rtype: tuple[float, float]
     """
-    fits_files = Path(fits_dir).rglob("*.fits")
-    for fits_file in fits_files:
-        image = fits_to_png(str(fits_file), img_size)
+    fits_files = [str(fits_file) for fits_file in Path(fits_dir).rglob("*.fits")]
 
-        png_file = os.path.join(png_dir, fits_file.stem)
-        Path(png_file).parent.mkdir(parents=True, exist_ok=True)
+    sketch = QuantileSketch(alpha)
+    if workers <= 1:
+        for fits_file in fits_files:
+            sketch.merge(_fits_sketch_one(fits_file, alpha))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for partial in executor.map(_fits_sketch_one, fits_files, repeat(alpha), chunksize=max(chunk_size, 1)):
+                sketch.merge(partial)
 
-        if image is not None:
-            image.save(png_file)
+    low, high = sketch.quantile(np.asarray(percentiles) / 100)
+    return float(low), float(high)
 
 
 def mask_image(image: Image.Image, mask: Image.Image) -> Image.Image:
@@ -240,7 +530,49 @@ class _ImageMaskCountMismatchError(Exception):
         super().__init__(message)
 
 
-def mask_image_bulk(image_dir: str, mask_dir: str, masked_dir: str) -> None:
+def _mask_image_one(image_path: str, mask_path: str, masked_path: str) -> bool:
+    """
+    Mask a single image file with its mask file.
+
+    :return: True if the masked image was written, False otherwise.
+    :rtype: bool
+    """
+    name = Path(image_path).name
+
+    if not os.path.exists(mask_path):
+        print(f"Skipping {name} due to missing mask.")
+        return False
+
+    image = Image.open(image_path)
+    mask = Image.open(mask_path)
+
+    if image.size != mask.size:
+        print(f"Skipping {name} due to mismatched dimensions.")
+        return False
+    else:
+        with metrics.timer("png_decode"):
+            image.load()
+            mask.load()
+        metrics.count_file("png_decode", "bytes_read", image_path)
+        metrics.count_file("png_decode", "bytes_read", mask_path)
+
+        with metrics.timer("masking"):
+            masked_image = mask_image(image, mask)
+
+    with metrics.timer("png_encode"):
+        masked_image.save(masked_path)
+    metrics.count_file("png_encode", "bytes_written", masked_path)
+    return True
+
+
+def mask_image_bulk(
+    image_dir: str,
+    mask_dir: str,
+    masked_dir: str,
+    workers: int = 1,
+    chunk_size: int = 1,
+    resume: bool = False,
+) -> BulkSummary:
     """
     Mask a directory of images with a directory of mask images.
 
@@ -253,6 +585,18 @@ def mask_image_bulk(image_dir: str, mask_dir: str, masked_dir: str) -> None:
     :param masked_dir: The path to the directory to save the masked images.
     :type masked_dir: str
 
+    :param workers: The number of worker processes.
+    :type workers: int
+
+    :param chunk_size: The number of images sent to a worker process at once.
+    :type chunk_size: int
+
+    :param resume: If True, skips images whose masked image already exists.
+    :type resume: bool
+
+    :return: The summary of the masking.
+    :rtype: BulkSummary
+
     :raises _FileNotFoundError: If no images or masks are found in the directories.
     :raises _ImageMaskCountMismatchError: If the number of images and masks do not match.
     """
@@ -267,23 +611,13 @@ def mask_image_bulk(image_dir: str, mask_dir: str, masked_dir: str) -> None:
 
     os.makedirs(masked_dir, exist_ok=True)
 
-    for image_path in image_paths:
-        mask_path = Path(mask_dir) / image_path.name
-
-        if not mask_path.exists():
-            print(f"Skipping {image_path.name} due to missing mask.")
-            continue
-
-        image = Image.open(image_path)
-        mask = Image.open(mask_path)
-
-        if image.size != mask.size:
-            print(f"Skipping {image_path.name} due to mismatched dimensions.")
-            continue
-        else:
-            masked_image = mask_image(image, mask)
+    tasks = [
+        (str(image_path), str(Path(mask_dir) / image_path.name), str(Path(masked_dir) / image_path.name))
+        for image_path in image_paths
+    ]
+    pending = [task for task in tasks if not (resume and os.path.exists(task[2]))]
 
-        masked_image.save(Path(masked_dir) / image_path.name)
+    return _run_tasks("apply_mask", _mask_image_one, pending, workers, chunk_size, skipped=len(tasks) - len(pending))
 
 
 class _ColumnNotFoundError(Exception):
@@ -295,7 +629,7 @@ class _ColumnNotFoundError(Exception):
         super().__init__(f"Column {column} not found in the catalog.")
 
 
-def _get_class_labels(catalog: pd.Series, classes: dict, cls_col: str) -> str:
+def get_class_labels(catalog: pd.Series, classes: dict, cls_col: str) -> str:
     """
     Get the class labels for the celestial objects in the catalog.
 
@@ -324,9 +658,37 @@ def _get_class_labels(catalog: pd.Series, classes: dict, cls_col: str) -> str:
     return ""
 
 
+def _celestial_capture_one(survey: str, ra: float, dec: float, filename: str, retries: int = 0) -> bool:
+    """
+    Capture a single celestial image, reporting failures instead of raising.
+
+    :return: True if the image was captured, False otherwise.
+    :rtype: bool
+    """
+    for attempt in range(retries + 1):
+        try:
+            celestial_capture(survey, ra, dec, filename)
+        except Exception as err:
+            if attempt < retries:
+                metrics.count("skyview", "retries")
+                continue
+            print(f"Failed to capture image. {err}")
+            return False
+        else:
+            return True
+    return False
+
+
 def celestial_capture_bulk(
-    catalog: pd.DataFrame, survey: str, img_dir: str, classes: Optional[dict] = None, cls_col: Optional[str] = None
-) -> None:
+    catalog: pd.DataFrame,
+    survey: str,
+    img_dir: str,
+    classes: Optional[dict] = None,
+    cls_col: Optional[str] = None,
+    workers: int = 1,
+    resume: bool = False,
+    retries: int = 0,
+) -> BulkSummary:
     """
     Capture celestial images for a catalog of celestial objects.
 
@@ -344,9 +706,22 @@ def celestial_capture_bulk(
 
     :param cls_col: The name of the column containing the class labels.
 
+    :param workers: The number of concurrent SkyView requests.
+    :type workers: int
+
+    :param resume: If True, skips objects whose image already exists.
+    :type resume: bool
+
+    :param retries: The number of times a failed SkyView request is retried.
+    :type retries: int
+
+    :return: The summary of the capture.
+    :rtype: BulkSummary
+
     :raises _InvalidCoordinatesError: If coordinates are invalid.
     """
     failed = pd.DataFrame(columns=catalog.columns)
+    tasks = []
     for _, entry in catalog.iterrows():
         try:
             tag = celestial_tag(entry)
@@ -355,19 +730,27 @@ def celestial_capture_bulk(
             right_ascension = coordinate.ra.deg
             declination = coordinate.dec.deg
 
-            label = _get_class_labels(entry, classes, cls_col) if classes is not None and cls_col is not None else ""
+            label = get_class_labels(entry, classes, cls_col) if classes is not None and cls_col is not None else ""
 
             if "filename" in catalog.columns:
                 filename = f'{img_dir}/{label}_{entry["filename"]}.fits'
             else:
                 filename = f"{img_dir}/{label}_{tag}.fits"
 
-            celestial_capture(survey, right_ascension, declination, filename)
+            tasks.append((survey, right_ascension, declination, filename, retries))
         except Exception as err:
             series = entry.to_frame().T
             failed = pd.concat([failed, series], ignore_index=True)
             print(f"Failed to capture image. {err}")
 
+    pending = [task for task in tasks if not (resume and os.path.exists(task[3]))]
+    summary = _run_tasks(
+        "capture", _celestial_capture_one, pending, workers, threads=True, skipped=len(tasks) - len(pending)
+    )
+    metrics.count("capture", "failures", len(failed))
+
+    return summary._replace(total=summary.total + len(failed), failed=summary.failed + len(failed))
+
 
 def dataframe_to_html(catalog: pd.DataFrame, save_dir: str) -> None:
     """
@@ -382,40 +765,113 @@ def dataframe_to_html(catalog: pd.DataFrame, save_dir: str) -> None:
     catalog.to_html(os.path.join(save_dir, "catalog.html"))
 
 
-def compute_mean_std(dataloader: torch.utils.data.DataLoader) -> tuple[torch.Tensor, torch.Tensor]:
+def compute_mean_std(dataloader: "torch.utils.data.DataLoader") -> tuple["torch.Tensor", "torch.Tensor"]:
     """
     Compute the mean and standard deviation of the dataset.
 
+    The statistics are accumulated per channel in float64 in a single streaming
+    pass, so memory use does not grow with the size of the dataset.
+
     :param dataloader: The dataloader for the dataset.
     :type dataloader: torch.utils.data.DataLoader
 
     :return: The mean and standard deviation of the dataset.
     :rtype: tuple[torch.Tensor, torch.Tensor]
     """
-    data = torch.tensor([])
+    running = RunningMeanStd()
+    dtype = torch.get_default_dtype()
     for batch in dataloader:
-        data = torch.cat((data, batch[0]), 0)
+        images = batch[0]
+        dtype = images.dtype if images.is_floating_point() else dtype
+        running.update(images.detach().cpu().numpy())
 
-    mean = torch.mean(data, dim=(0, 2, 3))
-    std = torch.std(data, dim=(0, 2, 3))
+    mean = torch.from_numpy(running.mean).to(dtype)
+    std = torch.from_numpy(running.std()).to(dtype)
 
     return mean, std
 
 
-def remove_artifacts(folder: str, extension: list[str]) -> None:
+def compute_quantiles(
+    dataloader: "torch.utils.data.DataLoader",
+    quantiles: tuple[float, ...] = (0.005, 0.5, 0.995),
+    alpha: float = 0.01,
+) -> "torch.Tensor":
+    """
+    Compute per-channel quantiles of the dataset, e.g. for robust clipping of heavy-tailed images.
+
+    Like :func:`compute_mean_std` this is a single streaming pass; every channel
+    is summarized by a :class:`~rgc.utils.stats.QuantileSketch` of bounded size.
+
+    :param dataloader: The dataloader for the dataset.
+    :type dataloader: torch.utils.data.DataLoader
+
+    :param quantiles: The quantiles in [0, 1].
+    :type quantiles: tuple[float, ...]
+
+    :param alpha: The relative accuracy of the quantiles.
+    :type alpha: float
+
+    :return: The quantiles of every channel, of shape (channels, len(quantiles)).
+    :rtype: torch.Tensor
+    """
+    sketches: list[QuantileSketch] = []
+    for batch in dataloader:
+        images = batch[0].detach().cpu().numpy()
+        while len(sketches) < images.shape[1]:
+            sketches.append(QuantileSketch(alpha))
+        for channel, sketch in enumerate(sketches):
+            sketch.update(images[:, channel])
+
+    return torch.tensor(np.stack([sketch.quantile(np.asarray(quantiles)) for sketch in sketches]))
+
+
+def remove_artifacts(folder: str, extension: list[str], dry_run: bool = False) -> list[str]:
     """
     Remove files with the given extensions from a folder.
 
+    The folder is scanned once with :func:`os.scandir`, which avoids a ``stat``
+    call per entry. Subdirectories are left untouched.
+
     :param folder: Path to the folder to clear
     :type folder: str
     :param extension: List of file with the given extensions to keep
     :type extension: list
+    :param dry_run: If True, only reports the files that would be removed
+    :type dry_run: bool
+
+    :return: Paths of the removed files, or of the files that would be removed in a dry run
+    :rtype: list[str]
     """
-    for file in os.listdir(folder):
-        if not file.endswith(tuple(extension)):
-            os.remove(os.path.join(folder, file))
+    keep = tuple(extension)
+    with os.scandir(folder) as entries:
+        artifacts = [
+            entry.path for entry in entries if not entry.name.endswith(keep) and not entry.is_dir(follow_symlinks=False)
+        ]
+
+    if dry_run:
+        print(f"Would remove {len(artifacts)} artifacts from {folder} keeping extensions {', '.join(extension)}")
+        for path in artifacts:
+            print(f"  {path}")
+        return artifacts
+
+    for path in artifacts:
+        os.remove(path)
 
     print(f"Artifacts removed from {folder} with extensions {', '.join(extension)}")
+    return artifacts
+
+
+def _scratch_root() -> Optional[str]:
+    """
+    Get the directory for scratch files, preferring a memory-backed tmpfs.
+
+    :return: ``/dev/shm`` if it is available and writable, otherwise None for the system default.
+    :rtype: Optional[str]
+    """
+    shm = "/dev/shm"  # noqa: S108
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        return shm
+    return None
 
 
 def generate_mask(
@@ -426,10 +882,15 @@ def generate_mask(
     dilation: int,
     threshold_pixel: float = 5.0,
     threshold_island: float = 3.0,
-) -> None:
+    scratch_dir: Optional[str] = None,
+) -> bool:
     """
     Detect sources in the image and generate a mask.
 
+    PyBDSF runs in a private scratch directory, on tmpfs when available, so its
+    log and intermediate files never land next to the images. Only the mask is
+    moved to ``mask_dir``.
+
     :param image_path: Path to the image file
     :type image_path: str
 
@@ -450,34 +911,89 @@ def generate_mask(
 
     :param threshold_island: Threshold for island detection in number of sigma above the mean
     :type threshold_island: float
-    """
-    try:
-        image = bdsf.process_image(
-            image_path,
-            beam=beam,
-            thresh_isl=threshold_island,
-            thresh_pix=threshold_pixel,
-            frequency=freq,
-        )
 
-        mask_file = Path(mask_dir) / Path(image_path).name
-        Path(mask_file).parent.mkdir(parents=True, exist_ok=True)
+    :param scratch_dir: Directory in which the scratch directory is created, defaults to tmpfs
+    :type scratch_dir: Optional[str]
 
-        image.export_image(
-            img_type="island_mask",
-            outfile=mask_file,
-            clobber=True,
-            mask_dilation=dilation,
-        )
+    :return: True if the mask was written by this run, False if PyBDSF or the export failed.
+    :rtype: bool
+    """
+    try:
+        with tempfile.TemporaryDirectory(prefix="rgc-bdsf-", dir=scratch_dir or _scratch_root()) as scratch:
+            with metrics.timer("bdsf"):
+                image = bdsf.process_image(
+                    image_path,
+                    beam=beam,
+                    thresh_isl=threshold_island,
+                    thresh_pix=threshold_pixel,
+                    frequency=freq,
+                    outdir=scratch,
+                    quiet=True,
+                )
+            metrics.count_file("bdsf", "bytes_read", image_path)
+
+            mask_file = Path(mask_dir) / Path(image_path).name
+            Path(mask_file).parent.mkdir(parents=True, exist_ok=True)
+
+            scratch_mask = os.path.join(scratch, "island_mask.fits")
+            with metrics.timer("mask_export"):
+                image.export_image(
+                    img_type="island_mask",
+                    outfile=scratch_mask,
+                    clobber=True,
+                    mask_dilation=dilation,
+                )
+                shutil.move(scratch_mask, mask_file)
+            metrics.count_file("mask_export", "bytes_written", str(mask_file))
 
     except Exception:
+        metrics.count("bdsf", "failures")
         print("Failed to generate mask.")
-        return None
+        return False
+    return True
+
+
+def _generate_mask_one(
+    image_path: str,
+    mask_dir: str,
+    freq: float,
+    beam: tuple[float, float, float],
+    dilation: int,
+    threshold_pixel: float,
+    threshold_island: float,
+) -> bool:
+    """
+    Generate the mask of a single image, reporting failures instead of raising.
+
+    :return: True if the mask was generated, False otherwise.
+    :rtype: bool
+    """
+    # Judged from the run itself, a mask left over from an earlier run does not count
+    try:
+        return generate_mask(
+            image_path,
+            mask_dir,
+            freq,
+            beam,
+            dilation,
+            threshold_pixel,
+            threshold_island,
+        )
+    except Exception as err:
+        print(f"Failed to generate mask. {err}")
+        return False
 
 
 def generate_mask_bulk(
-    catalog: pd.DataFrame, img_dir: str, mask_dir: str, freq: float, beam: tuple[float, float, float]
-) -> None:
+    catalog: pd.DataFrame,
+    img_dir: str,
+    mask_dir: str,
+    freq: float,
+    beam: tuple[float, float, float],
+    workers: int = 1,
+    chunk_size: int = 1,
+    resume: bool = False,
+) -> Optional[BulkSummary]:
     """
     Generate masks for a catalog of celestial objects.
 
@@ -495,7 +1011,20 @@ def generate_mask_bulk(
 
     :param beam: Beam size of the image in arcsec
     :type beam: tuple
+
+    :param workers: The number of worker processes.
+    :type workers: int
+
+    :param chunk_size: The number of images sent to a worker process at once.
+    :type chunk_size: int
+
+    :param resume: If True, skips images whose mask already exists.
+    :type resume: bool
+
+    :return: The summary of the mask generation, or None if the catalog could not be read.
+    :rtype: Optional[BulkSummary]
     """
+    tasks = []
     for _, entry in catalog.iterrows():
         try:
             filename = entry["filename"]
@@ -504,16 +1033,12 @@ def generate_mask_bulk(
             threshold_pixel = entry["background sigma"]
             threshold_island = entry["foreground sigma"]
 
-            generate_mask(
-                image_path,
-                mask_dir,
-                freq,
-                beam,
-                dilation,
-                threshold_pixel,
-                threshold_island,
-            )
+            tasks.append((image_path, mask_dir, freq, beam, dilation, threshold_pixel, threshold_island))
 
         except Exception as err:
             print(f"Failed to generate mask. {err}")
             return None
+
+    pending = [task for task in tasks if not (resume and (Path(mask_dir) / Path(task[0]).name).exists())]
+
+    return _run_tasks("mask", _generate_mask_one, pending, workers, chunk_size, skipped=len(tasks) - len(pending))
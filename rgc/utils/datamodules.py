@@ -0,0 +1,411 @@
+"""
+PyTorch Lightning DataModules for the radio galaxy datasets.
+
+These live apart from :mod:`rgc.utils.datasets` because ``pytorch_lightning``
+takes seconds to import and is not needed by the datasets themselves.
+
+All DataModules share :class:`RadioGalaxyDataModule`, which builds the
+DataLoaders with persistent workers, pinned memory and a worker initializer
+limiting every worker to one thread, unless told otherwise.
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import contextlib
+import os
+from typing import TYPE_CHECKING, Any, Callable, ClassVar, Optional
+
+import pytorch_lightning as pl
+import torch
+from lightning_fabric.utilities.seed import pl_worker_init_function
+from torch.utils.data import Dataset, DistributedSampler
+
+from rgc.utils.datasets import Bent, MiraBest, RGZ20k, Transforms
+from rgc.utils.transform_cache import LRUDataset, cache_transform_outputs
+
+if TYPE_CHECKING:
+    import albumentations
+
+
+def worker_init(worker_id: int) -> None:
+    """
+    Limit a DataLoader worker to a single thread.
+
+    Every worker otherwise starts as many torch and OpenCV threads as there
+    are cores, which oversubscribes the CPU once several workers run.
+    Lightning only seeds the workers of a DataLoader without a worker
+    initializer, so after ``seed_everything(workers=True)`` this seeds the
+    worker by rank as Lightning would.
+
+    :param worker_id: The ID of the worker.
+    :type worker_id: int
+    """
+    if int(os.environ.get("PL_SEED_WORKERS", 0)):
+        pl_worker_init_function(worker_id)
+    torch.set_num_threads(1)
+    with contextlib.suppress(ImportError):
+        import cv2
+
+        cv2.setNumThreads(0)
+
+
+class RadioGalaxyDataModule(pl.LightningDataModule):
+    """
+    A base PyTorch Lightning DataModule for the radio galaxy datasets.
+
+    Subclasses build a split of their dataset in :meth:`_dataset`. Validation
+    and testing both run on the test split with ``test_transform`` and share
+    one dataset, so a deterministic test transform is computed only once.
+    """
+
+    folder: ClassVar[str]
+    # Whether deterministic datasets are materialized, which requires tensor targets
+    materialize: ClassVar[bool] = True
+
+    train_dataset: Dataset
+    val_dataset: Dataset
+    test_dataset: Dataset
+
+    def __init__(
+        self,
+        data_dir: str,
+        batch_size: int = 32,
+        num_workers: int = 4,
+        transform: Optional["albumentations.Compose"] = None,
+        test_transform: Optional["albumentations.Compose"] = None,
+        cache_outputs: bool = True,
+        lru_size: int = 0,
+        persistent_workers: Optional[bool] = None,
+        pin_memory: Optional[bool] = None,
+        prefetch_factor: Optional[int] = None,
+        worker_init_fn: Optional[Callable[[int], None]] = worker_init,
+    ) -> None:
+        """
+        Initialize the DataModule.
+
+        :param data_dir: The directory containing the dataset folder.
+        :type data_dir: str
+        :param batch_size: The batch size.
+        :type batch_size: int
+        :param num_workers: The number of workers for data loading.
+        :type num_workers: int
+        :param transform: The transform to apply to the training data.
+        :type transform: Optional[albumentations.Compose]
+        :param test_transform: The transform to apply to the test data.
+        :type test_transform: Optional[albumentations.Compose]
+        :param cache_outputs: Whether to compute the samples of deterministic transforms only once.
+        :type cache_outputs: bool
+        :param lru_size: The number of decoded images cached per worker for random transforms, 0 for none.
+        :type lru_size: int
+        :param persistent_workers: Whether to keep the workers alive between epochs, by default if there are any.
+        :type persistent_workers: Optional[bool]
+        :param pin_memory: Whether to load batches into pinned memory, by default if CUDA is available.
+        :type pin_memory: Optional[bool]
+        :param prefetch_factor: The number of batches loaded in advance by each worker, None for the default.
+        :type prefetch_factor: Optional[int]
+        :param worker_init_fn: The function called in every worker on startup.
+        :type worker_init_fn: Optional[Callable[[int], None]]
+        """
+        super().__init__()
+        self.data_dir = data_dir
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.transform = transform
+        self.test_transform = test_transform
+        self.cache_outputs = cache_outputs
+        self.lru_size = lru_size
+        self.persistent_workers = num_workers > 0 if persistent_workers is None else persistent_workers
+        self.pin_memory = torch.cuda.is_available() if pin_memory is None else pin_memory
+        self.prefetch_factor = prefetch_factor
+        self.worker_init_fn = worker_init_fn
+        self._evaluation: Optional[Dataset] = None
+
+    def prepare_data(self) -> None:
+        """
+        Download the dataset and build the memory-mapped caches of both splits.
+
+        Lightning calls this in a single process per node before any rank runs
+        :meth:`setup`. The ranks then only memory-map the cached arrays instead
+        of each unpickling the batches, so start-up does not grow with the
+        number of ranks and the images are held once per node, in the page cache.
+        """
+        for train in (True, False):
+            self._dataset(train=train, transform=None)
+
+    def setup(self, stage: Optional[str] = None) -> None:
+        """
+        Setup the DataModule.
+
+        Only the datasets needed by the stage are built, and datasets built by
+        an earlier stage are reused. The validation and test datasets are the
+        same dataset, the test split with ``test_transform``; the random
+        training ``transform`` is applied to the training split only. Datasets
+        with a deterministic transform, such as the usual ``test_transform``,
+        are materialized in shared memory on their first pass, see
+        :func:`~rgc.utils.transform_cache.cache_transform_outputs`, so every
+        validation pass after the first, and the test pass, read cached tensors.
+        In a distributed run every rank materializes only the samples its
+        distributed sampler loads.
+
+        :param stage: The stage to setup. Can be "fit", "validate", "test", or None for all.
+        :type stage: Optional[str]
+        """
+        if stage in (None, "fit") and not hasattr(self, "train_dataset"):
+            self.train_dataset = self._cached(self._dataset(train=True, transform=self.transform))
+
+        if stage in (None, "fit", "validate") and not hasattr(self, "val_dataset"):
+            self.val_dataset = self._evaluation_dataset()
+
+        if stage in (None, "test") and not hasattr(self, "test_dataset"):
+            self.test_dataset = self._evaluation_dataset()
+
+    def _dataset(self, train: bool, transform: Optional["albumentations.Compose"]) -> Dataset:
+        """
+        Build a split of the dataset under ``data_dir``.
+
+        :param train: Whether to build the training split.
+        :type train: bool
+        :param transform: The albumentations transform to apply to the images.
+        :type transform: Optional[albumentations.Compose]
+        :return: The dataset.
+        :rtype: Dataset
+        """
+        raise NotImplementedError
+
+    def _cached(self, dataset: Dataset, shard: bool = False) -> Dataset:
+        """
+        Wrap a dataset in the enabled transform output and decoded image caches.
+
+        :param dataset: The dataset.
+        :type dataset: Dataset
+        :param shard: Whether to materialize only the samples of this rank in a distributed run.
+        :type shard: bool
+        :return: The cached dataset.
+        :rtype: Dataset
+        """
+        if self.cache_outputs and self.materialize:
+            return cache_transform_outputs(dataset, self.lru_size, self._shard(dataset) if shard else None)
+        return LRUDataset(dataset, self.lru_size) if self.lru_size > 0 else dataset
+
+    def _shard(self, dataset: Dataset) -> Optional[list[int]]:
+        """
+        Get the indices of an unshuffled dataset loaded by this rank in a distributed run.
+
+        :param dataset: The dataset.
+        :type dataset: Dataset
+        :return: The indices the distributed sampler of Lightning assigns to this rank, None outside distributed runs.
+        :rtype: Optional[list[int]]
+        """
+        options = self.trainer.distributed_sampler_kwargs if self.trainer is not None else None
+        if not options:
+            return None
+        return list(DistributedSampler(dataset, shuffle=False, **options))
+
+    def _evaluation_dataset(self) -> Dataset:
+        """
+        Get the dataset of validation and testing, building it on first use.
+
+        :return: The test split with the test transform, cached.
+        :rtype: Dataset
+        """
+        if self._evaluation is None:
+            self._evaluation = self._cached(self._dataset(train=False, transform=self.test_transform), shard=True)
+        return self._evaluation
+
+    def _dataloader(self, dataset: Dataset, shuffle: bool) -> torch.utils.data.DataLoader:
+        """
+        Build a DataLoader with the loading options of the DataModule.
+
+        :param dataset: The dataset.
+        :type dataset: Dataset
+        :param shuffle: Whether to shuffle the dataset every epoch.
+        :type shuffle: bool
+        :return: The DataLoader.
+        :rtype: torch.utils.data.DataLoader
+        """
+        workers = self.num_workers > 0
+        options: dict[str, Any] = {}
+        if workers and self.prefetch_factor is not None:
+            options["prefetch_factor"] = self.prefetch_factor
+
+        return torch.utils.data.DataLoader(
+            dataset,
+            batch_size=self.batch_size,
+            shuffle=shuffle,
+            num_workers=self.num_workers,
+            persistent_workers=workers and self.persistent_workers,
+            pin_memory=self.pin_memory,
+            worker_init_fn=self.worker_init_fn if workers else None,
+            **options,
+        )
+
+    def train_dataloader(self) -> torch.utils.data.DataLoader:
+        """
+        Returns the training dataloader.
+        :return: The training dataloader.
+        :rtype: torch.utils.data.DataLoader
+        """
+        return self._dataloader(self.train_dataset, shuffle=True)
+
+    def val_dataloader(self) -> torch.utils.data.DataLoader:
+        """
+        Returns the validation dataloader.
+        :return: The validation dataloader.
+        :rtype: torch.utils.data.DataLoader
+        """
+        return self._dataloader(self.val_dataset, shuffle=False)
+
+    def test_dataloader(self) -> torch.utils.data.DataLoader:
+        """
+        Returns the test dataloader.
+        :return: The test dataloader.
+        :rtype: torch.utils.data.DataLoader
+        """
+        return self._dataloader(self.test_dataset, shuffle=False)
+
+
+class BentLightningDataModule(RadioGalaxyDataModule):
+    """
+    A PyTorch Lightning DataModule for the BENT dataset.
+    """
+
+    folder = "bent"
+
+    def __init__(
+        self,
+        data_dir: str,
+        batch_size: int = 32,
+        num_workers: int = 4,
+        transform: Optional["albumentations.Compose"] = None,
+        test_transform: Optional["albumentations.Compose"] = None,
+        include_small: bool = False,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Initialize the DataModule.
+
+        :param data_dir: The directory containing the ``bent`` dataset folder.
+        :type data_dir: str
+        :param batch_size: The batch size.
+        :type batch_size: int
+        :param num_workers: The number of workers for data loading.
+        :type num_workers: int
+        :param transform: The transform to apply to the training data.
+        :type transform: Optional[albumentations.Compose]
+        :param test_transform: The transform to apply to the test data.
+        :type test_transform: Optional[albumentations.Compose]
+        :param include_small: Whether to include the small dataset.
+        :type include_small: bool
+        :param kwargs: The caching and loading options of :class:`RadioGalaxyDataModule`.
+        """
+        super().__init__(data_dir, batch_size, num_workers, transform, test_transform, **kwargs)
+        self.include_small = include_small
+
+    def _dataset(self, train: bool, transform: Optional["albumentations.Compose"]) -> Bent:
+        """
+        Build a split of the BENT dataset under ``data_dir``.
+
+        :param train: Whether to build the training split.
+        :type train: bool
+        :param transform: The albumentations transform to apply to the images.
+        :type transform: Optional[albumentations.Compose]
+        :return: The dataset.
+        :rtype: Bent
+        """
+        return Bent(
+            root=os.path.join(self.data_dir, self.folder),
+            download=True,
+            train=train,
+            transform=Transforms(transforms=transform),
+            target_transform=None,
+            include_small=self.include_small,
+        )
+
+
+class MiraBestLightningDataModule(RadioGalaxyDataModule):
+    """
+    A PyTorch Lightning DataModule for the MiraBest dataset.
+    """
+
+    folder = "mirabest"
+
+    def _dataset(self, train: bool, transform: Optional["albumentations.Compose"]) -> MiraBest:
+        """
+        Build a split of the MiraBest dataset under ``data_dir``.
+
+        :param train: Whether to build the training split.
+        :type train: bool
+        :param transform: The albumentations transform to apply to the images.
+        :type transform: Optional[albumentations.Compose]
+        :return: The dataset.
+        :rtype: MiraBest
+        """
+        return MiraBest(
+            root=os.path.join(self.data_dir, self.folder),
+            download=True,
+            train=train,
+            transform=Transforms(transforms=transform),
+            target_transform=None,
+        )
+
+
+class RGZ20kLightningDataModule(RadioGalaxyDataModule):
+    """
+    A PyTorch Lightning DataModule for the unlabeled RGZ20k dataset, for pretraining.
+
+    Its samples are (image, metadata) pairs, see :class:`~rgc.utils.datasets.RGZ20k`.
+    """
+
+    folder = "rgz20k"
+    # The metadata holds string IDs, which the shared tensors of the output cache cannot
+    materialize = False
+
+    def __init__(
+        self,
+        data_dir: str,
+        *args: Any,
+        remove_duplicates: bool = True,
+        cut_threshold: float = 0.0,
+        mb_cut: bool = False,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Initialize the DataModule.
+
+        :param data_dir: The directory containing the ``rgz20k`` dataset folder.
+        :type data_dir: str
+        :param remove_duplicates: Whether to remove duplicate images.
+        :type remove_duplicates: bool
+        :param cut_threshold: The smallest largest angular size of the kept sources.
+        :type cut_threshold: float
+        :param mb_cut: Whether to remove the sources in MiraBest.
+        :type mb_cut: bool
+        :param args: The arguments of :class:`RadioGalaxyDataModule`.
+        :param kwargs: The keyword arguments of :class:`RadioGalaxyDataModule`.
+        """
+        super().__init__(data_dir, *args, **kwargs)
+        self.remove_duplicates = remove_duplicates
+        self.cut_threshold = cut_threshold
+        self.mb_cut = mb_cut
+
+    def _dataset(self, train: bool, transform: Optional["albumentations.Compose"]) -> RGZ20k:
+        """
+        Build a split of the RGZ20k dataset under ``data_dir``.
+
+        :param train: Whether to build the training split.
+        :type train: bool
+        :param transform: The albumentations transform to apply to the images.
+        :type transform: Optional[albumentations.Compose]
+        :return: The dataset.
+        :rtype: RGZ20k
+        """
+        return RGZ20k(
+            root=os.path.join(self.data_dir, self.folder),
+            download=True,
+            train=train,
+            transform=Transforms(transforms=transform),
+            remove_duplicates=self.remove_duplicates,
+            cut_threshold=self.cut_threshold,
+            mb_cut=self.mb_cut,
+        )
@@ -9,19 +9,464 @@ Datasets for the BENT, RGZ20k, and MiraBest datasets.
 __author__ = "Mir Sazzat Hossain"
 
 
+import contextlib
+import hashlib
+import json
 import os
 import pickle
+import re
 import tarfile
-from typing import ClassVar, Optional
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, ClassVar, Optional, Union, cast
 
-import albumentations
 import numpy as np
-import pytorch_lightning as pl
 import torch
-import torchvision
 from PIL import Image
 from torch.utils.data import Dataset
-from torchvision.datasets.utils import check_integrity, download_url
+
+from rgc._lazy import LazyImport
+from rgc.utils._io import batch_signature
+
+if TYPE_CHECKING:
+    import albumentations
+    import torchvision
+    from astropy.io import fits
+    from torchvision.datasets.utils import check_integrity, download_file_from_google_drive
+else:
+    # torchvision and albumentations are imported on first use to keep `import rgc` fast.
+    check_integrity = LazyImport("torchvision.datasets.utils", "check_integrity")
+    download_file_from_google_drive = LazyImport("torchvision.datasets.utils", "download_file_from_google_drive")
+    fits = LazyImport("astropy.io.fits")
+
+
+def _cached_arrays(
+    cache_dir: str,
+    sources: list[str],
+    build: Callable[[], dict[str, np.ndarray]],
+    cache: bool = True,
+    signature: Optional[list[list]] = None,
+) -> dict[str, np.ndarray]:
+    """
+    Load arrays from a memory-mapped ``.npy`` cache, building and caching them on the first load.
+
+    The cache is valid as long as the size and modification time of the source
+    batch files are unchanged. Arrays are written atomically and the manifest
+    last, so concurrent jobs either see a complete cache or rebuild it. Loading
+    with ``mmap_mode="r"`` lets every DataLoader worker and every job on the
+    node share the same pages of the page cache. If the cache cannot be
+    written, e.g. in a read-only root, the arrays just built are returned.
+
+    :param cache_dir: The directory of the cache.
+    :type cache_dir: str
+
+    :param sources: The paths to the batch files the arrays are built from.
+    :type sources: list[str]
+
+    :param build: A function building the arrays from the batch files.
+    :type build: Callable[[], dict[str, np.ndarray]]
+
+    :param cache: If False, builds the arrays without reading or writing the cache.
+    :type cache: bool
+
+    :param signature: The signature of the sources if already known, see :func:`~rgc.utils._io.batch_signature`.
+    :type signature: Optional[list[list]]
+
+    :return: The arrays by name, memory-mapped if cached.
+    :rtype: dict[str, np.ndarray]
+    """
+    if not cache:
+        return build()
+
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    if signature is None:
+        signature = batch_signature(sources)
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as infile:
+            manifest = json.load(infile)
+        if manifest["sources"] == signature:
+            return {name: np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode="r") for name in manifest["arrays"]}
+
+    arrays = build()
+    if any(array.dtype == object for array in arrays.values()):
+        return arrays
+
+    # The cache is only an optimization, e.g. the dataset folder may be read-only
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for name, array in arrays.items():
+            with tempfile.NamedTemporaryFile(dir=cache_dir, suffix=".npy", delete=False) as outfile:
+                np.save(outfile, np.ascontiguousarray(array))
+            os.replace(outfile.name, os.path.join(cache_dir, f"{name}.npy"))
+
+        with tempfile.NamedTemporaryFile("w", dir=cache_dir, suffix=".json", delete=False) as manifest_file:
+            json.dump({"sources": signature, "arrays": list(arrays)}, manifest_file)
+        os.replace(manifest_file.name, manifest_path)
+    except OSError:
+        return arrays
+
+    return {name: np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode="r") for name in arrays}
+
+
+def _read_records(folder: str) -> dict[str, dict]:
+    """
+    Read the integrity records of a folder, see :func:`_check_files`.
+
+    :param folder: The folder.
+    :type folder: str
+
+    :return: The size, modification time and checksum of every recorded file.
+    :rtype: dict[str, dict]
+    """
+    record_path = os.path.join(folder, ".integrity.json")
+    if os.path.exists(record_path):
+        with open(record_path) as infile, contextlib.suppress(ValueError):
+            return cast(dict, json.load(infile))
+    return {}
+
+
+def _write_records(folder: str, checked: dict[str, dict]) -> None:
+    """
+    Add files that passed their check to the integrity records of a folder.
+
+    :param folder: The folder.
+    :type folder: str
+
+    :param checked: The size, modification time and checksum of every checked file.
+    :type checked: dict[str, dict]
+    """
+    if not checked:
+        return
+
+    # The cache is only an optimization, e.g. the dataset folder may be read-only
+    with contextlib.suppress(OSError):
+        records = _read_records(folder)
+        with tempfile.NamedTemporaryFile("w", dir=folder, suffix=".json", delete=False) as outfile:
+            json.dump({**records, **checked}, outfile, indent=2, sort_keys=True)
+        os.replace(outfile.name, os.path.join(folder, ".integrity.json"))
+
+
+def _check_files(folder: str, files: list[list[str]], verify: bool = False) -> bool:
+    """
+    Check the MD5 checksums of files, skipping files unchanged since their last successful check.
+
+    After a file passes the check, its size, modification time and checksum are
+    recorded in ``.integrity.json`` in the folder. Later checks hash the file
+    again only if its size or modification time changed.
+
+    :param folder: The folder containing the files.
+    :type folder: str
+
+    :param files: The name and expected MD5 checksum of every file.
+    :type files: list[list[str]]
+
+    :param verify: If True, hashes every file even if it is unchanged.
+    :type verify: bool
+
+    :return: True if all files are found and intact, False otherwise.
+    :rtype: bool
+    """
+    records = _read_records(folder)
+
+    checked = {}
+    try:
+        for filename, md5 in files:
+            path = os.path.join(folder, filename)
+            if not os.path.isfile(path):
+                return False
+
+            stat = os.stat(path)
+            record = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "md5": md5}
+            if not verify and records.get(filename) == record:
+                continue
+            if not check_integrity(path, md5):
+                return False
+            checked[filename] = record
+        return True
+    finally:
+        _write_records(folder, checked)
+
+
+_CHUNK_SIZE = 1 << 20
+
+
+class _HashingReader:
+    """
+    A file-like reader computing the MD5 checksum of everything read through it.
+    """
+
+    def __init__(self, fileobj: BinaryIO) -> None:
+        """
+        Initialize the reader.
+
+        :param fileobj: The underlying binary file or response.
+        :type fileobj: BinaryIO
+        """
+        self.fileobj = fileobj
+        self.md5 = hashlib.md5(usedforsecurity=False)
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Read and hash bytes.
+
+        :param size: The maximum number of bytes, or -1 for all.
+        :type size: int
+
+        :return: The bytes read.
+        :rtype: bytes
+        """
+        data = self.fileobj.read(size)
+        self.md5.update(data)
+        return data
+
+    def drain(self) -> None:
+        """
+        Read and hash the rest of the stream.
+        """
+        while self.read(_CHUNK_SIZE):
+            pass
+
+
+def _extract_member(tar: tarfile.TarFile, member: tarfile.TarInfo, path: str, md5: Optional[str]) -> dict:
+    """
+    Extract a file from a streamed archive, verifying its MD5 checksum while writing it.
+
+    The file is written under a temporary name and renamed once complete and
+    verified, so an interrupted or corrupted extraction never leaves a partial
+    file under the final name.
+
+    :param tar: The archive, opened for streaming.
+    :type tar: tarfile.TarFile
+
+    :param member: The member to extract.
+    :type member: tarfile.TarInfo
+
+    :param path: The destination of the file.
+    :type path: str
+
+    :param md5: The expected MD5 checksum, or None if unknown.
+    :type md5: Optional[str]
+
+    :return: The integrity record of the file.
+    :rtype: dict
+
+    :raises RuntimeError: If the checksum of the file does not match.
+    """
+    source = tar.extractfile(member)
+    if source is None:
+        raise RuntimeError(f"Cannot extract {member.name}.")  # noqa: TRY003
+
+    digest = hashlib.md5(usedforsecurity=False)
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as outfile:
+        try:
+            while chunk := source.read(_CHUNK_SIZE):
+                digest.update(chunk)
+                outfile.write(chunk)
+        except BaseException:
+            os.remove(outfile.name)
+            raise
+
+    if md5 is not None and digest.hexdigest() != md5:
+        os.remove(outfile.name)
+        raise RuntimeError(f"{member.name} is corrupted.")  # noqa: TRY003
+    os.replace(outfile.name, path)
+
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "md5": digest.hexdigest()}
+
+
+def _google_drive_file_id(url: str) -> Optional[str]:
+    """
+    Get the file ID of a Google Drive link.
+
+    :param url: The URL.
+    :type url: str
+
+    :return: The file ID, or None if the URL is not a Google Drive file link.
+    :rtype: Optional[str]
+    """
+    parts = urllib.parse.urlparse(url)
+    if re.fullmatch(r"(drive|docs)\.google\.com", parts.netloc) is None:
+        return None
+    match = re.match(r"/file/d/([^/]+)", parts.path)
+    return match.group(1) if match is not None else None
+
+
+@contextlib.contextmanager
+def _open_archive(url: str, root: str) -> Iterator[BinaryIO]:
+    """
+    Open a remote archive for reading.
+
+    Google Drive serves a confirmation page instead of large files, so Drive
+    links are downloaded with torchvision to a temporary file in ``root``,
+    removed once read. Other URLs are streamed with ``urllib``, and an
+    ``https`` URL failing to open is retried over ``http``.
+
+    :param url: The URL of the archive.
+    :type url: str
+
+    :param root: The directory of the temporary download.
+    :type root: str
+
+    :return: The binary stream of the archive.
+    :rtype: Iterator[BinaryIO]
+    """
+    file_id = _google_drive_file_id(url)
+    if file_id is not None:
+        with tempfile.TemporaryDirectory(dir=root) as folder:
+            download_file_from_google_drive(file_id, folder, "archive.tar.gz")
+            with open(os.path.join(folder, "archive.tar.gz"), "rb") as archive:
+                yield archive
+        return
+
+    try:
+        response = urllib.request.urlopen(url)  # noqa: S310
+    except (urllib.error.URLError, OSError):
+        if not url.startswith("https:"):
+            raise
+        response = urllib.request.urlopen(url.replace("https:", "http:", 1))  # noqa: S310
+    with response:
+        yield response
+
+
+def _download_and_extract(url: str, root: str, base_folder: str, md5: str, files: list[list[str]]) -> None:
+    """
+    Download, verify and extract a ``.tar.gz`` archive in a single streaming pass.
+
+    The archive is streamed and not written to disk, except for Google Drive
+    links which are downloaded first, see :func:`_open_archive`. Its MD5
+    checksum is computed while it is read, and the dataset files already
+    present and intact are skipped. The dataset files are checked against their
+    own checksums while they are extracted and moved into place at once. Other
+    members have no checksum of their own, so they are extracted to a staging
+    directory and moved into place only once the checksum of the whole archive
+    matches. The checksums of the extracted dataset files are recorded as by
+    :func:`_check_files`, so the following integrity check does not read them
+    again. Google Drive links and any URL supported by ``urllib``, including
+    ``file://``, can be used.
+
+    :param url: The URL of the archive.
+    :type url: str
+
+    :param root: The directory to extract the archive to.
+    :type root: str
+
+    :param base_folder: The folder of the dataset files in the archive.
+    :type base_folder: str
+
+    :param md5: The expected MD5 checksum of the archive.
+    :type md5: str
+
+    :param files: The name and expected MD5 checksum of every dataset file in ``base_folder``.
+    :type files: list[list[str]]
+
+    :raises RuntimeError: If the archive or one of its members is corrupted.
+    """
+    folder = os.path.join(root, base_folder)
+    os.makedirs(folder, exist_ok=True)
+    expected = dict(files)
+    intact = {name for name, file_md5 in files if _check_files(folder, [[name, file_md5]])}
+    root = os.path.realpath(root)
+
+    extracted, skipped = 0, 0
+    checked = {}
+    staged: list[tuple[str, str]] = []
+    with tempfile.TemporaryDirectory(dir=root) as staging, _open_archive(url, root) as response:
+        stream = _HashingReader(response)
+        with tarfile.open(fileobj=stream, mode="r|gz") as tar:  # type: ignore[call-overload]
+            for member in tar:
+                path = os.path.realpath(os.path.join(root, member.name))
+                if os.path.commonpath([root, path]) != root:
+                    raise RuntimeError(f"{member.name} is outside of the extraction directory.")  # noqa: TRY003
+
+                if member.isdir():
+                    os.makedirs(path, exist_ok=True)
+                    continue
+                if not member.isfile():
+                    continue
+
+                name = os.path.basename(path) if os.path.dirname(path) == os.path.realpath(folder) else None
+                if name in intact:
+                    skipped += 1
+                    continue
+
+                if name in expected:
+                    record = _extract_member(tar, member, path, expected[name])
+                    checked[name] = {**record, "md5": expected[name]}
+                else:
+                    # Without a checksum of its own, a member is kept aside until the archive is verified
+                    staged_path = os.path.join(staging, str(len(staged)))
+                    _extract_member(tar, member, staged_path, None)
+                    staged.append((staged_path, path))
+                extracted += 1
+        stream.drain()
+
+        _write_records(folder, checked)
+        if stream.md5.hexdigest() != md5:
+            raise RuntimeError(f"Archive {url} is corrupted.")  # noqa: TRY003
+        for staged_path, path in staged:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(staged_path, path)
+    print(f"Extracted {extracted} files, skipped {skipped} intact files")
+
+
+def _unique_rows(data: np.ndarray) -> np.ndarray:
+    """
+    Find the first occurrence of every unique image.
+
+    Every image is hashed with BLAKE2b and compared byte by byte only with the
+    earlier images of the same hash, which is much faster and leaner than the
+    row sort of ``np.unique(data, axis=0)`` while keeping the same images.
+
+    :param data: The images, with one image per entry of the first axis.
+    :type data: np.ndarray
+
+    :return: The sorted indices of the first occurrence of every unique image.
+    :rtype: np.ndarray
+    """
+    rows = np.ascontiguousarray(data).reshape(len(data), -1)
+    seen: dict[bytes, list[int]] = {}
+    keep = []
+    for index, row in enumerate(rows):
+        candidates = seen.setdefault(hashlib.blake2b(row.tobytes(), digest_size=16).digest(), [])
+        if any(np.array_equal(rows[other], row) for other in candidates):
+            continue
+        candidates.append(index)
+        keep.append(index)
+    return np.asarray(keep, dtype=np.int64)
+
+
+def _transform_image(transform: Optional[Callable], img: np.ndarray, shape: tuple[int, int] = (150, 150)) -> Any:
+    """
+    Apply a transform to an image of the uint8 data array.
+
+    Transforms with a true ``accepts_arrays`` attribute, such as
+    :class:`Transforms`, get the (150, 150) array directly. Other transforms get
+    a PIL image as before.
+
+    :param transform: The transform, or None to return the PIL image.
+    :type transform: Optional[Callable]
+
+    :param img: The image.
+    :type img: np.ndarray
+
+    :param shape: The height and width of the image.
+    :type shape: tuple[int, int]
+
+    :return: The transformed image.
+    :rtype: Any
+    """
+    img = np.reshape(img, shape)
+    if transform is not None and getattr(transform, "accepts_arrays", False):
+        # Views of the read-only memory-mapped cache are copied, gathered batches already are copies
+        return transform(np.require(img, requirements="W"))
+
+    image = Image.fromarray(img, mode="L")
+    return transform(image) if transform is not None else image
 
 
 class Bent(Dataset):
@@ -59,14 +504,20 @@ class Bent(Dataset):
         "md5": "214499a9b09597e8cbb6cd951debe1cc",
     }
 
+    # Labels of the FR-I (NAT) sources and of the small sources excluded unless `include_small`.
+    fr1_labels: ClassVar[list] = ["100", "101"]
+    small_labels: ClassVar[list] = ["101", "201"]
+
     def __init__(
         self,
         root: str,
         train: bool = True,
-        transform: Optional[torchvision.transforms.Compose] = None,
-        target_transform: Optional[torchvision.transforms.Compose] = None,
+        transform: Optional["torchvision.transforms.Compose"] = None,
+        target_transform: Optional["torchvision.transforms.Compose"] = None,
         download: bool = False,
         include_small: bool = False,
+        cache: bool = True,
+        verify: bool = False,
     ) -> None:
         """
         Initialize the BENT dataset.
@@ -83,12 +534,17 @@ class Bent(Dataset):
         :type download: bool
         :param include_small: If True, includes the small dataset.
         :type include_small: bool
+        :param cache: If True, loads the arrays from a memory-mapped cache, created on first use.
+        :type cache: bool
+        :param verify: If True, re-hashes the batch files even if they are unchanged since their last check.
+        :type verify: bool
         """
         self.root = os.path.expanduser(root)
         self.transform = transform
         self.target_transform = target_transform
         self.train = train
         self.include_small = include_small
+        self.verify = verify
 
         if download:
             self.download()
@@ -97,8 +553,27 @@ class Bent(Dataset):
             raise RuntimeError("Dataset not found or corrupted. You can use download=True to download it.")  # noqa: TRY003
 
         downloaded_list = self.train_list if self.train else self.test_list
-        self.data = []
-        self.target = []
+        split = ("train" if self.train else "test") + ("-small" if self.include_small else "")
+        arrays = _cached_arrays(
+            os.path.join(self.root, self.base_folder, "cache", split),
+            [os.path.join(self.root, self.base_folder, file_name) for file_name, _ in downloaded_list],
+            self._load_batches,
+            cache,
+        )
+        self.data = arrays["data"]
+        self.target = arrays["target"]
+
+        self._load_meta()
+
+    def _load_batches(self) -> dict[str, np.ndarray]:
+        """
+        Load the images and targets of the split from the pickled batches.
+
+        :return: The images of shape (N, 150, 150, 1) and their targets.
+        :rtype: dict[str, np.ndarray]
+        """
+        downloaded_list = self.train_list if self.train else self.test_list
+        data, target = [], []
 
         for file_name, _ in downloaded_list:
             file_path = os.path.join(self.root, self.base_folder, file_name)
@@ -106,33 +581,23 @@ class Bent(Dataset):
             with open(file_path, "rb") as infile:
                 entry = pickle.load(infile, encoding="latin1")  # noqa: S301
 
-            labels = entry["labels"] if "labels" in entry else entry["fine_labels"]
+            labels = np.asarray(entry["labels"] if "labels" in entry else entry["fine_labels"])
 
-            for i, label in enumerate(labels):
-                if not self.include_small:
-                    if label not in ["101", "201"]:
-                        self.data.append(entry["data"][i])
-                        label = 0 if label == "100" else 1
-                        self.target.append(label)
-                    else:
-                        continue
-                else:
-                    print("Including small dataset." + label)
-                    self.data.append(entry["data"][i])
-                    label = 0 if label in ["100", "101"] else 1
-                    self.target.append(label)
-
-        self.data = np.array(self.data).reshape(-1, 1, 150, 150)
-        self.data = self.data.transpose((0, 2, 3, 1))
+            keep = np.ones(len(labels), dtype=bool) if self.include_small else ~np.isin(labels, self.small_labels)
+            data.append(np.asarray(entry["data"])[keep])
+            target.append(np.where(np.isin(labels[keep], self.fr1_labels), 0, 1))
 
-        self._load_meta()
+        return {
+            "data": np.ascontiguousarray(np.concatenate(data), dtype=np.uint8).reshape(-1, 150, 150, 1),
+            "target": np.concatenate(target).astype(np.int64),
+        }
 
     def _load_meta(self) -> None:
         """
         Load the metadata of the dataset.
         """
         path = os.path.join(self.root, self.base_folder, self.meta["filename"])
-        if not check_integrity(path, self.meta["md5"]):
+        if not _check_files(os.path.dirname(path), [[self.meta["filename"], self.meta["md5"]]], self.verify):
             raise RuntimeError("Dataset metadata not found or corrupted. You can use download=True to download it.")  # noqa: TRY003
 
         with open(path, "rb") as infile:
@@ -152,17 +617,34 @@ class Bent(Dataset):
         """
         img, target = self.data[index], self.target[index]
 
-        img = np.reshape(img, (150, 150))
-        img = Image.fromarray(img, mode="L")
-
-        if self.transform is not None:
-            img = self.transform(img)
+        img = _transform_image(self.transform, img)
 
         if self.target_transform is not None:
             target = self.target_transform(target)
 
         return img, target
 
+    def __getitems__(self, indices: list[int]) -> list[tuple[torch.Tensor, torch.Tensor]]:
+        """
+        Get a batch of items, used by the DataLoader instead of one ``__getitem__`` call per item.
+
+        The images and targets of the batch are gathered from the arrays at once.
+
+        :param indices: The indices of the items.
+        :type indices: list[int]
+
+        :return: The data and target tensors of every item.
+        :rtype: list[tuple[torch.Tensor, torch.Tensor]]
+        """
+        images, targets = self.data[indices], self.target[indices]
+
+        batch = []
+        for img, target in zip(images, targets):
+            if self.target_transform is not None:
+                target = self.target_transform(target)
+            batch.append((_transform_image(self.transform, img), target))
+        return batch
+
     def __len__(self) -> int:
         """
         Get the length of the dataset.
@@ -176,16 +658,13 @@ class Bent(Dataset):
         """
         Check the integrity of the dataset.
 
+        Only the batches of the split are checked, and unchanged files are not hashed again.
+
         :return: True if the dataset is found and intact, False otherwise.
         :rtype: bool
         """
-        root = self.root
-        for fentry in self.train_list + self.test_list:
-            filename, md5 = fentry
-            fpath = os.path.join(root, self.base_folder, filename)
-            if not check_integrity(fpath, md5):
-                return False
-        return True
+        downloaded_list = self.train_list if self.train else self.test_list
+        return _check_files(os.path.join(self.root, self.base_folder), downloaded_list, self.verify)
 
     def download(self) -> None:
         """
@@ -195,10 +674,8 @@ class Bent(Dataset):
             print("Files already downloaded and verified")
             return
 
-        download_url(self.url, self.root, self.filename, self.tgz_md5)
-
-        with tarfile.open(os.path.join(self.root, self.filename), "r:gz") as tar:
-            tar.extractall(path=self.root)  # noqa: S202
+        files = [*self.train_list, *self.test_list, [self.meta["filename"], self.meta["md5"]]]
+        _download_and_extract(self.url, self.root, self.base_folder, self.tgz_md5, files)
 
     def __repr__(self) -> str:
         """
@@ -236,6 +713,10 @@ class RGZ20k(Dataset):
         download (bool, optional): If true, downloads the dataset from the internet and
             puts it in root directory. If dataset is already downloaded, it is not
             downloaded again.
+        cache (bool, optional): If true, loads the arrays from a memory-mapped
+            ``.npy`` cache next to the batches, created on first use.
+        verify (bool, optional): If true, re-hashes the batch files even if they
+            are unchanged since their last successful check.
 
     """
 
@@ -273,6 +754,8 @@ class RGZ20k(Dataset):
         remove_duplicates: bool = True,
         cut_threshold: float = 0.0,
         mb_cut=False,
+        cache: bool = True,
+        verify: bool = False,
     ):
         self.root = os.path.expanduser(root)
         self.transform = transform
@@ -281,6 +764,7 @@ class RGZ20k(Dataset):
         self.remove_duplicates = remove_duplicates
         self.cut_threshold = cut_threshold
         self.mb_cut = mb_cut
+        self.verify = verify
 
         if download:
             self.download()
@@ -289,12 +773,38 @@ class RGZ20k(Dataset):
             raise RuntimeError("Dataset not found or corrupted." + " You can use download=True to download it")
 
         downloaded_list = self.train_list if self.train else self.test_list
+        split = "train" if self.train else "test"
+        sources = [os.path.join(self.root, self.base_folder, file_name) for file_name, _ in downloaded_list]
+        cache_dir = os.path.join(self.root, self.base_folder, "cache")
+
+        # Both the full split and the subset left after the cuts are cached, the latter per cut options
+        subset = f"{split}-dedup{int(self.remove_duplicates)}-cut{self.cut_threshold:g}-mb{int(self.mb_cut)}"
+        arrays = _cached_arrays(
+            os.path.join(cache_dir, subset),
+            sources,
+            lambda: self._load_subset(os.path.join(cache_dir, split), sources, cache),
+            cache,
+        )
+
+        self.data = arrays["data"]  # object image data
+        self.names = arrays["names"]  # object file names
+        self.rgzid = arrays["rgzid"]  # object RGZ ID
+        self.mbflg = arrays["mbflg"]  # object MiraBest flag
+        self.sizes = arrays["sizes"]  # object largest angular sizes
+        self._id_order: Optional[np.ndarray] = None  # order of `rgzid`, built on the first lookup by ID
+
+        self._load_meta()
 
-        self.data = []  # object image data
-        self.names = []  # object file names
-        self.rgzid = []  # object RGZ ID
-        self.mbflg = []  # object MiraBest flag
-        self.sizes = []  # object largest angular sizes
+    def _load_batches(self) -> dict[str, np.ndarray]:
+        """
+        Load the images and metadata of the split from the pickled batches.
+
+        Returns:
+            dict: The images of shape (N, 150, 150, 1), file names, RGZ IDs, MiraBest flags and angular sizes.
+        """
+        downloaded_list = self.train_list if self.train else self.test_list
+
+        data, names, rgzid, mbflg, sizes = [], [], [], [], []
 
         # now load the picked numpy arrays
         for file_name, _ in downloaded_list:
@@ -303,56 +813,88 @@ class RGZ20k(Dataset):
             with open(file_path, "rb") as f:
                 entry = pickle.load(f, encoding="latin1")  # noqa: S301
 
-                self.data.append(entry["data"])
-                self.names.append(entry["filenames"])
-                self.rgzid.append(entry["src_ids"])
-                self.mbflg.append(entry["mb_flag"])
-                self.sizes.append(entry["LAS"])
-
-        self.rgzid = np.vstack(self.rgzid).reshape(-1)
-        self.sizes = np.vstack(self.sizes).reshape(-1)
-        self.mbflg = np.vstack(self.mbflg).reshape(-1)
-        self.names = np.vstack(self.names).reshape(-1)
+                data.append(entry["data"])
+                names.append(entry["filenames"])
+                rgzid.append(entry["src_ids"])
+                mbflg.append(entry["mb_flag"])
+                sizes.append(entry["LAS"])
+
+        return {
+            "data": np.vstack(data).reshape(-1, 150, 150, 1),
+            "names": np.vstack(names).reshape(-1),
+            "rgzid": np.vstack(rgzid).reshape(-1),
+            "mbflg": np.vstack(mbflg).reshape(-1),
+            "sizes": np.vstack(sizes).reshape(-1),
+        }
+
+    def _load_subset(self, cache_dir: str, sources: list[str], cache: bool) -> dict[str, np.ndarray]:
+        """
+        Load the full split and make the cuts.
 
-        self.data = np.vstack(self.data).reshape(-1, 1, 150, 150)
-        self.data = self.data.transpose((0, 2, 3, 1))
+        The full split and the index of its unique images are cached, so
+        changing the cut options neither reloads the batches nor searches the
+        duplicates again.
 
-        self._load_meta()
+        Args:
+            cache_dir (str): The cache directory of the full split.
+            sources (list): The paths to the batch files of the split.
+            cache (bool): Whether to use the cache.
 
-        # Make cuts on the data
-        n = self.__len__()
-        idx_bool = np.ones(n, dtype=bool)
+        Returns:
+            dict: The arrays of the remaining samples.
+        """
+        arrays = _cached_arrays(cache_dir, sources, self._load_batches, cache)
 
+        idx_unique = None
         if self.remove_duplicates:
             print(f"Removing duplicates from RGZ dataset...")  # noqa: F541
+            idx_unique = _cached_arrays(
+                f"{cache_dir}-unique", sources, lambda: {"index": _unique_rows(arrays["data"])}, cache
+            )["index"]
+
+        return self._make_cuts(arrays, idx_unique)
+
+    def _make_cuts(
+        self, arrays: dict[str, np.ndarray], idx_unique: Optional[np.ndarray] = None
+    ) -> dict[str, np.ndarray]:
+        """
+        Remove duplicates, small sources and optionally MiraBest sources.
+
+        Args:
+            arrays (dict): The arrays of the full split.
+            idx_unique (array, optional): The index of the first occurrence of every
+                unique image, if duplicates are removed.
+
+        Returns:
+            dict: The arrays of the remaining samples.
+        """
+        n = len(arrays["data"])
+        idx_bool = np.ones(n, dtype=bool)
+
+        if idx_unique is not None:
             idx_bool = np.zeros(n, dtype=bool)
-            _, idx_unique = np.unique(self.data, axis=0, return_index=True)
             idx_bool[idx_unique] = True
 
             print(f"Removed {n - np.count_nonzero(idx_bool)} duplicate samples")
-            n = np.count_nonzero(idx_bool)
+            n = int(np.count_nonzero(idx_bool))
 
-        idx_bool *= self.sizes > self.cut_threshold
+        idx_bool *= arrays["sizes"] > self.cut_threshold
         print(f"Removing {n - np.count_nonzero(idx_bool)} samples below angular size threshold.")
-        n = np.count_nonzero(idx_bool)
+        n = int(np.count_nonzero(idx_bool))
 
-        if mb_cut:
-            idx_bool *= self.mbflg == 0
+        if self.mb_cut:
+            idx_bool *= arrays["mbflg"] == 0
 
             # Print number of MB samples removed
             print(f"Removed {n - np.count_nonzero(idx_bool)} MiraBest samples from RGZ")
 
-        idx = np.argwhere(idx_bool).squeeze()
+        idx = np.flatnonzero(idx_bool)
 
-        self.data = self.data[idx]
-        self.names = self.names[idx]
-        self.rgzid = self.rgzid[idx]
-        self.mbflg = self.mbflg[idx]
-        self.sizes = self.sizes[idx]
+        return {name: array[idx] for name, array in arrays.items()}
 
     def _load_meta(self):
         path = os.path.join(self.root, self.base_folder, self.meta["filename"])
-        if not check_integrity(path, self.meta["md5"]):
+        if not _check_files(os.path.dirname(path), [[self.meta["filename"], self.meta["md5"]]], self.verify):
             raise RuntimeError(
                 "Dataset metadata file not found or corrupted." + " You can use download=True to download it"
             )
@@ -375,37 +917,45 @@ class RGZ20k(Dataset):
         mbf = self.mbflg[index].squeeze()
         rgz = self.rgzid[index].squeeze()
 
-        img = img.squeeze()
-        img = Image.fromarray(img, mode="L")
-
-        if self.transform is not None:
-            img = self.transform(img)
+        img = _transform_image(self.transform, img)
 
         return img, {"size": las, "mb": mbf, "id": rgz, "index": index}
 
+    def __getitems__(self, indices: list[int]) -> list[tuple[Any, dict[str, Any]]]:
+        """
+        Args:
+            indices (list): Indices of a batch, gathered from the arrays at once.
+
+        Returns:
+            list: (image, metadata) of every index, as returned by ``__getitem__``.
+        """
+        images, sizes, mbflg, rgzid = (
+            self.data[indices],
+            self.sizes[indices],
+            self.mbflg[indices],
+            self.rgzid[indices],
+        )
+
+        return [
+            (_transform_image(self.transform, img), {"size": las, "mb": mbf, "id": rgz, "index": index})
+            for img, las, mbf, rgz, index in zip(images, sizes, mbflg, rgzid, indices)
+        ]
+
     def __len__(self):
         return len(self.data)
 
     def _check_integrity(self):
-        root = self.root
-        for fentry in self.train_list + self.test_list:
-            filename, md5 = fentry[0], fentry[1]
-            fpath = os.path.join(root, self.base_folder, filename)
-            if not check_integrity(fpath, md5):
-                return False
-        return True
+        # Only the batches of the split are checked, and unchanged files are not hashed again
+        downloaded_list = self.train_list if self.train else self.test_list
+        return _check_files(os.path.join(self.root, self.base_folder), downloaded_list, self.verify)
 
     def download(self):
-        import tarfile
-
         if self._check_integrity():
             print("Files already downloaded and verified")
             return
 
-        download_url(self.url, self.root, self.filename, self.tgz_md5)
-
-        with tarfile.open(os.path.join(self.root, self.filename), "r:gz") as tar:
-            tar.extractall(path=self.root)  # noqa: S202
+        files = [*self.train_list, *self.test_list, [self.meta["filename"], self.meta["md5"]]]
+        _download_and_extract(self.url, self.root, self.base_folder, self.tgz_md5, files)
 
     def __repr__(self):
         fmt_str = "Dataset " + self.__class__.__name__ + "\n"
@@ -420,16 +970,63 @@ class RGZ20k(Dataset):
         return fmt_str
 
     def get_from_id(self, rgz_id):
-        index = np.argwhere(self.rgzid.squeeze() == rgz_id).squeeze()
+        index = self.indices_from_ids([rgz_id])[0]
 
-        img = self.data[index]
-        img = np.reshape(img, (150, 150))
-        img = Image.fromarray(img, mode="L")
+        return _transform_image(self.transform, self.data[index])
 
-        if self.transform is not None:
-            img = self.transform(img)
+    def get_from_ids(self, rgz_ids: Any) -> Union[np.ndarray, torch.Tensor, list]:
+        """
+        Get the images of many RGZ IDs at once.
 
-        return img
+        Args:
+            rgz_ids (array-like): The RGZ IDs.
+
+        Returns:
+            array, Tensor or list: The images of shape (M, 150, 150) if the dataset
+            has no transform. Otherwise the transformed images, stacked if the
+            transform returns tensors and in a list if not.
+        """
+        images: np.ndarray = self.data[self.indices_from_ids(rgz_ids)].reshape(-1, 150, 150)
+
+        if self.transform is None:
+            return images
+        transformed = [_transform_image(self.transform, img) for img in images]
+        if transformed and all(isinstance(img, torch.Tensor) for img in transformed):
+            return torch.stack(transformed)
+        return transformed
+
+    def indices_from_ids(self, rgz_ids: Any) -> np.ndarray:
+        """
+        Get the dataset indices of RGZ IDs.
+
+        The IDs are looked up with a binary search in a sorted copy of
+        ``rgzid``, built on the first lookup. If an ID occurs more than once,
+        its first index is returned.
+
+        Args:
+            rgz_ids (array-like): The RGZ IDs.
+
+        Returns:
+            array: The index of every ID.
+
+        Raises:
+            KeyError: If an ID is not in the dataset.
+        """
+        if self._id_order is None:
+            self._id_order = np.argsort(self.rgzid, kind="stable")
+            self._sorted_ids = self.rgzid[self._id_order]
+
+        rgz_ids = np.asarray(rgz_ids).reshape(-1)
+        if len(self._sorted_ids) == 0:
+            position = np.zeros(len(rgz_ids), dtype=np.int64)
+            found = np.zeros(len(rgz_ids), dtype=bool)
+        else:
+            position = np.minimum(np.searchsorted(self._sorted_ids, rgz_ids), len(self._sorted_ids) - 1)
+            found = self._sorted_ids[position] == rgz_ids
+
+        if not found.all():
+            raise KeyError(f"RGZ IDs not found: {rgz_ids[~found][:10].tolist()}")  # noqa: TRY003
+        return self._id_order[position]
 
 
 class MiraBest(Dataset):
@@ -447,6 +1044,10 @@ class MiraBest(Dataset):
         download (bool, optional): If true, downloads the dataset from the internet and
             puts it in root directory. If dataset is already downloaded, it is not
             downloaded again.
+        cache (bool, optional): If true, loads the arrays from a memory-mapped
+            ``.npy`` cache next to the batches, created on first use.
+        verify (bool, optional): If true, re-hashes the batch files even if they
+            are unchanged since their last successful check.
 
     """
 
@@ -475,11 +1076,14 @@ class MiraBest(Dataset):
         "md5": "97de0434158b529b5701bb3a1ed28ec6",
     }
 
-    def __init__(self, root, train=True, transform=None, target_transform=None, download=False):
+    def __init__(
+        self, root, train=True, transform=None, target_transform=None, download=False, cache=True, verify=False
+    ):
         self.root = os.path.expanduser(root)
         self.transform = transform
         self.target_transform = target_transform
         self.train = train  # training set or test set
+        self.verify = verify
 
         if download:
             self.download()
@@ -488,9 +1092,28 @@ class MiraBest(Dataset):
             raise RuntimeError("Dataset not found or corrupted." + " You can use download=True to download it")
 
         downloaded_list = self.train_list if self.train else self.test_list
+        arrays = _cached_arrays(
+            os.path.join(self.root, self.base_folder, "cache", "train" if self.train else "test"),
+            [os.path.join(self.root, self.base_folder, file_name) for file_name, _ in downloaded_list],
+            self._load_batches,
+            cache,
+        )
+        self.data = arrays["data"]
+        self.targets = arrays["targets"]
+
+        self._load_meta()
+
+    def _load_batches(self) -> dict[str, np.ndarray]:
+        """
+        Load the images and targets of the split from the pickled batches.
+
+        Returns:
+            dict: The images of shape (N, 150, 150, 1) and their targets.
+        """
+        downloaded_list = self.train_list if self.train else self.test_list
 
-        self.data = []
-        self.targets = []
+        data = []
+        targets = []
 
         # now load the picked numpy arrays
         for file_name, _ in downloaded_list:
@@ -499,20 +1122,17 @@ class MiraBest(Dataset):
             with open(file_path, "rb") as f:
                 entry = pickle.load(f, encoding="latin1")  # noqa: S301
 
-                self.data.append(entry["data"])
+                data.append(entry["data"])
                 if "labels" in entry:
-                    self.targets.extend(entry["labels"])
+                    targets.extend(entry["labels"])
                 else:
-                    self.targets.extend(entry["fine_labels"])
-
-        self.data = np.vstack(self.data).reshape(-1, 1, 150, 150)
-        self.data = self.data.transpose((0, 2, 3, 1))
+                    targets.extend(entry["fine_labels"])
 
-        self._load_meta()
+        return {"data": np.vstack(data).reshape(-1, 150, 150, 1), "targets": np.asarray(targets, dtype=np.int64)}
 
     def _load_meta(self):
         path = os.path.join(self.root, self.base_folder, self.meta["filename"])
-        if not check_integrity(path, self.meta["md5"]):
+        if not _check_files(os.path.dirname(path), [[self.meta["filename"], self.meta["md5"]]], self.verify):
             raise RuntimeError(
                 "Dataset metadata file not found or corrupted." + " You can use download=True to download it"
             )
@@ -532,42 +1152,46 @@ class MiraBest(Dataset):
         img, target = self.data[index], self.targets[index]
 
         # doing this so that it is consistent with all other datasets
-        # to return a PIL Image
-        img = np.reshape(img, (150, 150))
-        img = Image.fromarray(img, mode="L")
-
-        if self.transform is not None:
-            img = self.transform(img)
+        # to return a PIL Image, unless the transform accepts arrays
+        img = _transform_image(self.transform, img)
 
         if self.target_transform is not None:
             target = self.target_transform(target)
 
         return img, target
 
+    def __getitems__(self, indices: list[int]) -> list[tuple[Any, Any]]:
+        """
+        Args:
+            indices (list): Indices of a batch, gathered from the arrays at once.
+
+        Returns:
+            list: (image, target) of every index, as returned by ``__getitem__``.
+        """
+        images, targets = self.data[indices], self.targets[indices]
+
+        batch = []
+        for img, target in zip(images, targets):
+            if self.target_transform is not None:
+                target = self.target_transform(target)
+            batch.append((_transform_image(self.transform, img), target))
+        return batch
+
     def __len__(self):
         return len(self.data)
 
     def _check_integrity(self):
-        root = self.root
-        for fentry in self.train_list + self.test_list:
-            filename, md5 = fentry[0], fentry[1]
-            fpath = os.path.join(root, self.base_folder, filename)
-            if not check_integrity(fpath, md5):
-                return False
-        return True
+        # Only the batches of the split are checked, and unchanged files are not hashed again
+        downloaded_list = self.train_list if self.train else self.test_list
+        return _check_files(os.path.join(self.root, self.base_folder), downloaded_list, self.verify)
 
     def download(self):
-        import tarfile
-
         if self._check_integrity():
             print("Files already downloaded and verified")
             return
 
-        download_url(self.url, self.root, self.filename, self.tgz_md5)
-
-        # extract file
-        with tarfile.open(os.path.join(self.root, self.filename), "r:gz") as tar:
-            tar.extractall(path=self.root)  # noqa: S202
+        files = [*self.train_list, *self.test_list, [self.meta["filename"], self.meta["md5"]]]
+        _download_and_extract(self.url, self.root, self.base_folder, self.tgz_md5, files)
 
     def __repr__(self):
         fmt_str = "Dataset " + self.__class__.__name__ + "\n"
@@ -582,126 +1206,357 @@ class MiraBest(Dataset):
         return fmt_str
 
 
-class Transforms:
-    """A class to apply transformations to images."""
+class FolderDataset(Dataset):
+    """
+    A dataset of the PNG or FITS images written by the preprocessing pipeline.
+
+    :func:`~rgc.utils.data.fits_to_png_bulk`, :func:`~rgc.utils.data.mask_image_bulk`
+    and :func:`~rgc.utils.data.celestial_capture_bulk` name their outputs
+    ``{label}_{tag}.{extension}``. The label is the part of the file name
+    before the first underscore, and files with an empty label are unlabeled,
+    with target -1.
+
+    The folder is listed in a single ``os.scandir`` pass. The name, size,
+    modification time and image shape of every file are kept in a
+    ``.manifest.json`` in the folder, so only new or changed files are opened
+    to read their shape. With ``cache``, every image is decoded once into a
+    memory-mapped ``.npy`` array under ``.cache``, rebuilt when a file changes.
+    """
 
-    def __init__(self, transforms: albumentations.Compose) -> None:
+    manifest_name = ".manifest.json"
+
+    def __init__(
+        self,
+        root: str,
+        transform: Optional[Callable] = None,
+        target_transform: Optional[Callable] = None,
+        extensions: tuple[str, ...] = (".png", ".fits"),
+        classes: Optional[list[str]] = None,
+        cache: bool = False,
+    ) -> None:
         """
-        Initialize the Transforms class.
+        Initialize the dataset.
 
-        :param transforms: The transformations to apply.
-        :type transforms: albumentations.Compose
+        :param root: The folder of the images.
+        :type root: str
+
+        :param transform: The transform applied to the images.
+        :type transform: Optional[Callable]
+
+        :param target_transform: The transform applied to the targets.
+        :type target_transform: Optional[Callable]
+
+        :param extensions: The extensions of the image files.
+        :type extensions: tuple[str, ...]
+
+        :param classes: The labels in the order of their targets, by default the sorted labels found.
+        :type classes: Optional[list[str]]
+
+        :param cache: If True, decodes every image once into a memory-mapped cache.
+        :type cache: bool
         """
-        self.transforms = transforms
+        self.root = os.path.expanduser(root)
+        self.transform = transform
+        self.target_transform = target_transform
+
+        signature = self._scan(extensions)
+        if not signature:
+            raise RuntimeError(f"No images with extensions {extensions} found in {self.root}.")  # noqa: TRY003
+        self.names = np.array([name for name, _, _ in signature], dtype=str)
+        self.shapes = self._load_manifest(signature)
+
+        # Labels are the part of the names before the first underscore, mapped once per distinct label
+        labels, inverse = np.unique(np.char.partition(self.names, "_")[..., 0], return_inverse=True)
+        self.classes = classes if classes is not None else [label for label in labels.tolist() if label]
+        self.class_to_idx = {_class: i for i, _class in enumerate(self.classes)}
+        lookup = np.array([self.class_to_idx.get(label, -1) for label in labels.tolist()], dtype=np.int64)
+        self.targets = lookup[inverse.reshape(-1)]
+
+        self.data: Optional[np.ndarray] = None
+        if cache:
+            self.data = _cached_arrays(
+                os.path.join(self.root, ".cache"), self.paths(), self._decode_all, signature=signature
+            )["data"]
 
-    def __call__(self, img: Image.Image, *args, **kwargs) -> torch.Tensor:
+    def _scan(self, extensions: tuple[str, ...]) -> list[list]:
         """
-        Apply the transformations to the image.
+        List the image files of the folder with their sizes and modification times.
+
+        :param extensions: The extensions of the image files.
+        :type extensions: tuple[str, ...]
+
+        :return: The name, size and modification time in nanoseconds of every image, sorted by name.
+        :rtype: list[list]
+        """
+        signature = []
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.name.lower().endswith(extensions):
+                    continue
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                signature.append([entry.name, stat.st_size, stat.st_mtime_ns])
+        return sorted(signature)
+
+    def _load_manifest(self, signature: list[list]) -> np.ndarray:
+        """
+        Get the shapes of the images, reading only those of new or changed files.
+
+        :param signature: The name, size and modification time of every image.
+        :type signature: list[list]
+
+        :return: The height and width of every image.
+        :rtype: np.ndarray
+        """
+        path = os.path.join(self.root, self.manifest_name)
+        known = {}
+        if os.path.exists(path):
+            with open(path) as infile, contextlib.suppress(ValueError, KeyError):
+                known = {tuple(entry[:3]): entry[3:] for entry in json.load(infile)["files"]}
+
+        shapes = []
+        for name, size, mtime in signature:
+            shape = known.get((name, size, mtime))
+            if shape is None:
+                shape = list(_image_shape(os.path.join(self.root, name)))
+            shapes.append(shape)
+
+        if len(known) != len(signature) or any(tuple(entry) not in known for entry in signature):
+            files = [[*entry, *shape] for entry, shape in zip(signature, shapes)]
+            with contextlib.suppress(OSError):
+                with tempfile.NamedTemporaryFile("w", dir=self.root, suffix=".json", delete=False) as outfile:
+                    json.dump({"files": files}, outfile)
+                os.replace(outfile.name, path)
+        return np.array(shapes, dtype=np.int64).reshape(-1, 2)
+
+    def paths(self) -> list[str]:
+        """
+        Get the paths to the images.
+
+        :return: The path to every image.
+        :rtype: list[str]
+        """
+        return [os.path.join(self.root, name) for name in self.names]
+
+    def _decode_all(self) -> dict[str, np.ndarray]:
+        """
+        Decode every image into one array, for the memory-mapped cache.
+
+        :return: The images of shape (N, H, W).
+        :rtype: dict[str, np.ndarray]
+        """
+        if len(np.unique(self.shapes, axis=0)) > 1:
+            raise ValueError("Images of different shapes cannot be cached together.")  # noqa: TRY003
+        return {"data": np.stack([_decode_image(path) for path in self.paths()])}
+
+    def _image(self, index: int) -> np.ndarray:
+        """
+        Get a decoded image, from the cache if there is one.
+
+        :param index: The index of the image.
+        :type index: int
+
+        :return: The image.
+        :rtype: np.ndarray
+        """
+        if self.data is not None:
+            return np.asarray(self.data[index])
+        return _decode_image(os.path.join(self.root, self.names[index]))
+
+    def _transform_image(self, img: np.ndarray) -> Any:
+        """
+        Apply the transform to an image.
+
+        uint8 images are handled as in the other datasets. Float images, as
+        read from FITS files, cannot become 8-bit PIL images and are passed to
+        the transform as arrays.
+
+        :param img: The image.
+        :type img: np.ndarray
 
-        :param img: The image to transform.
-        :type img: Image.Image
         :return: The transformed image.
-        :rtype: torch.Tensor
+        :rtype: Any
         """
-        return self.transforms(image=np.array(img))["image"]
+        if img.dtype == np.uint8:
+            return _transform_image(self.transform, img, img.shape[:2])
+        img = np.array(img)
+        return self.transform(img) if self.transform is not None else img
 
+    def __getitem__(self, index: int) -> tuple[Any, Any]:
+        """
+        Get an item from the dataset.
 
-class BentLightningDataModule(pl.LightningDataModule):
-    """
-    A PyTorch Lightning DataModule for the BENT dataset.
-    """
+        :param index: The index of the item.
+        :type index: int
 
-    def __init__(
-        self,
-        data_dir: str,
-        batch_size: int = 32,
-        num_workers: int = 4,
-        transform=None,
-        test_transform=None,
-        include_small=False,
-    ) -> None:
+        :return: The image and its target.
+        :rtype: tuple[Any, Any]
         """
-        Initialize the DataModule.
+        img, target = self._transform_image(self._image(index)), self.targets[index]
 
-        :param root: The root directory of the dataset.
-        :type root: str
-        :param batch_size: The batch size.
-        :type batch_size: int
-        :param num_workers: The number of workers for data loading.
-        :type num_workers: int
-        :param transform: The transform to apply to the training data.
-        :type transform: torchvision.transforms.Compose
-        :param test_transform: The transform to apply to the test data.
-        :type test_transform: torchvision.transforms.Compose
-        :param include_small: Whether to include the small dataset.
-        :type include_small: bool
+        if self.target_transform is not None:
+            target = self.target_transform(target)
+
+        return img, target
+
+    def __getitems__(self, indices: list[int]) -> list[tuple[Any, Any]]:
         """
-        super().__init__()
-        self.data_dir = data_dir
-        self.batch_size = batch_size
-        self.num_workers = num_workers
-        self.transform = transform
-        self.test_transform = test_transform
-        self.include_small = include_small
+        Get a batch of items, gathered from the cache at once if there is one.
 
-    def setup(self, stage=None) -> None:
+        :param indices: The indices of the items.
+        :type indices: list[int]
+
+        :return: The image and target of every item.
+        :rtype: list[tuple[Any, Any]]
         """
-        Setup the DataModule.
+        images = self.data[indices] if self.data is not None else [self._image(index) for index in indices]
+
+        batch = []
+        for img, target in zip(images, self.targets[indices]):
+            if self.target_transform is not None:
+                target = self.target_transform(target)
+            batch.append((self._transform_image(img), target))
+        return batch
 
-        :param stage: The stage to setup. Can be "fit", "test", or "predict".
-        :type stage: str
+    def __len__(self) -> int:
         """
-        self.train_dataset = Bent(
-            root="data/bent",
-            download=True,
-            train=True,
-            transform=Transforms(transforms=self.transform),
-            target_transform=None,
-            include_small=self.include_small,
-        )
-        self.val_dataset = Bent(
-            root="data/bent",
-            download=True,
-            train=False,
-            transform=Transforms(transforms=self.transform),
-            target_transform=None,
-            include_small=self.include_small,
-        )
-        self.test_dataset = Bent(
-            root="data/bent",
-            download=True,
-            train=False,
-            transform=Transforms(transforms=self.test_transform),
-            target_transform=None,
-            include_small=self.include_small,
-        )
+        Get the length of the dataset.
 
-    def train_dataloader(self) -> torch.utils.data.DataLoader:
+        :return: The number of images.
+        :rtype: int
         """
-        Returns the training dataloader.
-        :return: The training dataloader.
-        :rtype: torch.utils.data.DataLoader
+        return len(self.names)
+
+
+def _image_shape(path: str) -> tuple[int, int]:
+    """
+    Read the shape of an image from its header, without decoding the pixels.
+
+    :param path: The path to the PNG or FITS file.
+    :type path: str
+
+    :return: The height and width of the image.
+    :rtype: tuple[int, int]
+    """
+    if path.lower().endswith(".fits"):
+        header = fits.getheader(path)
+        return header["NAXIS2"], header["NAXIS1"]
+    with Image.open(path) as img:
+        width, height = img.size
+    return height, width
+
+
+def _decode_image(path: str) -> np.ndarray:
+    """
+    Decode an image, as float32 for FITS files and as stored for other formats.
+
+    :param path: The path to the image.
+    :type path: str
+
+    :return: The image of shape (H, W).
+    :rtype: np.ndarray
+    """
+    if path.lower().endswith(".fits"):
+        data = np.asarray(fits.getdata(path), dtype=np.float32)
+        return data.reshape(data.shape[-2:])
+    with Image.open(path) as img:
+        return np.asarray(img if img.mode in ("L", "I", "I;16", "F") else img.convert("L"))
+
+
+class Transforms:
+    """
+    A class to apply albumentations transformations to images.
+
+    The datasets pass NumPy arrays instead of PIL images to transforms that
+    declare ``accepts_arrays``, which skips a PIL round trip per sample.
+    """
+
+    accepts_arrays = True
+
+    def __init__(self, transforms: "albumentations.Compose") -> None:
         """
-        return torch.utils.data.DataLoader(
-            self.train_dataset, batch_size=self.batch_size, shuffle=True, num_workers=self.num_workers
-        )
+        Initialize the Transforms class.
 
-    def val_dataloader(self) -> torch.utils.data.DataLoader:
+        :param transforms: The transformations to apply.
+        :type transforms: albumentations.Compose
         """
-        Returns the validation dataloader.
-        :return: The validation dataloader.
-        :rtype: torch.utils.data.DataLoader
+        self.transforms = transforms
+
+    def __call__(self, img: Union[Image.Image, np.ndarray], *args: Any, **kwargs: Any) -> torch.Tensor:
         """
-        return torch.utils.data.DataLoader(
-            self.val_dataset, batch_size=self.batch_size, shuffle=False, num_workers=self.num_workers
-        )
+        Apply the transformations to the image.
 
-    def test_dataloader(self) -> torch.utils.data.DataLoader:
+        :param img: The image to transform.
+        :type img: Union[Image.Image, np.ndarray]
+        :return: The transformed image.
+        :rtype: torch.Tensor
         """
-        Returns the test dataloader.
-        :return: The test dataloader.
-        :rtype: torch.utils.data.DataLoader
+        image: torch.Tensor = self.transforms(image=np.asarray(img))["image"]
+        return image
+
+    @property
+    def deterministic(self) -> bool:
         """
-        return torch.utils.data.DataLoader(
-            self.test_dataset, batch_size=self.batch_size, shuffle=False, num_workers=self.num_workers
-        )
+        Whether the transformations always give the same output for the same image.
+
+        This holds if every transformation is applied with probability one and
+        is one of the transformations without random parameters, such as
+        padding, center cropping or normalization.
+
+        :return: True if the transformations are deterministic.
+        :rtype: bool
+        """
+        return _is_deterministic(self.transforms)
+
+
+_DETERMINISTIC_TRANSFORMS = frozenset({
+    "CenterCrop",
+    "Crop",
+    "FromFloat",
+    "LongestMaxSize",
+    "Normalize",
+    "PadIfNeeded",
+    "Resize",
+    "SmallestMaxSize",
+    "ToFloat",
+    "ToTensorV2",
+})
+
+
+def _is_deterministic(transform: Any) -> bool:
+    """
+    Check whether an albumentations transform has no random parameters.
+
+    :param transform: The transform, a composition of transforms or None.
+    :type transform: Any
+
+    :return: True if the transform is deterministic.
+    :rtype: bool
+    """
+    if transform is None:
+        return True
+    if getattr(transform, "p", 1.0) < 1.0:
+        return False
+
+    name = type(transform).__name__
+    if name in ("Compose", "Sequential"):
+        return all(_is_deterministic(child) for child in transform.transforms)
+    return name in _DETERMINISTIC_TRANSFORMS
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Import the Lightning DataModules lazily, as pytorch_lightning is slow to import.
+
+    :param name: The name of the attribute.
+    :type name: str
+
+    :return: The requested DataModule.
+    :rtype: Any
+    """
+    if name in ("BentLightningDataModule", "MiraBestLightningDataModule", "RGZ20kLightningDataModule"):
+        from rgc.utils import datamodules
+
+        return getattr(datamodules, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")  # noqa: TRY003
@@ -0,0 +1,291 @@
+"""
+Opt-in metrics for the bulk preprocessing functions.
+
+The functions of :mod:`rgc.utils.data` report the wall time of their stages
+(SkyView requests, PyBDSF, FITS decoding, PNG encoding, ...), the bytes they
+read and write, and their retries and failures to the active
+:class:`Metrics` recorder. No recorder is active by default, in which case the
+instrumentation points cost a single global lookup.
+
+Example::
+
+    with metrics.collect() as recorder:
+        fits_to_png_bulk("fits", "png", workers=8)
+    recorder.write_json("metrics.json")
+    recorder.write_prometheus("rgc.prom")
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from typing import Optional
+
+import numpy as np
+
+from rgc.utils._io import write_atomic
+
+COUNTERS = ("bytes_read", "bytes_written", "retries", "failures")
+
+
+class Metrics:
+    """
+    A thread-safe recorder of per-stage timings and counters.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty recorder.
+        """
+        self.timings: dict[str, list[float]] = {}
+        self.counters: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        """
+        Get the picklable state, used to send records back from worker processes.
+
+        :return: The timings and counters of the recorder.
+        :rtype: dict
+        """
+        return {"timings": self.timings, "counters": self.counters}
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Restore a recorder from its pickled state.
+
+        :param state: The timings and counters of the recorder.
+        :type state: dict
+        """
+        self.timings = state["timings"]
+        self.counters = state["counters"]
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """
+        Record the wall time of one item in a stage.
+
+        :param stage: The name of the stage.
+        :type stage: str
+
+        :param seconds: The wall time in seconds.
+        :type seconds: float
+        """
+        with self._lock:
+            self.timings.setdefault(stage, []).append(seconds)
+
+    def add(self, stage: str, counter: str, value: int = 1) -> None:
+        """
+        Increment a counter of a stage.
+
+        :param stage: The name of the stage.
+        :type stage: str
+
+        :param counter: The name of the counter e.g. 'bytes_read' or 'retries'.
+        :type counter: str
+
+        :param value: The increment.
+        :type value: int
+        """
+        with self._lock:
+            counters = self.counters.setdefault(stage, dict.fromkeys(COUNTERS, 0))
+            counters[counter] = counters.get(counter, 0) + value
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """
+        Measure the wall time of the enclosed block as one item of a stage.
+
+        :param stage: The name of the stage.
+        :type stage: str
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def merge(self, other: "Metrics") -> None:
+        """
+        Merge the records of another recorder, e.g. one filled in a worker process.
+
+        :param other: The recorder to merge.
+        :type other: Metrics
+        """
+        for stage, timings in other.timings.items():
+            with self._lock:
+                self.timings.setdefault(stage, []).extend(timings)
+        for stage, counters in other.counters.items():
+            for counter, value in counters.items():
+                self.add(stage, counter, value)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Summarize the records of every stage.
+
+        :return: The item count, total, mean, percentiles and maximum of the wall
+            times in seconds, and the counters of every stage.
+        :rtype: dict[str, dict[str, float]]
+        """
+        with self._lock:
+            stages = sorted(set(self.timings) | set(self.counters))
+            summary = {}
+            for stage in stages:
+                timings = np.asarray(self.timings.get(stage, []), dtype=np.float64)
+                entry: dict[str, float] = {"count": int(timings.size), "total_seconds": float(timings.sum())}
+                if timings.size:
+                    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+                    entry.update({
+                        "mean_seconds": float(timings.mean()),
+                        "p50_seconds": float(p50),
+                        "p95_seconds": float(p95),
+                        "p99_seconds": float(p99),
+                        "max_seconds": float(timings.max()),
+                    })
+                entry.update(self.counters.get(stage, dict.fromkeys(COUNTERS, 0)))
+                summary[stage] = entry
+        return summary
+
+    def write_json(self, path: str) -> None:
+        """
+        Write the summary as a JSON file.
+
+        :param path: Path to the JSON file.
+        :type path: str
+        """
+        write_atomic(path, json.dumps(self.summary(), indent=2, sort_keys=True) + "\n")
+
+    def write_prometheus(self, path: str, prefix: str = "rgc") -> None:
+        """
+        Write the summary in the Prometheus textfile collector format.
+
+        :param path: Path to the ``.prom`` file.
+        :type path: str
+
+        :param prefix: The prefix of the metric names.
+        :type prefix: str
+        """
+        summary = self.summary()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Wall time per item of a preprocessing stage.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for stage, entry in summary.items():
+            for quantile, key in (("0.5", "p50_seconds"), ("0.95", "p95_seconds"), ("0.99", "p99_seconds")):
+                if key in entry:
+                    lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {entry[key]!r}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {entry["total_seconds"]!r}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {entry["count"]}')
+
+        for counter in COUNTERS:
+            lines.append(f"# HELP {prefix}_{counter}_total Total {counter.replace('_', ' ')} of a preprocessing stage.")
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            for stage, entry in summary.items():
+                lines.append(f'{prefix}_{counter}_total{{stage="{stage}"}} {int(entry.get(counter, 0))}')
+
+        write_atomic(path, "\n".join(lines) + "\n")
+
+
+_active: Optional[Metrics] = None
+_disabled = nullcontext()
+
+
+def active() -> Optional[Metrics]:
+    """
+    Get the active recorder.
+
+    :return: The active recorder, or None if metrics are disabled.
+    :rtype: Optional[Metrics]
+    """
+    return _active
+
+
+def activate(recorder: Optional[Metrics]) -> Optional[Metrics]:
+    """
+    Make a recorder the active one.
+
+    :param recorder: The recorder to activate, or None to disable metrics.
+    :type recorder: Optional[Metrics]
+
+    :return: The previously active recorder.
+    :rtype: Optional[Metrics]
+    """
+    global _active
+    previous, _active = _active, recorder
+    return previous
+
+
+@contextmanager
+def collect(recorder: Optional[Metrics] = None) -> Iterator[Metrics]:
+    """
+    Activate a recorder for the duration of the enclosed block.
+
+    :param recorder: The recorder to activate, a new one by default.
+    :type recorder: Optional[Metrics]
+
+    :return: The active recorder.
+    :rtype: Iterator[Metrics]
+    """
+    recorder = recorder if recorder is not None else Metrics()
+    previous = activate(recorder)
+    try:
+        yield recorder
+    finally:
+        activate(previous)
+
+
+def timer(stage: str) -> AbstractContextManager:
+    """
+    Time the enclosed block as one item of a stage if metrics are enabled.
+
+    :param stage: The name of the stage.
+    :type stage: str
+
+    :return: A context manager measuring the block, or a no-op one.
+    :rtype: AbstractContextManager
+    """
+    recorder = _active
+    if recorder is None:
+        return _disabled
+    return recorder.time(stage)
+
+
+def count(stage: str, counter: str, value: int = 1) -> None:
+    """
+    Increment a counter of a stage if metrics are enabled.
+
+    :param stage: The name of the stage.
+    :type stage: str
+
+    :param counter: The name of the counter e.g. 'retries' or 'failures'.
+    :type counter: str
+
+    :param value: The increment.
+    :type value: int
+    """
+    recorder = _active
+    if recorder is not None:
+        recorder.add(stage, counter, value)
+
+
+def count_file(stage: str, counter: str, path: str) -> None:
+    """
+    Add the size of a file to a byte counter of a stage if metrics are enabled.
+
+    :param stage: The name of the stage.
+    :type stage: str
+
+    :param counter: Either 'bytes_read' or 'bytes_written'.
+    :type counter: str
+
+    :param path: Path to the file.
+    :type path: str
+    """
+    recorder = _active
+    if recorder is not None and os.path.exists(path):
+        recorder.add(stage, counter, os.path.getsize(path))
@@ -0,0 +1,611 @@
+"""
+A small DAG pipeline runner for the preprocessing utilities.
+
+This module chains the functions of :mod:`rgc.utils.data` (capture, mask
+generation, FITS to PNG conversion and masking) as stages of a directed acyclic
+graph. Every object moves to the next stage as soon as its own inputs are ready,
+so network-bound captures overlap with CPU-bound source detection and
+conversion. Each stage runs in its own worker pool and writes content-addressed
+intermediates, so unchanged work is skipped on later runs.
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+import pandas as pd
+from PIL import Image
+
+from rgc._lazy import LazyImport
+from rgc.utils import data
+
+if TYPE_CHECKING:
+    from astropy import units as u
+    from astropy.coordinates import SkyCoord
+else:
+    u = LazyImport("astropy.units")
+    SkyCoord = LazyImport("astropy.coordinates", "SkyCoord")
+
+
+class Stage:
+    """
+    A stage of the preprocessing pipeline.
+
+    The stage function is called as ``func(output, inputs, item, **params)``
+    where ``output`` is the path the stage must write to, ``inputs`` maps the
+    names of the upstream stages to their output paths and ``item`` is the
+    payload of the object being processed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., None],
+        inputs: tuple[str, ...] = (),
+        suffix: str = "",
+        fields: tuple[str, ...] = (),
+        params: Optional[dict] = None,
+        workers: int = 1,
+        executor: str = "thread",
+    ) -> None:
+        """
+        Initialize the stage.
+
+        :param name: The unique name of the stage.
+        :type name: str
+
+        :param func: The function producing the output of the stage.
+        :type func: Callable[..., None]
+
+        :param inputs: The names of the stages whose outputs this stage consumes.
+        :type inputs: tuple[str, ...]
+
+        :param suffix: The file extension of the stage output e.g. '.fits'.
+        :type suffix: str
+
+        :param fields: The payload fields the stage depends on.
+        :type fields: tuple[str, ...]
+
+        :param params: Additional keyword arguments passed to the stage function.
+        :type params: Optional[dict]
+
+        :param workers: The number of workers in the pool of the stage.
+        :type workers: int
+
+        :param executor: The kind of worker pool, either 'thread' or 'process'.
+        :type executor: str
+
+        :raises _UnsupportedExecutorError: If an unsupported executor is provided.
+        """
+        if executor not in ("thread", "process"):
+            raise _UnsupportedExecutorError(executor)
+
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.suffix = suffix
+        self.fields = tuple(fields)
+        self.params = params or {}
+        self.workers = workers
+        self.executor = executor
+
+    def make_executor(self) -> Executor:
+        """
+        Create the worker pool of the stage.
+
+        :return: A thread or process pool with the configured number of workers.
+        :rtype: Executor
+        """
+        if self.executor == "process":
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"rgc-{self.name}")
+
+    def __repr__(self) -> str:
+        """
+        Get the representation of the stage.
+
+        :return: The representation of the stage.
+        :rtype: str
+        """
+        return f"Stage(name={self.name!r}, inputs={self.inputs!r}, workers={self.workers}, executor={self.executor!r})"
+
+
+class _UnsupportedExecutorError(Exception):
+    """
+    An exception to be raised when an unsupported executor is provided.
+    """
+
+    def __init__(self, executor: str) -> None:
+        super().__init__(f"Unsupported executor {executor}. Only 'thread' and 'process' are supported.")
+
+
+class _UnknownStageError(Exception):
+    """
+    An exception to be raised when a stage consumes the output of an unknown stage.
+    """
+
+    def __init__(self, stage: str, dependency: str) -> None:
+        super().__init__(f"Stage {stage} depends on unknown stage {dependency}.")
+
+
+class _DuplicateStageError(Exception):
+    """
+    An exception to be raised when two stages share the same name.
+    """
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(f"Stage {stage} is defined more than once.")
+
+
+class _PipelineCycleError(Exception):
+    """
+    An exception to be raised when the stages do not form a directed acyclic graph.
+    """
+
+    def __init__(self) -> None:
+        super().__init__("Pipeline stages must form a directed acyclic graph.")
+
+
+class _MissingStageOutputError(Exception):
+    """
+    An exception to be raised when a stage function does not write its output.
+    """
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(f"Stage {stage} did not produce an output.")
+
+
+def _file_digest(path: str) -> str:
+    """
+    Compute the SHA-256 digest of a file.
+
+    :param path: Path to the file.
+    :type path: str
+
+    :return: The hexadecimal digest of the file content.
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stage_key(name: str, params: dict, payload: dict, inputs: dict[str, str]) -> str:
+    """
+    Compute the content address of a stage output.
+
+    The address depends on the stage name, its parameters, the payload fields it
+    uses and the content of its input files, so it changes only when the output
+    would change.
+
+    :param name: The name of the stage.
+    :type name: str
+
+    :param params: The parameters of the stage.
+    :type params: dict
+
+    :param payload: The payload fields used by the stage.
+    :type payload: dict
+
+    :param inputs: The paths of the input files by stage name.
+    :type inputs: dict[str, str]
+
+    :return: The hexadecimal content address.
+    :rtype: str
+    """
+    recipe = {
+        "stage": name,
+        "params": params,
+        "payload": payload,
+        "inputs": {stage: _file_digest(path) for stage, path in sorted(inputs.items())},
+    }
+    encoded = json.dumps(recipe, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _run_stage(
+    func: Callable[..., None],
+    name: str,
+    stage_dir: str,
+    suffix: str,
+    params: dict,
+    payload: dict,
+    inputs: dict[str, str],
+    item: dict,
+) -> tuple[str, bool]:
+    """
+    Run a stage for a single object unless its output already exists.
+
+    :return: The path of the stage output and whether it was taken from the cache.
+    :rtype: tuple[str, bool]
+
+    :raises _MissingStageOutputError: If the stage function does not write its output.
+    """
+    key = _stage_key(name, params, payload, inputs)
+    output = os.path.join(stage_dir, f"{key}{suffix}")
+    if os.path.exists(output):
+        return output, True
+
+    Path(stage_dir).mkdir(parents=True, exist_ok=True)
+    # Thread workers share the pid, so the thread id keeps their partial files apart
+    partial = os.path.join(stage_dir, f".{key}.{os.getpid()}.{threading.get_ident()}.tmp{suffix}")
+    try:
+        func(partial, inputs, item, **params)
+        if not os.path.exists(partial):
+            raise _MissingStageOutputError(name)
+        os.replace(partial, output)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    return output, False
+
+
+class Pipeline:
+    """
+    A directed acyclic graph of preprocessing stages.
+
+    Objects are identified by a string id and carry a payload dictionary. The
+    output of every stage is written under ``work_dir/<stage name>/`` with its
+    content address as file name.
+    """
+
+    def __init__(self, stages: list[Stage], work_dir: str) -> None:
+        """
+        Initialize the pipeline.
+
+        :param stages: The stages of the pipeline.
+        :type stages: list[Stage]
+
+        :param work_dir: The directory holding the stage outputs.
+        :type work_dir: str
+
+        :raises _DuplicateStageError: If two stages share the same name.
+        :raises _UnknownStageError: If a stage depends on an unknown stage.
+        :raises _PipelineCycleError: If the stages contain a cycle.
+        """
+        self.stages: dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise _DuplicateStageError(stage.name)
+            self.stages[stage.name] = stage
+
+        for stage in stages:
+            for dependency in stage.inputs:
+                if dependency not in self.stages:
+                    raise _UnknownStageError(stage.name, dependency)
+
+        self.order = self._topological_order()
+        self.downstream: dict[str, list[str]] = {name: [] for name in self.order}
+        for name in self.order:
+            for dependency in self.stages[name].inputs:
+                self.downstream[dependency].append(name)
+
+        self.work_dir = work_dir
+        self.failures: dict[str, tuple[str, Exception]] = {}
+        self.cache_hits: dict[str, int] = {}
+
+    def _topological_order(self) -> list[str]:
+        """
+        Order the stages so that every stage comes after its inputs.
+
+        :return: The names of the stages in topological order.
+        :rtype: list[str]
+
+        :raises _PipelineCycleError: If the stages contain a cycle.
+        """
+        remaining = {name: set(stage.inputs) for name, stage in self.stages.items()}
+        order = []
+        while remaining:
+            ready = [name for name, dependencies in remaining.items() if not dependencies]
+            if not ready:
+                raise _PipelineCycleError()
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for dependencies in remaining.values():
+                dependencies.difference_update(ready)
+        return order
+
+    def _ready_successors(self, name: str, available: dict[str, str]) -> list[str]:
+        """
+        Get the stages that became runnable once a stage finished.
+
+        :param name: The name of the finished stage.
+        :type name: str
+
+        :param available: The outputs available for the object by stage name.
+        :type available: dict[str, str]
+
+        :return: The names of the downstream stages whose inputs are all available.
+        :rtype: list[str]
+        """
+        return [
+            successor
+            for successor in self.downstream[name]
+            if all(dependency in available for dependency in self.stages[successor].inputs)
+        ]
+
+    def run(self, items: Mapping[str, dict]) -> dict[str, dict[str, str]]:
+        """
+        Run every object through the pipeline.
+
+        A stage is scheduled for an object as soon as all of its inputs for that
+        object are available. Failures are reported and stop only the stages
+        downstream of the failed one for the affected object. The first failure
+        of every object is kept in :attr:`failures`.
+
+        :param items: The payloads of the objects keyed by object id.
+        :type items: Mapping[str, dict]
+
+        :return: The stage outputs of every object keyed by object id and stage name.
+        :rtype: dict[str, dict[str, str]]
+        """
+        outputs: dict[str, dict[str, str]] = {item_id: {} for item_id in items}
+        self.failures = {}
+        self.cache_hits = dict.fromkeys(self.order, 0)
+
+        executors = {name: stage.make_executor() for name, stage in self.stages.items()}
+        pending: dict[Future, tuple[str, str]] = {}
+
+        def submit(item_id: str, name: str) -> None:
+            stage = self.stages[name]
+            item = items[item_id]
+            future = executors[name].submit(
+                _run_stage,
+                stage.func,
+                name,
+                os.path.join(self.work_dir, name),
+                stage.suffix,
+                stage.params,
+                {field: item.get(field) for field in stage.fields},
+                {dependency: outputs[item_id][dependency] for dependency in stage.inputs},
+                item,
+            )
+            pending[future] = (item_id, name)
+
+        try:
+            roots = [name for name in self.order if not self.stages[name].inputs]
+            for item_id in items:
+                for name in roots:
+                    submit(item_id, name)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item_id, name = pending.pop(future)
+                    try:
+                        outputs[item_id][name], cached = future.result()
+                    except Exception as err:
+                        self.failures.setdefault(item_id, (name, err))
+                        print(f"Failed to run stage {name} for {item_id}. {err}")
+                        continue
+
+                    self.cache_hits[name] += int(cached)
+                    for successor in self._ready_successors(name, outputs[item_id]):
+                        submit(item_id, successor)
+        finally:
+            for executor in executors.values():
+                executor.shutdown(cancel_futures=True)
+
+        return outputs
+
+    def export(self, outputs: dict[str, dict[str, str]], stage: str, out_dir: str) -> None:
+        """
+        Copy the outputs of a stage to a directory under their object ids.
+
+        :param outputs: The stage outputs returned by :meth:`run`.
+        :type outputs: dict[str, dict[str, str]]
+
+        :param stage: The name of the stage to export.
+        :type stage: str
+
+        :param out_dir: The directory to write the files to.
+        :type out_dir: str
+        """
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+        suffix = self.stages[stage].suffix
+        for item_id, paths in outputs.items():
+            if stage in paths:
+                shutil.copyfile(paths[stage], os.path.join(out_dir, f"{item_id}{suffix}"))
+
+
+def _capture_stage(output: str, inputs: dict[str, str], item: dict, survey: str) -> None:
+    """
+    Capture the FITS image of an object.
+    """
+    data.celestial_capture(survey, item["ra"], item["dec"], output)
+
+
+def _mask_stage(
+    output: str, inputs: dict[str, str], item: dict, freq: float, beam: tuple[float, float, float], dilation: int
+) -> None:
+    """
+    Generate the island mask of a captured image.
+    """
+    (image_path,) = inputs.values()
+    # Objects with the same capture share the mask name, so every run gets its own folder
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(output)) as mask_dir:
+        generated = data.generate_mask(
+            image_path,
+            mask_dir,
+            freq,
+            beam,
+            item.get("dilation", dilation),
+            item.get("threshold_pixel", 5.0),
+            item.get("threshold_island", 3.0),
+        )
+        if not generated:
+            raise RuntimeError("PyBDSF failed to generate the mask.")  # noqa: TRY003
+
+        os.replace(os.path.join(mask_dir, Path(image_path).name), output)
+
+
+def _convert_stage(output: str, inputs: dict[str, str], item: dict, img_size: Optional[tuple[int, int]]) -> None:
+    """
+    Convert a FITS file to a PNG image.
+    """
+    (fits_file,) = inputs.values()
+    data.fits_to_png(fits_file, img_size).save(output, format="PNG")
+
+
+def _apply_mask_stage(output: str, inputs: dict[str, str], item: dict) -> None:
+    """
+    Mask an image with its mask image.
+    """
+    with Image.open(inputs["image"]) as image, Image.open(inputs["mask_png"]) as mask:
+        data.mask_image(image, mask).save(output, format="PNG")
+
+
+def preprocessing_pipeline(
+    survey: str,
+    work_dir: str,
+    freq: float,
+    beam: tuple[float, float, float],
+    dilation: int = 0,
+    img_size: Optional[tuple[int, int]] = None,
+    capture_workers: int = 8,
+    cpu_workers: Optional[int] = None,
+) -> Pipeline:
+    """
+    Build the standard capture, mask, convert and apply-mask pipeline.
+
+    The graph is ``capture -> mask -> mask_png`` and ``capture -> image``, with
+    ``masked`` consuming both ``image`` and ``mask_png``. Captures run in a
+    thread pool since they wait on the network, the remaining stages run in
+    process pools.
+
+    :param survey: The name of the survey to be used e.g. 'VLA FIRST (1.4 GHz)'.
+    :type survey: str
+
+    :param work_dir: The directory holding the stage outputs.
+    :type work_dir: str
+
+    :param freq: Frequency of the image in MHz
+    :type freq: float
+
+    :param beam: Beam size of the image in arcsec
+    :type beam: tuple
+
+    :param dilation: Default dilation factor for objects without a 'dilation' field.
+    :type dilation: int
+
+    :param img_size: The size of the output images.
+    :type img_size: Optional[tuple[int, int]]
+
+    :param capture_workers: The number of concurrent SkyView requests.
+    :type capture_workers: int
+
+    :param cpu_workers: The number of processes of each CPU-bound stage, defaults to the CPU count.
+    :type cpu_workers: Optional[int]
+
+    :return: The preprocessing pipeline.
+    :rtype: Pipeline
+    """
+    cpu_workers = cpu_workers or os.cpu_count() or 1
+    stages = [
+        Stage(
+            "capture",
+            _capture_stage,
+            suffix=".fits",
+            fields=("ra", "dec"),
+            params={"survey": survey},
+            workers=capture_workers,
+        ),
+        Stage(
+            "mask",
+            _mask_stage,
+            inputs=("capture",),
+            suffix=".fits",
+            fields=("dilation", "threshold_pixel", "threshold_island"),
+            params={"freq": freq, "beam": tuple(beam), "dilation": dilation},
+            workers=cpu_workers,
+            executor="process",
+        ),
+        Stage(
+            "image",
+            _convert_stage,
+            inputs=("capture",),
+            suffix=".png",
+            params={"img_size": img_size},
+            workers=cpu_workers,
+            executor="process",
+        ),
+        Stage(
+            "mask_png",
+            _convert_stage,
+            inputs=("mask",),
+            suffix=".png",
+            params={"img_size": img_size},
+            workers=cpu_workers,
+            executor="process",
+        ),
+        Stage(
+            "masked",
+            _apply_mask_stage,
+            inputs=("image", "mask_png"),
+            suffix=".png",
+            workers=cpu_workers,
+            executor="process",
+        ),
+    ]
+    return Pipeline(stages, work_dir)
+
+
+def catalog_items(catalog: pd.DataFrame, classes: Optional[dict] = None, cls_col: Optional[str] = None) -> dict:  # type: ignore[no-any-unimported, unused-ignore]
+    """
+    Build pipeline payloads from a catalog of celestial objects.
+
+    Objects are named ``{label}_{tag}`` like the files written by
+    :func:`rgc.utils.data.celestial_capture_bulk`. The optional 'dilation',
+    'background sigma' and 'foreground sigma' columns become the mask
+    parameters of each object.
+
+    :param catalog: A pandas DataFrame containing the catalog of celestial objects.
+    :type catalog: pd.DataFrame
+
+    :param classes: A dictionary containing the classes of the celestial objects.
+    :type classes: Optional[dict]
+
+    :param cls_col: The name of the column containing the class labels.
+    :type cls_col: Optional[str]
+
+    :return: The payloads keyed by object id.
+    :rtype: dict
+    """
+    items: dict[str, dict[str, Any]] = {}
+    for _, entry in catalog.iterrows():
+        try:
+            tag = data.celestial_tag(entry)
+            coordinate = SkyCoord(tag, unit=(u.hourangle, u.deg))
+        except Exception as err:
+            print(f"Failed to read coordinates. {err}")
+            continue
+
+        label = data.get_class_labels(entry, classes, cls_col) if classes is not None and cls_col is not None else ""
+        name = entry["filename"] if "filename" in catalog.columns else tag
+
+        item = {"ra": float(coordinate.ra.deg), "dec": float(coordinate.dec.deg)}
+        for column, field in (
+            ("dilation", "dilation"),
+            ("background sigma", "threshold_pixel"),
+            ("foreground sigma", "threshold_island"),
+        ):
+            if column in catalog.columns:
+                item[field] = entry[column].item() if hasattr(entry[column], "item") else entry[column]
+
+        items[f"{label}_{name}"] = item
+
+    return items
@@ -0,0 +1,299 @@
+"""
+Streaming datasets over sharded image corpora.
+
+The map-style datasets of :mod:`rgc.utils.datasets` hold every image in
+memory, which does not scale to survey corpora of millions of cutouts.
+:func:`write_shards` splits a corpus into ``.npy`` shards of a fixed number of
+images, and :class:`ShardedDataset` streams them back at constant memory:
+shards are memory-mapped one at a time, shuffled at the shard level and mixed
+through a bounded shuffle buffer, and split between DDP ranks and DataLoader
+workers so that every sample is read by exactly one process per epoch.
+
+A shard ``<prefix>-000000`` consists of ``<prefix>-000000.images.npy`` with
+the uint8 images of shape (N, H, W) and ``<prefix>-000000.targets.npy`` with
+their N numeric targets.
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import glob
+import itertools
+import os
+import tempfile
+from collections.abc import Iterable, Iterator
+from typing import Any, Callable, Optional
+
+import numpy as np
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+
+from rgc.utils.datasets import _transform_image
+from rgc.utils.stats import _rank
+
+IMAGES_SUFFIX = ".images.npy"
+TARGETS_SUFFIX = ".targets.npy"
+
+
+def _save_atomic(path: str, array: np.ndarray) -> None:
+    """
+    Save an array to a ``.npy`` file atomically, so readers never see a partial shard.
+
+    :param path: The path to the file.
+    :type path: str
+
+    :param array: The array.
+    :type array: np.ndarray
+    """
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".npy", delete=False) as outfile:
+        np.save(outfile, np.ascontiguousarray(array))
+    os.replace(outfile.name, path)
+
+
+def write_shards(
+    samples: Iterable[tuple[np.ndarray, Any]],
+    directory: str,
+    shard_size: int = 4096,
+    prefix: str = "shard",
+) -> list[str]:
+    """
+    Write (image, target) samples to shards of ``shard_size`` images.
+
+    The samples are consumed lazily, so at most one shard is held in memory.
+    Only the last shard may hold fewer images.
+
+    :param samples: The uint8 images of shape (H, W) or (H, W, 1) and their numeric targets.
+    :type samples: Iterable[tuple[np.ndarray, Any]]
+
+    :param directory: The directory of the shards.
+    :type directory: str
+
+    :param shard_size: The number of images per shard.
+    :type shard_size: int
+
+    :param prefix: The prefix of the shard file names.
+    :type prefix: str
+
+    :return: The paths to the shards, without the suffixes.
+    :rtype: list[str]
+    """
+    os.makedirs(directory, exist_ok=True)
+    iterator = iter(samples)
+
+    shards = []
+    for index in itertools.count():
+        chunk = list(itertools.islice(iterator, shard_size))
+        if not chunk:
+            break
+
+        shard = os.path.join(directory, f"{prefix}-{index:06d}")
+        images = np.stack([np.asarray(img, dtype=np.uint8).reshape(np.shape(img)[:2]) for img, _ in chunk])
+        _save_atomic(shard + IMAGES_SUFFIX, images)
+        _save_atomic(shard + TARGETS_SUFFIX, np.asarray([target for _, target in chunk]))
+        shards.append(shard)
+    return shards
+
+
+def list_shards(directory: str, prefix: str = "shard") -> list[str]:
+    """
+    List the shards in a directory in order.
+
+    :param directory: The directory of the shards.
+    :type directory: str
+
+    :param prefix: The prefix of the shard file names.
+    :type prefix: str
+
+    :return: The paths to the shards, without the suffixes.
+    :rtype: list[str]
+    """
+    paths = sorted(glob.glob(os.path.join(glob.escape(directory), f"{prefix}-*{IMAGES_SUFFIX}")))
+    return [path[: -len(IMAGES_SUFFIX)] for path in paths]
+
+
+class ShardedDataset(IterableDataset):
+    """
+    A streaming dataset of (image, target) samples over ``.npy`` shards.
+
+    Every epoch, the shards are shuffled with a seed shared by all processes
+    and dealt round-robin to the DDP ranks, then to the DataLoader workers of
+    each rank. The shard list is padded by repeating shards so that every rank
+    gets the same number of shards, which keeps the ranks in step as long as
+    the shards are of equal size. Each worker reads its shards sequentially
+    through a memory map and shuffles the samples through a buffer of
+    ``buffer_size`` images, so memory stays constant whatever the corpus size.
+
+    Call :meth:`set_epoch` before every epoch to draw a new shuffle, as with
+    :class:`~torch.utils.data.distributed.DistributedSampler`. The epoch is
+    kept in shared memory so persistent workers see it too.
+    """
+
+    def __init__(
+        self,
+        shards: list[str],
+        transform: Optional[Callable] = None,
+        target_transform: Optional[Callable] = None,
+        shuffle: bool = False,
+        buffer_size: int = 1024,
+        seed: int = 0,
+        rank: Optional[int] = None,
+        world_size: Optional[int] = None,
+    ) -> None:
+        """
+        Initialize the dataset.
+
+        :param shards: The paths to the shards, without the suffixes, see :func:`list_shards`.
+        :type shards: list[str]
+
+        :param transform: The transform applied to the images, see :class:`~rgc.utils.datasets.Transforms`.
+        :type transform: Optional[Callable]
+
+        :param target_transform: The transform applied to the targets.
+        :type target_transform: Optional[Callable]
+
+        :param shuffle: Whether to shuffle the shards and the samples.
+        :type shuffle: bool
+
+        :param buffer_size: The number of samples in the shuffle buffer.
+        :type buffer_size: int
+
+        :param seed: The seed of the shuffle, shared by all processes.
+        :type seed: int
+
+        :param rank: The rank of this process, by default from the initialized process group.
+        :type rank: Optional[int]
+
+        :param world_size: The number of ranks, by default from the initialized process group.
+        :type world_size: Optional[int]
+        """
+        if not shards:
+            raise ValueError("No shards given.")  # noqa: TRY003
+
+        self.shards = list(shards)
+        self.transform = transform
+        self.target_transform = target_transform
+        self.shuffle = shuffle
+        self.buffer_size = buffer_size
+        self.seed = seed
+        self.rank = rank
+        self.world_size = world_size
+        self._epoch = torch.zeros((), dtype=torch.long).share_memory_()
+
+    def set_epoch(self, epoch: int) -> None:
+        """
+        Set the epoch, which selects the shuffle.
+
+        :param epoch: The epoch.
+        :type epoch: int
+        """
+        self._epoch.fill_(epoch)
+
+    def _rank(self) -> tuple[int, int]:
+        """
+        Get the rank of this process and the world size.
+
+        :return: The rank and the world size.
+        :rtype: tuple[int, int]
+        """
+        rank, world_size = _rank()
+        return (
+            rank if self.rank is None else self.rank,
+            world_size if self.world_size is None else self.world_size,
+        )
+
+    def rank_shards(self) -> list[str]:
+        """
+        Get the shards read by this rank in the current epoch, by all of its workers together.
+
+        :return: The paths to the shards.
+        :rtype: list[str]
+        """
+        rank, world_size = self._rank()
+        order = np.arange(len(self.shards))
+        if self.shuffle:
+            order = np.random.default_rng((self.seed, int(self._epoch))).permutation(order)
+
+        # Repeat shards so that every rank gets the same number
+        padded = -len(order) % world_size
+        order = np.concatenate([order, np.resize(order, padded)])
+        return [self.shards[i] for i in order[rank::world_size]]
+
+    def _worker_shards(self) -> tuple[list[str], np.random.Generator]:
+        """
+        Get the shards read by this worker and its random number generator for the epoch.
+
+        :return: The paths to the shards and the generator of the shuffle buffer.
+        :rtype: tuple[list[str], np.random.Generator]
+        """
+        rank, _ = self._rank()
+        info = get_worker_info()
+        worker, workers = (info.id, info.num_workers) if info is not None else (0, 1)
+        rng = np.random.default_rng((self.seed, int(self._epoch), rank, worker))
+        return self.rank_shards()[worker::workers], rng
+
+    def _samples(self, shards: list[str]) -> Iterator[tuple[np.ndarray, Any]]:
+        """
+        Read the samples of shards in order, one memory-mapped shard at a time.
+
+        :param shards: The paths to the shards.
+        :type shards: list[str]
+
+        :return: The images and their targets.
+        :rtype: Iterator[tuple[np.ndarray, Any]]
+        """
+        for shard in shards:
+            images = np.load(shard + IMAGES_SUFFIX, mmap_mode="r")
+            targets = np.load(shard + TARGETS_SUFFIX)
+            yield from zip(images, targets)
+
+    def __iter__(self) -> Iterator[tuple[Any, Any]]:
+        """
+        Iterate over the samples of this worker for the current epoch.
+
+        :return: The transformed images and targets.
+        :rtype: Iterator[tuple[Any, Any]]
+        """
+        shards, rng = self._worker_shards()
+        samples = self._samples(shards)
+        if self.shuffle:
+            samples = _shuffle_buffer(samples, self.buffer_size, rng)
+
+        for img, target in samples:
+            # Copy out of the memory map, the shard file may be closed before the image is used
+            img = _transform_image(self.transform, np.array(img), img.shape[:2])
+            if self.target_transform is not None:
+                target = self.target_transform(target)
+            yield img, target
+
+
+def _shuffle_buffer(samples: Iterator[Any], size: int, rng: np.random.Generator) -> Iterator[Any]:
+    """
+    Shuffle a stream of samples through a buffer of a bounded size.
+
+    Once the buffer is full, every new sample replaces a uniformly drawn
+    sample of the buffer, which is yielded. The remaining samples are
+    yielded in random order at the end of the stream.
+
+    :param samples: The samples.
+    :type samples: Iterator[Any]
+
+    :param size: The size of the buffer.
+    :type size: int
+
+    :param rng: The random number generator.
+    :type rng: np.random.Generator
+
+    :return: The shuffled samples.
+    :rtype: Iterator[Any]
+    """
+    buffer: list[Any] = []
+    for sample in samples:
+        if len(buffer) < size:
+            buffer.append(sample)
+            continue
+        index = rng.integers(size)
+        yield buffer[index]
+        buffer[index] = sample
+
+    for index in rng.permutation(len(buffer)):
+        yield buffer[index]
@@ -0,0 +1,469 @@
+"""
+Streaming dataset statistics.
+
+The accumulators in this module see the data one batch at a time and keep a
+fixed amount of state per channel, so statistics of datasets larger than memory
+are computed in a single pass. Partial accumulators, e.g. filled by different
+DataLoader workers or DDP ranks, are combined with ``merge``.
+:class:`RunningMeanStd` tracks the mean and variance and
+:class:`QuantileSketch` the quantiles used for robust clipping.
+
+:func:`load_dataset_stats` caches the normalization constants of a dataset in
+a JSON sidecar file, so they are computed once instead of pasted by hand::
+
+    stats = load_dataset_stats(MiraBest("data/mirabest"), num_workers=4)
+    transforms.Normalize(mean=stats.mean, std=stats.std)
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+import json
+import os
+from typing import TYPE_CHECKING, NamedTuple, Optional, Union, cast
+
+import numpy as np
+
+from rgc._lazy import LazyImport
+from rgc.utils._io import batch_signature, write_atomic
+
+if TYPE_CHECKING:
+    import torch
+
+    from rgc.utils.datasets import Bent, MiraBest, RGZ20k
+
+    RawDataset = Union[Bent, MiraBest, RGZ20k]
+else:
+    torch = LazyImport("torch")
+
+
+class RunningMeanStd:
+    """
+    Per-channel running mean and variance using the parallel Welford algorithm.
+
+    Batches are reduced to their count, mean and sum of squared deviations in
+    float64 and folded into the running state with the update of Chan et al.,
+    which is numerically stable even for millions of pixels.
+    """
+
+    def __init__(self, channels: int = 1) -> None:
+        """
+        Initialize an empty accumulator.
+
+        :param channels: The number of channels, taken from the first batch if it differs.
+        :type channels: int
+        """
+        self.count = 0
+        self.mean = np.zeros(channels, dtype=np.float64)
+        self.m2 = np.zeros(channels, dtype=np.float64)
+
+    def update(self, batch: np.ndarray) -> None:
+        """
+        Add a batch of shape (N, C, ...) to the statistics.
+
+        :param batch: The batch of samples.
+        :type batch: np.ndarray
+        """
+        values = np.asarray(batch)
+        values = values.reshape(values.shape[0], values.shape[1], -1) if values.ndim > 1 else values[:, None, None]
+        values = np.moveaxis(values, 1, 0).reshape(values.shape[1], -1)
+        if values.shape[1] == 0:
+            return
+
+        mean = values.mean(axis=1, dtype=np.float64)
+        m2 = np.square(values - mean[:, None], dtype=np.float64).sum(axis=1)
+        self._combine(values.shape[1], mean, m2)
+
+    def merge(self, other: "RunningMeanStd") -> None:
+        """
+        Merge the statistics of another accumulator.
+
+        :param other: The accumulator to merge.
+        :type other: RunningMeanStd
+        """
+        if other.count:
+            self._combine(other.count, other.mean, other.m2)
+
+    def _combine(self, count: int, mean: np.ndarray, m2: np.ndarray) -> None:
+        """
+        Fold the count, mean and sum of squared deviations of a partition into the state.
+
+        :param count: The number of values per channel of the partition.
+        :type count: int
+
+        :param mean: The per-channel mean of the partition.
+        :type mean: np.ndarray
+
+        :param m2: The per-channel sum of squared deviations of the partition.
+        :type m2: np.ndarray
+        """
+        if self.count == 0:
+            self.count, self.mean, self.m2 = count, np.array(mean, dtype=np.float64), np.array(m2, dtype=np.float64)
+            return
+
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self.m2 = self.m2 + m2 + np.square(delta) * (self.count * count / total)
+        self.count = total
+
+    def std(self, ddof: int = 1) -> np.ndarray:
+        """
+        Get the per-channel standard deviation.
+
+        :param ddof: The delta degrees of freedom, 1 for the unbiased estimate.
+        :type ddof: int
+
+        :return: The standard deviation of every channel.
+        :rtype: np.ndarray
+        """
+        if self.count <= ddof:
+            return np.full_like(self.mean, np.nan)
+        return np.sqrt(self.m2 / (self.count - ddof))
+
+
+class QuantileSketch:
+    """
+    A mergeable log-bucketed histogram (DDSketch) for streaming quantiles of heavy-tailed data.
+
+    Magnitudes are counted in buckets whose bounds grow geometrically by
+    ``gamma = (1 + alpha) / (1 - alpha)``, separately for positive and negative
+    values, so every quantile is estimated within a relative error of ``alpha``
+    no matter how far the tail reaches. Magnitudes below ``min_value`` count as
+    zero and those above ``max_value`` fall into the last bucket. Memory is a
+    fixed array of buckets, and sketches with the same parameters merge by
+    adding their counts.
+    """
+
+    def __init__(self, alpha: float = 0.01, min_value: float = 1e-9, max_value: float = 1e9) -> None:
+        """
+        Initialize an empty sketch.
+
+        :param alpha: The relative accuracy of the quantiles.
+        :type alpha: float
+
+        :param min_value: The smallest magnitude told apart from zero.
+        :type min_value: float
+
+        :param max_value: The largest magnitude with a bucket of its own.
+        :type max_value: float
+        """
+        self.alpha = alpha
+        self.min_value = min_value
+        self.max_value = max_value
+        self._log_gamma = np.log1p(alpha) - np.log1p(-alpha)
+        self._first = int(np.ceil(np.log(min_value) / self._log_gamma))
+        buckets = int(np.ceil(np.log(max_value) / self._log_gamma)) - self._first + 1
+        self.positive = np.zeros(buckets, dtype=np.int64)
+        self.negative = np.zeros(buckets, dtype=np.int64)
+        self.zero = 0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    @property
+    def total(self) -> int:
+        """
+        Get the number of values in the sketch.
+
+        :return: The number of values.
+        :rtype: int
+        """
+        return int(self.positive.sum() + self.negative.sum() + self.zero)
+
+    def update(self, values: np.ndarray) -> None:
+        """
+        Add values to the sketch, ignoring NaN and infinite values.
+
+        :param values: The values, of any shape.
+        :type values: np.ndarray
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+
+        magnitude = np.abs(values)
+        nonzero = magnitude >= self.min_value
+        self.zero += int(values.size - np.count_nonzero(nonzero))
+
+        index = np.ceil(np.log(magnitude[nonzero]) / self._log_gamma).astype(np.int64) - self._first
+        index = np.clip(index, 0, self.positive.size - 1)
+        negative = values[nonzero] < 0
+        self.positive += np.bincount(index[~negative], minlength=self.positive.size)
+        self.negative += np.bincount(index[negative], minlength=self.negative.size)
+
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """
+        Merge the values of another sketch with the same parameters.
+
+        :param other: The sketch to merge.
+        :type other: QuantileSketch
+
+        :raises _SketchMismatchError: If the sketches have different parameters.
+        """
+        if (other.alpha, other.min_value, other.max_value) != (self.alpha, self.min_value, self.max_value):
+            raise _SketchMismatchError()
+
+        self.positive += other.positive
+        self.negative += other.negative
+        self.zero += other.zero
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def quantile(self, q: Union[float, np.ndarray]) -> np.ndarray:
+        """
+        Estimate quantiles of the values.
+
+        :param q: The quantiles in [0, 1].
+        :type q: Union[float, np.ndarray]
+
+        :return: The estimated values at the quantiles, NaN for an empty sketch.
+        :rtype: np.ndarray
+        """
+        q = np.asarray(q, dtype=np.float64)
+        total = self.total
+        if total == 0:
+            return np.full_like(q, np.nan)
+
+        # Buckets in ascending order of value: negative ones by decreasing magnitude, zero, positive ones.
+        counts = np.concatenate([self.negative[::-1], [self.zero], self.positive])
+        bounds = np.exp((np.arange(self.positive.size) + self._first) * self._log_gamma)
+        magnitude = bounds * 2 / (1 + np.exp(self._log_gamma))
+        centers = np.concatenate([-magnitude[::-1], [0.0], magnitude])
+
+        rank = q * (total - 1)
+        index = np.searchsorted(np.cumsum(counts), rank, side="right")
+        values = centers[np.minimum(index, centers.size - 1)]
+        values = np.where(q <= 0, self.minimum, np.where(q >= 1, self.maximum, values))
+        return cast(np.ndarray, np.clip(values, self.minimum, self.maximum))
+
+
+class _SketchMismatchError(Exception):
+    """
+    An exception raised when merging quantile sketches with different parameters.
+    """
+
+    def __init__(
+        self, message: str = "Only quantile sketches with the same alpha, min_value and max_value can be merged."
+    ) -> None:
+        super().__init__(message)
+
+
+_SUBSET_OPTIONS = ("cut_threshold", "include_small", "mb_cut", "remove_duplicates")
+
+
+class DatasetStats(NamedTuple):
+    """
+    Per-channel normalization constants of a dataset, on the [0, 1] scale of ``ToTensor``.
+    """
+
+    pixels: int
+    mean: tuple[float, ...]
+    std: tuple[float, ...]
+
+
+class _ChunkStats:
+    """
+    Map-style dataset yielding the partial statistics of consecutive chunks of raw images.
+
+    Used with a DataLoader so that chunks are reduced in its worker processes.
+    """
+
+    def __init__(self, data: np.ndarray, chunks: list[tuple[int, int]]) -> None:
+        """
+        Initialize the chunks.
+
+        :param data: The raw images of shape (N, H, W, C).
+        :type data: np.ndarray
+
+        :param chunks: The start and stop index of every chunk.
+        :type chunks: list[tuple[int, int]]
+        """
+        self.data = data
+        self.chunks = chunks
+
+    def __getitem__(self, index: int) -> RunningMeanStd:
+        """
+        Reduce one chunk.
+
+        :param index: The index of the chunk.
+        :type index: int
+
+        :return: The statistics of the chunk.
+        :rtype: RunningMeanStd
+        """
+        start, stop = self.chunks[index]
+        running = RunningMeanStd()
+        running.update(np.moveaxis(self.data[start:stop], -1, 1))
+        return running
+
+    def __len__(self) -> int:
+        """
+        Get the number of chunks.
+
+        :return: The number of chunks.
+        :rtype: int
+        """
+        return len(self.chunks)
+
+
+def _all_gather(running: RunningMeanStd) -> RunningMeanStd:
+    """
+    Merge the statistics of every DDP rank if a process group is initialized.
+
+    :param running: The statistics of this rank.
+    :type running: RunningMeanStd
+
+    :return: The statistics of all ranks.
+    :rtype: RunningMeanStd
+    """
+    if not (torch.distributed.is_available() and torch.distributed.is_initialized()):
+        return running
+
+    gathered: list[Optional[RunningMeanStd]] = [None] * torch.distributed.get_world_size()
+    torch.distributed.all_gather_object(gathered, running)
+
+    merged = RunningMeanStd()
+    for partial in gathered:
+        merged.merge(cast(RunningMeanStd, partial))
+    return merged
+
+
+def _rank() -> tuple[int, int]:
+    """
+    Get the rank of this process and the world size.
+
+    :return: The rank and the world size, (0, 1) outside of distributed runs.
+    :rtype: tuple[int, int]
+    """
+    if torch.distributed.is_available() and torch.distributed.is_initialized():
+        return torch.distributed.get_rank(), torch.distributed.get_world_size()
+    return 0, 1
+
+
+def dataset_stats(dataset: "RawDataset", num_workers: int = 0, chunk_size: int = 256) -> DatasetStats:
+    """
+    Compute the per-channel mean and standard deviation of the raw images of a dataset.
+
+    The uint8 ``data`` array of :class:`~rgc.utils.datasets.Bent`,
+    :class:`~rgc.utils.datasets.MiraBest` or :class:`~rgc.utils.datasets.RGZ20k`
+    is reduced directly, without decoding images or applying transforms. The
+    chunks are reduced by ``num_workers`` DataLoader workers, and in a DDP run
+    every rank reduces its share of the chunks before the partial results are
+    merged.
+
+    :param dataset: The dataset, whose ``data`` is an array of shape (N, H, W, C).
+    :type dataset: Union[Bent, MiraBest, RGZ20k]
+
+    :param num_workers: The number of DataLoader worker processes.
+    :type num_workers: int
+
+    :param chunk_size: The number of images reduced at once.
+    :type chunk_size: int
+
+    :return: The number of pixels per channel, and the mean and standard deviation on the [0, 1] scale.
+    :rtype: DatasetStats
+    """
+    data = np.asarray(dataset.data)
+    rank, world_size = _rank()
+    chunks = [(start, min(start + chunk_size, len(data))) for start in range(0, len(data), chunk_size)]
+
+    loader: torch.utils.data.DataLoader[RunningMeanStd] = torch.utils.data.DataLoader(
+        cast("torch.utils.data.Dataset[RunningMeanStd]", _ChunkStats(data, chunks[rank::world_size])),
+        batch_size=None,
+        num_workers=num_workers,
+    )
+    running = RunningMeanStd()
+    for partial in loader:
+        running.merge(partial)
+    running = _all_gather(running)
+
+    scale = 255.0 if data.dtype == np.uint8 else 1.0
+    return DatasetStats(
+        pixels=int(running.count),
+        mean=tuple(float(value) for value in running.mean / scale),
+        std=tuple(float(value) for value in running.std() / scale),
+    )
+
+
+def stats_key(dataset: "RawDataset") -> str:
+    """
+    Get the sidecar key of a dataset, made of its class, split and subset options.
+
+    :param dataset: The dataset.
+    :type dataset: Union[Bent, MiraBest, RGZ20k]
+
+    :return: The key e.g. 'RGZ20k/train/cut_threshold=0.0,mb_cut=False,remove_duplicates=True'.
+    :rtype: str
+    """
+    split = "train" if getattr(dataset, "train", True) else "test"
+    options = ",".join(f"{option}={getattr(dataset, option)}" for option in _SUBSET_OPTIONS if hasattr(dataset, option))
+    return "/".join(part for part in (type(dataset).__name__, split, options) if part)
+
+
+def _stats_sources(dataset: "RawDataset") -> list[list]:
+    """
+    Get the signature of the batch files of the split of a dataset.
+
+    :param dataset: The dataset.
+    :type dataset: Union[Bent, MiraBest, RGZ20k]
+
+    :return: The name, size and modification time of every batch file, see :func:`~rgc.utils._io.batch_signature`.
+    :rtype: list[list]
+    """
+    files = getattr(dataset, "train_list" if getattr(dataset, "train", True) else "test_list", [])
+    return batch_signature([os.path.join(dataset.root, dataset.base_folder, name) for name, _ in files])
+
+
+def load_dataset_stats(
+    dataset: "RawDataset",
+    path: Optional[str] = None,
+    num_workers: int = 0,
+    recompute: bool = False,
+) -> DatasetStats:
+    """
+    Load the statistics of a dataset from its sidecar file, computing and storing them if missing.
+
+    The sidecar is a JSON file, by default ``stats.json`` next to the batches of
+    the dataset, holding the statistics of every dataset and split under
+    :func:`stats_key` with the size and modification time of their batch
+    files. Statistics of changed batch files are computed again. Only rank 0
+    writes it in a DDP run.
+
+    :param dataset: The dataset.
+    :type dataset: Union[Bent, MiraBest, RGZ20k]
+
+    :param path: Path to the sidecar file.
+    :type path: Optional[str]
+
+    :param num_workers: The number of DataLoader worker processes used to compute missing statistics.
+    :type num_workers: int
+
+    :param recompute: If True, ignores the stored statistics.
+    :type recompute: bool
+
+    :return: The statistics of the dataset.
+    :rtype: DatasetStats
+    """
+    if path is None:
+        path = os.path.join(dataset.root, dataset.base_folder, "stats.json")
+    key = stats_key(dataset)
+    sources = _stats_sources(dataset)
+
+    sidecar = {}
+    if os.path.exists(path):
+        with open(path) as infile:
+            sidecar = json.load(infile)
+
+    entry = sidecar.get(key)
+    if entry is not None and entry.get("sources") == sources and not recompute:
+        return DatasetStats(pixels=entry["pixels"], mean=tuple(entry["mean"]), std=tuple(entry["std"]))
+
+    stats = dataset_stats(dataset, num_workers=num_workers)
+    if _rank()[0] == 0:
+        sidecar[key] = {**stats._asdict(), "sources": sources}
+        write_atomic(path, json.dumps(sidecar, indent=2, sort_keys=True) + "\n")
+    return stats
@@ -0,0 +1,288 @@
+"""
+Caches of transformed and decoded dataset samples.
+
+Evaluation transforms such as padding, center cropping and normalization give
+the same output for an image every epoch. :class:`MaterializedDataset` computes
+each sample once and keeps it in a shared-memory tensor, which DataLoader
+workers fill on the first pass and all later epochs read. Random augmentations
+must run every epoch; :class:`LRUDataset` keeps the decoded images they start
+from instead, so only the augmentation is repeated.
+"""
+
+__author__ = "Mir Sazzat Hossain"
+
+
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any, Optional
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+from rgc.utils.datasets import _transform_image
+
+
+class _CacheDataset(Dataset):
+    """
+    A dataset wrapping another one, forwarding unknown attributes to it.
+    """
+
+    def __init__(self, dataset: Dataset) -> None:
+        """
+        Initialize the wrapper.
+
+        :param dataset: The wrapped dataset.
+        :type dataset: Dataset
+        """
+        self.dataset = dataset
+
+    def __getattr__(self, name: str) -> Any:
+        """
+        Get an attribute of the wrapped dataset, such as its ``data`` or ``targets``.
+
+        :param name: The name of the attribute.
+        :type name: str
+
+        :return: The attribute.
+        :rtype: Any
+        """
+        # Guard against recursion while unpickling, before ``dataset`` is set
+        if name == "dataset" or name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+    def __len__(self) -> int:
+        """
+        Get the length of the dataset.
+
+        :return: The length of the wrapped dataset.
+        :rtype: int
+        """
+        return len(self.dataset)  # type: ignore[arg-type]
+
+
+class MaterializedDataset(_CacheDataset):
+    """
+    A dataset computing every sample of a deterministic dataset once.
+
+    The transformed images and the targets are stored in tensors in shared
+    memory, allocated from the shape of the first sample. Samples are computed
+    on first access, by whichever process accesses them, so the DataLoader
+    workers of the first epoch fill the cache for every later epoch. The
+    targets must be numbers or tensors.
+
+    Only the samples at ``indices`` are cached if given, e.g. the shard a
+    distributed sampler assigns to the process, so every process of a
+    distributed run holds its own share of the split rather than all of it.
+    Other samples are computed on every access.
+    """
+
+    def __init__(self, dataset: Dataset, indices: Optional[Sequence[int]] = None) -> None:
+        """
+        Initialize the dataset.
+
+        :param dataset: The dataset, whose samples are (image, target) pairs.
+        :type dataset: Dataset
+
+        :param indices: The indices of the cached samples, None for all.
+        :type indices: Optional[Sequence[int]]
+        """
+        super().__init__(dataset)
+        length = len(self)
+        cached = torch.arange(length) if indices is None else torch.as_tensor(indices, dtype=torch.long).unique()
+        # The position of every sample in the cache, -1 for samples that are not cached
+        self.slots = torch.full((length,), -1, dtype=torch.long)
+        self.slots[cached] = torch.arange(len(cached))
+
+        image, target = dataset[int(cached[0])]
+        image, target = torch.as_tensor(image), torch.as_tensor(target)
+
+        self.images = torch.empty((len(cached), *image.shape), dtype=image.dtype).share_memory_()
+        self.targets = torch.empty((len(cached), *target.shape), dtype=target.dtype).share_memory_()
+        self.filled = torch.zeros(len(cached), dtype=torch.bool).share_memory_()
+        self._store(0, image, target)
+
+    def _store(self, slot: int, image: Any, target: Any) -> None:
+        """
+        Store a sample in the cache.
+
+        :param slot: The position of the sample in the cache.
+        :type slot: int
+
+        :param image: The transformed image.
+        :type image: Any
+
+        :param target: The target.
+        :type target: Any
+        """
+        self.images[slot] = torch.as_tensor(image)
+        self.targets[slot] = torch.as_tensor(target)
+        # Set last, so readers in other workers never see a partly written sample
+        self.filled[slot] = True
+
+    def __getitem__(self, index: int) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        Get a sample, computing it on first access.
+
+        :param index: The index of the sample.
+        :type index: int
+
+        :return: A copy of the transformed image and the target.
+        :rtype: tuple[torch.Tensor, torch.Tensor]
+        """
+        slot = int(self.slots[index])
+        if slot < 0:
+            image, target = self.dataset[index]
+            return torch.as_tensor(image), torch.as_tensor(target)
+        if not self.filled[slot]:
+            self._store(slot, *self.dataset[index])
+        return self.images[slot].clone(), self.targets[slot].clone()
+
+    def __getitems__(self, indices: list[int]) -> list[tuple[torch.Tensor, torch.Tensor]]:
+        """
+        Get a batch of samples, computing the missing ones at once.
+
+        :param indices: The indices of the samples.
+        :type indices: list[int]
+
+        :return: The transformed images and the targets.
+        :rtype: list[tuple[torch.Tensor, torch.Tensor]]
+        """
+        slots = self.slots[torch.as_tensor(indices, dtype=torch.long)]
+        if bool((slots < 0).any()):
+            return [self[i] for i in indices]
+
+        missing = (~self.filled[slots]).nonzero().flatten().tolist()
+        if missing:
+            getitems = getattr(self.dataset, "__getitems__", None)
+            batch = [indices[i] for i in missing]
+            samples = getitems(batch) if getitems is not None else [self.dataset[i] for i in batch]
+            for i, sample in zip(missing, samples):
+                self._store(int(slots[i]), *sample)
+
+        # Advanced indexing gathers the batch into fresh tensors
+        return list(zip(self.images[slots].unbind(0), self.targets[slots].unbind(0)))
+
+    @property
+    def complete(self) -> bool:
+        """
+        Whether every sample has been computed.
+
+        :return: True if the cache is complete.
+        :rtype: bool
+        """
+        return bool(self.filled.all())
+
+
+class LRUDataset(_CacheDataset):
+    """
+    A dataset caching the decoded images of another one before its transform.
+
+    The transform of the wrapped dataset is applied to the cached image on
+    every access, so random augmentations still vary between epochs. Every
+    DataLoader worker holds its own cache of at most ``maxsize`` images.
+    """
+
+    def __init__(self, dataset: Dataset, maxsize: int) -> None:
+        """
+        Initialize the dataset.
+
+        :param dataset: The dataset, with a ``transform`` attribute applied to its images.
+        :type dataset: Dataset
+
+        :param maxsize: The maximum number of cached images.
+        :type maxsize: int
+        """
+        super().__init__(dataset)
+        self.transform = dataset.transform  # type: ignore[attr-defined]
+        self.maxsize = maxsize
+        self._cache: OrderedDict[int, tuple[np.ndarray, Any]] = OrderedDict()
+
+    def _decoded(self, index: int) -> tuple[np.ndarray, Any]:
+        """
+        Get the decoded image and the target of a sample.
+
+        :param index: The index of the sample.
+        :type index: int
+
+        :return: The untransformed image and the target.
+        :rtype: tuple[np.ndarray, Any]
+        """
+        if index in self._cache:
+            self._cache.move_to_end(index)
+            return self._cache[index]
+
+        transform = self.dataset.transform  # type: ignore[attr-defined]
+        self.dataset.transform = _Decode()  # type: ignore[attr-defined]
+        try:
+            sample: tuple[np.ndarray, Any] = self.dataset[index]
+        finally:
+            self.dataset.transform = transform  # type: ignore[attr-defined]
+
+        self._cache[index] = sample
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return sample
+
+    def __getitem__(self, index: int) -> tuple[Any, Any]:
+        """
+        Get a sample, decoding its image on a cache miss.
+
+        :param index: The index of the sample.
+        :type index: int
+
+        :return: The transformed image and the target.
+        :rtype: tuple[Any, Any]
+        """
+        img, target = self._decoded(index)
+        return _transform_image(self.transform, img), target
+
+
+class _Decode:
+    """
+    A transform returning the decoded image array unchanged.
+    """
+
+    accepts_arrays = True
+
+    def __call__(self, img: np.ndarray) -> np.ndarray:
+        """
+        Return the image.
+
+        :param img: The image, a writable array owned by the caller.
+        :type img: np.ndarray
+
+        :return: The image.
+        :rtype: np.ndarray
+        """
+        return img
+
+
+def cache_transform_outputs(dataset: Dataset, lru_size: int = 0, indices: Optional[Sequence[int]] = None) -> Dataset:
+    """
+    Wrap a dataset in the cache suited to its transform.
+
+    Datasets with a deterministic transform are materialized, see
+    :class:`MaterializedDataset`. Others get an LRU cache of decoded images if
+    ``lru_size`` is positive, see :class:`LRUDataset`, and are returned
+    unchanged otherwise.
+
+    :param dataset: The dataset, with a ``transform`` attribute.
+    :type dataset: Dataset
+
+    :param lru_size: The maximum number of decoded images cached for random transforms.
+    :type lru_size: int
+
+    :param indices: The indices of the samples to materialize, None for all.
+    :type indices: Optional[Sequence[int]]
+
+    :return: The cached dataset.
+    :rtype: Dataset
+    """
+    transform: Optional[Any] = getattr(dataset, "transform", None)
+    if transform is not None and getattr(transform, "deterministic", False):
+        return MaterializedDataset(dataset, indices)
+    if lru_size > 0:
+        return LRUDataset(dataset, lru_size)
+    return dataset
@@ -0,0 +1,74 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from rgc.utils.datasets import Bent, MiraBest, RGZ20k
+
+BENT_LABELS = ["100", "101", "200", "201"]
+
+
+def write_batches(folder, batches, meta):
+    """Write CIFAR-style pickled batches and their metadata to a folder."""
+    os.makedirs(folder, exist_ok=True)
+    for file_name, entry in batches.items():
+        with open(os.path.join(folder, file_name), "wb") as outfile:
+            pickle.dump(entry, outfile)
+    with open(os.path.join(folder, "batches.meta"), "wb") as outfile:
+        pickle.dump(meta, outfile)
+
+
+@pytest.fixture
+def bent_root(tmp_path, monkeypatch):
+    """A synthetic BENT dataset of 8 images per batch in a ``bent`` folder, with integrity checks disabled."""
+    rng = np.random.default_rng(0)
+    batches = {}
+    for file_name, _ in Bent.train_list + Bent.test_list:
+        batches[file_name] = {
+            "data": rng.integers(0, 256, size=(8, 150 * 150), dtype=np.uint8),
+            "labels": [BENT_LABELS[i % 4] for i in range(8)],
+        }
+    write_batches(os.path.join(tmp_path, "bent", Bent.base_folder), batches, {"labels": BENT_LABELS})
+
+    monkeypatch.setattr("rgc.utils.datasets.check_integrity", lambda *args: True)
+    return str(tmp_path / "bent")
+
+
+@pytest.fixture
+def mirabest_root(tmp_path, monkeypatch):
+    """A synthetic MiraBest dataset of 4 images per batch, with integrity checks disabled."""
+    rng = np.random.default_rng(1)
+    batches = {}
+    for file_name, _ in MiraBest.train_list + MiraBest.test_list:
+        batches[file_name] = {
+            "data": rng.integers(0, 256, size=(4, 150 * 150), dtype=np.uint8),
+            "labels": [0, 1, 2, 3],
+        }
+    root = os.path.join(tmp_path, "mirabest")
+    write_batches(os.path.join(root, MiraBest.base_folder), batches, {"label_names": ["0", "1", "2", "3"]})
+
+    monkeypatch.setattr("rgc.utils.datasets.check_integrity", lambda *args: True)
+    return root
+
+
+@pytest.fixture
+def rgz_root(tmp_path, monkeypatch):
+    """A synthetic RGZ20k dataset of 6 images per batch, with one duplicate per batch."""
+    rng = np.random.default_rng(2)
+    batches = {}
+    for batch, (file_name, _) in enumerate(RGZ20k.train_list + RGZ20k.test_list):
+        data = rng.integers(0, 256, size=(6, 150 * 150), dtype=np.uint8)
+        data[5] = data[1]
+        batches[file_name] = {
+            "data": data,
+            "filenames": [f"source_{batch}_{i}" for i in range(6)],
+            "src_ids": [batch * 100 + i for i in range(6)],
+            "mb_flag": [0, 0, 0, 0, 1, 0],
+            "LAS": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+        }
+    root = os.path.join(tmp_path, "rgz20k")
+    write_batches(os.path.join(root, RGZ20k.base_folder), batches, {"label_names": []})
+
+    monkeypatch.setattr("rgc.utils.datasets.check_integrity", lambda *args: True)
+    return root
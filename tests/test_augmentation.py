@@ -0,0 +1,68 @@
+import albumentations
+import cv2
+import numpy as np
+import torch
+from albumentations.pytorch import ToTensorV2
+from torch.utils.data import DataLoader
+
+from rgc.utils.augmentation import BatchAugmentation, ToUint8Tensor
+from rgc.utils.datasets import Bent, Transforms
+
+
+def test_matches_albumentations_without_rotation():
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 256, size=(4, 150, 150), dtype=np.uint8)
+    pipeline = Transforms(
+        albumentations.Compose([
+            albumentations.PadIfNeeded(min_height=151, min_width=151, border_mode=cv2.BORDER_CONSTANT, fill=0),
+            albumentations.CenterCrop(height=151, width=151),
+            albumentations.Normalize(mean=(0.0032), std=(0.0376)),
+            ToTensorV2(),
+        ])
+    )
+    augmentation = BatchAugmentation(151, rotate=None, mean=0.0032, std=0.0376)
+
+    expected = torch.stack([pipeline(img) for img in images])
+    augmented = augmentation(torch.from_numpy(images))
+
+    assert augmentation.deterministic
+    assert augmented.shape == (4, 1, 151, 151)
+    torch.testing.assert_close(augmented, expected, rtol=1e-5, atol=1e-4)
+
+
+def test_center_crop():
+    images = torch.arange(2 * 6 * 6, dtype=torch.uint8).reshape(2, 6, 6, 1)
+
+    augmented = BatchAugmentation(4, rotate=None)(images)
+
+    torch.testing.assert_close(augmented * 255, images[:, 1:5, 1:5].permute(0, 3, 1, 2).float())
+
+
+def test_rotation_by_quarter_turn():
+    images = torch.randint(0, 256, (3, 1, 151, 151), dtype=torch.uint8)
+
+    rotated = BatchAugmentation(151, rotate=(90.0, 90.0), max_pixel_value=1.0)(images)
+
+    torch.testing.assert_close(rotated, torch.rot90(images.float(), k=1, dims=(2, 3)), rtol=0, atol=1e-2)
+
+
+def test_random_rotations_differ_per_image():
+    images = torch.randint(0, 256, (1, 151, 151), dtype=torch.uint8).expand(8, -1, -1)
+    augmentation = BatchAugmentation(151, generator=torch.Generator().manual_seed(0))
+
+    rotated = augmentation(images)
+
+    assert not augmentation.deterministic
+    assert not torch.allclose(rotated[0], rotated[1])
+
+
+def test_collate(bent_root):
+    dataset = Bent(bent_root, train=False, transform=ToUint8Tensor())
+    augmentation = BatchAugmentation(151, mean=0.5, std=0.5)
+    loader = DataLoader(dataset, batch_size=4, collate_fn=augmentation.collate)
+
+    images, targets = next(iter(loader))
+
+    assert images.shape == (4, 1, 151, 151)
+    assert images.dtype == torch.float32
+    assert targets.tolist() == dataset.target[:4].tolist()
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from astropy.io import fits
+
+from rgc.cli import _parse_classes, format_summary, main
+from rgc.utils import data
+from rgc.utils.data import BulkSummary, fits_clip_bounds
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.fits_dir = os.path.join(self.test_dir.name, "fits")
+        self.png_dir = os.path.join(self.test_dir.name, "png")
+        os.makedirs(self.fits_dir)
+
+        rng = np.random.default_rng(0)
+        for i in range(4):
+            fits.writeto(os.path.join(self.fits_dir, f"100_{i}.fits"), rng.random((8, 8)).astype(np.float32))
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    @patch("builtins.print")
+    def test_convert_in_parallel(self, mock_print):
+        status = main(["convert", self.fits_dir, self.png_dir, "--workers", "2", "--chunk-size", "2"])
+
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(os.listdir(self.png_dir)), [f"100_{i}.png" for i in range(4)])
+        self.assertIn("4 total, 4 succeeded, 0 failed, 0 skipped", mock_print.call_args[0][0])
+
+    @patch("builtins.print")
+    def test_convert_resume(self, mock_print):
+        main(["convert", self.fits_dir, self.png_dir, "--workers", "1"])
+        os.remove(os.path.join(self.png_dir, "100_0.png"))
+
+        status = main(["convert", self.fits_dir, self.png_dir, "--workers", "1", "--resume"])
+
+        self.assertEqual(status, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.png_dir, "100_0.png")))
+        self.assertIn("4 total, 1 succeeded, 0 failed, 3 skipped", mock_print.call_args[0][0])
+
+    @patch("builtins.print")
+    def test_convert_with_clip_percentiles(self, mock_print):
+        status = main(["convert", self.fits_dir, self.png_dir, "--workers", "2", "--clip-percentiles", "1", "99"])
+
+        self.assertEqual(status, 0)
+        self.assertEqual(len(os.listdir(self.png_dir)), 4)
+        self.assertTrue(mock_print.call_args_list[0][0][0].startswith("Clipping to ["))
+
+    def test_fits_clip_bounds(self):
+        low, high = fits_clip_bounds(self.fits_dir, (0, 100))
+
+        values = np.concatenate([
+            fits.getdata(os.path.join(self.fits_dir, name)).ravel() for name in os.listdir(self.fits_dir)
+        ])
+        self.assertEqual((low, high), (values.min(), values.max()))
+        self.assertEqual(fits_clip_bounds(self.fits_dir, (0, 100), workers=2, chunk_size=0), (low, high))
+
+    @patch("builtins.print")
+    def test_metrics_export(self, mock_print):
+        json_path = os.path.join(self.test_dir.name, "metrics.json")
+        prom_path = os.path.join(self.test_dir.name, "rgc.prom")
+
+        main(["convert", self.fits_dir, self.png_dir, "--workers", "1", "--metrics-json", json_path])
+        main(["convert", self.fits_dir, self.png_dir, "--workers", "1", "--metrics-prom", prom_path])
+
+        self.assertTrue(os.path.exists(json_path))
+        with open(prom_path) as infile:
+            self.assertIn('rgc_stage_seconds_count{stage="convert"} 4', infile.read())
+
+    @patch("rgc.cli.pstats.Stats")
+    @patch("builtins.print")
+    def test_profile(self, mock_print, mock_stats):
+        main(["convert", self.fits_dir, self.png_dir, "--workers", "1", "--profile"])
+
+        mock_stats.return_value.sort_stats.assert_called_once_with("cumulative")
+
+    @patch("rgc.cli.pstats.Stats")
+    @patch("builtins.print")
+    def test_profile_runs_in_the_main_process(self, mock_print, mock_stats):
+        with patch("rgc.cli.data.fits_to_png_bulk", wraps=data.fits_to_png_bulk) as mock_bulk:
+            main(["convert", self.fits_dir, self.png_dir, "--workers", "4", "--profile"])
+
+        self.assertEqual(mock_bulk.call_args.kwargs["workers"], 1)
+        self.assertEqual(len(os.listdir(self.png_dir)), 4)
+        mock_print.assert_any_call("Profiling runs with a single worker in the main process.")
+
+
+def test_parse_classes():
+    assert _parse_classes(["WAT=100", "NAT=200"]) == {"WAT": "100", "NAT": "200"}
+    assert _parse_classes(None) is None
+
+
+def test_format_summary():
+    summary = BulkSummary(total=3, failed=1, skipped=1, latencies=[0.1, 0.3], wall_time=0.5)
+
+    text = format_summary(summary)
+
+    assert "3 total, 1 succeeded, 1 failed, 1 skipped" in text
+    assert "throughput: 4.00 items/s" in text
+    assert "max 300.0" in text
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import os
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import albumentations
+import numpy as np
+import torch
+from albumentations.pytorch import ToTensorV2
+from lightning_fabric.utilities.rank_zero import rank_zero_only
+
+from rgc.utils.datamodules import (
+    BentLightningDataModule,
+    MiraBestLightningDataModule,
+    RGZ20kLightningDataModule,
+    worker_init,
+)
+from rgc.utils.datasets import Bent, MiraBest
+from rgc.utils.transform_cache import MaterializedDataset
+
+
+def make_datamodule(bent_root):
+    return BentLightningDataModule(
+        data_dir=os.path.dirname(bent_root),
+        batch_size=4,
+        num_workers=0,
+        transform=albumentations.Compose([albumentations.HorizontalFlip(p=1.0), ToTensorV2()]),
+        test_transform=albumentations.Compose([ToTensorV2()]),
+    )
+
+
+def test_setup_test_stage_only_loads_test_split(bent_root):
+    datamodule = make_datamodule(bent_root)
+
+    with patch("rgc.utils.datamodules.Bent", wraps=Bent) as mock_bent:
+        datamodule.setup("test")
+
+    mock_bent.assert_called_once()
+    assert mock_bent.call_args.kwargs["train"] is False
+    assert mock_bent.call_args.kwargs["root"] == bent_root
+    assert not hasattr(datamodule, "train_dataset")
+    assert len(datamodule.test_dataset) == 4
+
+
+def test_setup_shares_evaluation_dataset(bent_root):
+    datamodule = make_datamodule(bent_root)
+
+    with patch("rgc.utils.datamodules.Bent", wraps=Bent) as mock_bent:
+        datamodule.setup("fit")
+        datamodule.setup("test")
+
+    assert mock_bent.call_count == 2
+    assert datamodule.val_dataset is datamodule.test_dataset
+
+    # Validation uses the test transform, only training images are flipped
+    train_image, _ = datamodule.train_dataset[0]
+    np.testing.assert_array_equal(train_image.numpy(), datamodule.train_dataset.data[0].transpose(2, 0, 1)[..., ::-1])
+
+    images, targets = next(iter(datamodule.train_dataloader()))
+    assert images.shape == (4, 1, 150, 150)
+    assert set(targets.tolist()) <= {0, 1}
+
+
+def test_setup_materializes_deterministic_test_transform(bent_root):
+    datamodule = make_datamodule(bent_root)
+
+    datamodule.setup()
+
+    assert isinstance(datamodule.test_dataset, MaterializedDataset)
+    assert datamodule.val_dataset is datamodule.test_dataset
+    assert not isinstance(datamodule.train_dataset, MaterializedDataset)
+    images, _ = next(iter(datamodule.test_dataloader()))
+    np.testing.assert_array_equal(images.numpy(), datamodule.test_dataset.data[:4].transpose(0, 3, 1, 2))
+
+
+def test_validation_is_not_augmented(bent_root):
+    datamodule = make_datamodule(bent_root)
+
+    datamodule.setup("fit")
+
+    # The training transform flips every image, the test transform does not
+    expected = torch.from_numpy(datamodule.val_dataset.data[:4].transpose(0, 3, 1, 2).copy())
+    for _ in range(2):
+        images, _ = next(iter(datamodule.val_dataloader()))
+        torch.testing.assert_close(images, expected)
+
+
+def test_setup_materializes_the_shard_of_the_rank(bent_root):
+    datamodule = make_datamodule(bent_root)
+    datamodule.trainer = SimpleNamespace(distributed_sampler_kwargs={"num_replicas": 3, "rank": 1})
+
+    datamodule.setup("validate")
+
+    # The sampler pads the 4 test images to 6, rank 1 loads images 1, 3 and 1 again
+    assert datamodule.val_dataset.images.shape[0] == 2
+    images = torch.stack([datamodule.val_dataset[i][0] for i in range(4)])
+    np.testing.assert_array_equal(images.numpy(), datamodule.val_dataset.data.transpose(0, 3, 1, 2))
+
+
+def test_mirabest_datamodule(mirabest_root):
+    datamodule = MiraBestLightningDataModule(
+        data_dir=os.path.dirname(mirabest_root),
+        batch_size=2,
+        num_workers=0,
+        transform=albumentations.Compose([ToTensorV2()]),
+        test_transform=albumentations.Compose([ToTensorV2()]),
+    )
+
+    datamodule.setup("fit")
+
+    images, _ = next(iter(datamodule.train_dataloader()))
+    assert images.shape == (2, 1, 150, 150)
+    assert isinstance(datamodule.val_dataset, MaterializedDataset)
+    assert len(datamodule.val_dataset) == len(MiraBest(mirabest_root, train=False))
+
+
+def test_rgz_datamodule_loader_options(rgz_root):
+    datamodule = RGZ20kLightningDataModule(
+        data_dir=os.path.dirname(rgz_root),
+        batch_size=3,
+        num_workers=1,
+        transform=albumentations.Compose([ToTensorV2()]),
+        test_transform=albumentations.Compose([ToTensorV2()]),
+        pin_memory=False,
+        prefetch_factor=4,
+    )
+
+    datamodule.setup("test")
+    loader = datamodule.test_dataloader()
+
+    assert not isinstance(datamodule.test_dataset, MaterializedDataset)
+    assert loader.persistent_workers
+    assert loader.prefetch_factor == 4
+    assert loader.worker_init_fn is worker_init
+    images, metadata = next(iter(loader))
+    assert images.shape == (3, 1, 150, 150)
+    assert metadata["index"].tolist() == [0, 1, 2]
+
+
+def test_worker_init_seeds_workers_by_rank(monkeypatch):
+    monkeypatch.setattr(torch, "set_num_threads", lambda threads: None)
+
+    torch.manual_seed(7)
+    worker_init(0)
+    assert torch.initial_seed() == 7
+
+    # After seed_everything(workers=True) every rank starts from the same seed
+    monkeypatch.setenv("PL_SEED_WORKERS", "1")
+    seeds = []
+    for rank in (0, 1):
+        monkeypatch.setattr(rank_zero_only, "rank", rank)
+        torch.manual_seed(7)
+        worker_init(0)
+        seeds.append(torch.initial_seed())
+
+    assert seeds[0] != seeds[1]
+
+
+def test_prepare_data_builds_caches_for_setup(bent_root):
+    make_datamodule(bent_root).prepare_data()
+    datamodule = make_datamodule(bent_root)
+
+    with patch.object(Bent, "_load_batches", side_effect=AssertionError("batches unpickled in setup")):
+        datamodule.setup()
+
+    assert isinstance(datamodule.train_dataset.data, np.memmap)
+    assert isinstance(datamodule.test_dataset.data, np.memmap)
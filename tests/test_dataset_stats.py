@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import torch.distributed as dist
+
+from rgc.utils.stats import dataset_stats, load_dataset_stats, stats_key
+
+
+class RGZ20k:
+    base_folder = "rgz20k-batches-py"
+    train_list = (("data_batch_1", None),)
+    test_list = (("test_batch", None),)
+
+    def __init__(self, root, train=True):
+        self.root = root
+        self.train = train
+        self.remove_duplicates = True
+        self.cut_threshold = 0.0
+        self.mb_cut = False
+        rng = np.random.default_rng(0 if train else 1)
+        self.data = rng.integers(0, 256, size=(50, 8, 8, 1), dtype=np.uint8)
+
+
+class TestDatasetStats(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.test_dir.name, RGZ20k.base_folder))
+        for name, _ in RGZ20k.train_list + RGZ20k.test_list:
+            with open(os.path.join(self.test_dir.name, RGZ20k.base_folder, name), "wb") as outfile:
+                outfile.write(b"batch")
+        self.dataset = RGZ20k(self.test_dir.name)
+        self.expected = self.dataset.data.astype(np.float64) / 255
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_dataset_stats(self):
+        stats = dataset_stats(self.dataset, chunk_size=16)
+
+        self.assertEqual(stats.pixels, self.dataset.data.size)
+        np.testing.assert_allclose(stats.mean, [self.expected.mean()])
+        np.testing.assert_allclose(stats.std, [self.expected.std(ddof=1)])
+
+    def test_dataset_stats_in_workers(self):
+        serial = dataset_stats(self.dataset, chunk_size=7)
+        parallel = dataset_stats(self.dataset, num_workers=2, chunk_size=7)
+
+        np.testing.assert_allclose(parallel.mean, serial.mean)
+        np.testing.assert_allclose(parallel.std, serial.std)
+
+    def test_dataset_stats_distributed(self):
+        dist.init_process_group("gloo", init_method=f"file://{self.test_dir.name}/store", rank=0, world_size=1)
+        try:
+            stats = dataset_stats(self.dataset, chunk_size=16)
+        finally:
+            dist.destroy_process_group()
+
+        np.testing.assert_allclose(stats.mean, [self.expected.mean()])
+
+    def test_stats_key(self):
+        self.assertEqual(
+            stats_key(RGZ20k(self.test_dir.name, train=False)),
+            "RGZ20k/test/cut_threshold=0.0,mb_cut=False,remove_duplicates=True",
+        )
+
+    def test_sidecar(self):
+        path = os.path.join(self.test_dir.name, RGZ20k.base_folder, "stats.json")
+
+        stats = load_dataset_stats(self.dataset)
+        with open(path) as infile:
+            self.assertEqual(list(json.load(infile)), [stats_key(self.dataset)])
+
+        with patch("rgc.utils.stats.dataset_stats") as mock_dataset_stats:
+            cached = load_dataset_stats(self.dataset)
+            mock_dataset_stats.assert_not_called()
+        self.assertEqual(cached, stats)
+
+        load_dataset_stats(RGZ20k(self.test_dir.name, train=False))
+        with open(path) as infile:
+            self.assertEqual(len(json.load(infile)), 2)
+
+    def test_sidecar_recomputed_when_batches_change(self):
+        stats = load_dataset_stats(self.dataset)
+
+        with open(os.path.join(self.test_dir.name, RGZ20k.base_folder, "data_batch_1"), "wb") as outfile:
+            outfile.write(b"new batch")
+
+        with patch("rgc.utils.stats.dataset_stats", return_value=stats) as mock_dataset_stats:
+            load_dataset_stats(self.dataset)
+            load_dataset_stats(self.dataset)
+        mock_dataset_stats.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
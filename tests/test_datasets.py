@@ -0,0 +1,209 @@
+import os
+import pickle
+from unittest.mock import patch
+
+import albumentations
+import numpy as np
+import pytest
+import torch
+from albumentations.pytorch import ToTensorV2
+from torch.utils.data import DataLoader
+
+from rgc.utils.datasets import Bent, MiraBest, RGZ20k, Transforms, _unique_rows
+
+
+def test_bent_filters_small_sources(bent_root):
+    dataset = Bent(bent_root, train=True)
+
+    assert len(dataset) == 9 * 4
+    assert dataset.data.dtype == np.uint8
+    assert dataset.data.shape == (36, 150, 150, 1)
+    assert dataset.data.flags["C_CONTIGUOUS"]
+    assert dataset.target.dtype == np.int64
+    np.testing.assert_array_equal(dataset.target[:4], [0, 1, 0, 1])
+
+    with open(os.path.join(bent_root, Bent.base_folder, "data_batch_0"), "rb") as infile:
+        entry = pickle.load(infile)  # noqa: S301
+    np.testing.assert_array_equal(dataset.data[1].reshape(-1), entry["data"][2])
+
+
+def test_bent_include_small(bent_root, capsys):
+    dataset = Bent(bent_root, train=False, include_small=True)
+
+    assert len(dataset) == 8
+    np.testing.assert_array_equal(dataset.target, [0, 0, 1, 1, 0, 0, 1, 1])
+    assert capsys.readouterr().out == ""
+
+    img, target = dataset[2]
+    assert img.size == (150, 150)
+    assert target == 1
+
+
+def test_bent_cache(bent_root):
+    first = Bent(bent_root, train=True)
+    cache_dir = os.path.join(bent_root, Bent.base_folder, "cache", "train")
+    assert sorted(os.listdir(cache_dir)) == ["data.npy", "manifest.json", "target.npy"]
+
+    with patch("rgc.utils.datasets.pickle.load") as mock_load:
+        second = Bent(bent_root, train=True)
+        assert mock_load.call_count == 1  # only the metadata
+
+    assert isinstance(second.data, np.memmap)
+    np.testing.assert_array_equal(second.data, first.data)
+    np.testing.assert_array_equal(second.target, first.target)
+    np.testing.assert_array_equal(Bent(bent_root, train=True, cache=False).data, first.data)
+
+
+def test_bent_loads_when_cache_cannot_be_written(bent_root):
+    with patch("rgc.utils.datasets.tempfile.NamedTemporaryFile", side_effect=OSError("read-only file system")):
+        dataset = Bent(bent_root, train=True)
+
+    assert len(dataset) == 9 * 4
+    assert not isinstance(dataset.data, np.memmap)
+    np.testing.assert_array_equal(dataset.data, Bent(bent_root, train=True, cache=False).data)
+
+
+def test_bent_cache_invalidated(bent_root):
+    Bent(bent_root, train=False)
+
+    path = os.path.join(bent_root, Bent.base_folder, "test_batch")
+    with open(path, "rb") as infile:
+        entry = pickle.load(infile)  # noqa: S301
+    entry["labels"] = ["100"] * 8
+    with open(path, "wb") as outfile:
+        pickle.dump(entry, outfile)
+    os.utime(path, ns=(0, 0))
+
+    np.testing.assert_array_equal(Bent(bent_root, train=False).target, np.zeros(8))
+
+
+def test_mirabest_cache(mirabest_root):
+    first = MiraBest(mirabest_root, train=True)
+    second = MiraBest(mirabest_root, train=True)
+
+    assert second.data.shape == (36, 150, 150, 1)
+    assert isinstance(second.data, np.memmap)
+    np.testing.assert_array_equal(second.targets, np.tile([0, 1, 2, 3], 9))
+    np.testing.assert_array_equal(second.data, first.data)
+    assert second[5][1] == 1
+
+
+def test_rgz20k_cuts_and_cache(rgz_root, capsys):
+    first = RGZ20k(rgz_root, train=True, cut_threshold=15.0, mb_cut=True)
+    assert "Removed 10 duplicate samples" in capsys.readouterr().out
+
+    # 6 samples per batch, minus one duplicate, one below the size cut and one MiraBest source
+    assert len(first) == 30
+    assert first.data.shape == (30, 150, 150, 1)
+    np.testing.assert_array_equal(first.rgzid[:3], [1, 2, 3])
+
+    second = RGZ20k(rgz_root, train=True, cut_threshold=15.0, mb_cut=True)
+    assert capsys.readouterr().out == ""
+    assert isinstance(second.data, np.memmap)
+    np.testing.assert_array_equal(second.names, first.names)
+
+    assert len(RGZ20k(rgz_root, train=True)) == 50
+
+
+def test_integrity_checks_are_cached(bent_root):
+    with patch("rgc.utils.datasets.check_integrity", return_value=True) as mock_check:
+        Bent(bent_root, train=False)
+        assert mock_check.call_count == 2  # test batch and metadata
+
+        Bent(bent_root, train=False)
+        assert mock_check.call_count == 2
+
+        Bent(bent_root, train=False, verify=True)
+        assert mock_check.call_count == 4
+
+        os.utime(os.path.join(bent_root, Bent.base_folder, "test_batch"), ns=(0, 0))
+        Bent(bent_root, train=False)
+        assert mock_check.call_count == 5
+
+        mock_check.return_value = False
+        os.utime(os.path.join(bent_root, Bent.base_folder, "test_batch"), ns=(1, 1))
+        with pytest.raises(RuntimeError):
+            Bent(bent_root, train=False)
+
+
+def test_unique_rows_matches_np_unique():
+    rng = np.random.default_rng(4)
+    data = rng.integers(0, 4, size=(200, 3, 3, 1), dtype=np.uint8)
+
+    _, expected = np.unique(data, axis=0, return_index=True)
+
+    np.testing.assert_array_equal(_unique_rows(data), np.sort(expected))
+
+
+def test_unique_rows_handles_hash_collisions():
+    data = np.array([[1, 2], [3, 4], [1, 2], [5, 6], [3, 4]], dtype=np.uint8)
+
+    with patch("rgc.utils.datasets.hashlib.blake2b") as mock_blake2b:
+        mock_blake2b.return_value.digest.return_value = b"collision"
+        np.testing.assert_array_equal(_unique_rows(data), [0, 1, 3])
+
+
+def test_rgz20k_unique_index_cached(rgz_root):
+    RGZ20k(rgz_root, train=False)
+
+    with patch("rgc.utils.datasets._unique_rows") as mock_unique_rows:
+        dataset = RGZ20k(rgz_root, train=False, cut_threshold=25.0)
+        mock_unique_rows.assert_not_called()
+
+    np.testing.assert_array_equal(dataset.rgzid, [1002, 1003, 1004])
+
+
+def test_rgz20k_lookup_by_ids(rgz_root):
+    dataset = RGZ20k(rgz_root, train=True)
+    rgz_ids = [804, 0, 302, 804]
+
+    indices = dataset.indices_from_ids(rgz_ids)
+
+    np.testing.assert_array_equal(dataset.rgzid[indices], rgz_ids)
+    np.testing.assert_array_equal(dataset.get_from_ids(rgz_ids), dataset.data[indices].reshape(-1, 150, 150))
+    assert dataset.get_from_id(302).size == (150, 150)
+
+    with pytest.raises(KeyError):
+        dataset.get_from_ids([0, 5])
+
+
+def test_rgz20k_get_from_ids_with_transforms(rgz_root):
+    tensors = RGZ20k(rgz_root, train=True, transform=Transforms(albumentations.Compose([ToTensorV2()])))
+    images = RGZ20k(rgz_root, train=True, transform=lambda img: img)
+
+    assert tensors.get_from_ids([804, 0]).shape == (2, 1, 150, 150)
+    assert [img.size for img in images.get_from_ids([804, 0])] == [(150, 150), (150, 150)]
+
+
+def test_getitems_matches_getitem(bent_root, mirabest_root, rgz_root):
+    transform = Transforms(albumentations.Compose([ToTensorV2()]))
+    datasets = [
+        Bent(bent_root, transform=transform),
+        MiraBest(mirabest_root, transform=transform),
+        RGZ20k(rgz_root, transform=transform),
+    ]
+
+    for dataset in datasets:
+        batch = dataset.__getitems__([3, 0, 7])
+        for (img, target), index in zip(batch, [3, 0, 7]):
+            expected_img, expected_target = dataset[index]
+            assert torch.equal(img, expected_img)
+            assert str(target) == str(expected_target)
+
+
+def test_array_transforms_skip_pil(bent_root):
+    dataset = Bent(bent_root, transform=Transforms(albumentations.Compose([ToTensorV2()])))
+    loader = DataLoader(dataset, batch_size=4)
+
+    with patch("rgc.utils.datasets.Image.fromarray") as mock_fromarray:
+        images, targets = next(iter(loader))
+        mock_fromarray.assert_not_called()
+
+    assert images.shape == (4, 1, 150, 150)
+    assert images.dtype == torch.uint8
+    np.testing.assert_array_equal(images[:, 0].numpy(), dataset.data[:4, ..., 0])
+    np.testing.assert_array_equal(targets.numpy(), dataset.target[:4])
+
+    # Transforms without `accepts_arrays` still get PIL images
+    dataset.transform = lambda img: np.asarray(img).sum()
+    assert dataset[0] == (int(dataset.data[0].sum()), dataset.target[0])
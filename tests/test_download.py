@@ -0,0 +1,161 @@
+import functools
+import hashlib
+import http.server
+import io
+import os
+import pathlib
+import shutil
+import tarfile
+import threading
+import urllib.error
+from typing import ClassVar
+from unittest.mock import patch
+
+import pytest
+
+from rgc.utils.datasets import MiraBest, _check_files, _download_and_extract
+
+
+def md5(data):
+    return hashlib.md5(data).hexdigest()  # noqa: S324
+
+
+@pytest.fixture
+def archive(tmp_path):
+    contents = {"data_batch_1": b"first batch" * 100, "test_batch": b"test batch" * 100, "batches.meta": b"meta"}
+    path = tmp_path / "archive.tar.gz"
+    with tarfile.open(path, "w:gz") as tar:
+        for name, data in contents.items():
+            info = tarfile.TarInfo(f"batches/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        info = tarfile.TarInfo("README")
+        info.size = len(b"readme")
+        tar.addfile(info, io.BytesIO(b"readme"))
+    files = [[name, md5(data)] for name, data in contents.items()]
+    return path, md5(path.read_bytes()), files
+
+
+def test_extracts_and_records_checksums(archive, tmp_path):
+    path, archive_md5, files = archive
+    root = tmp_path / "data"
+
+    _download_and_extract(path.as_uri(), str(root), "batches", archive_md5, files)
+
+    assert (root / "batches" / "data_batch_1").read_bytes() == b"first batch" * 100
+    with patch("rgc.utils.datasets.check_integrity") as mock_check:
+        assert _check_files(str(root / "batches"), files)
+    mock_check.assert_not_called()
+
+
+@patch("builtins.print")
+def test_skips_intact_members(mock_print, archive, tmp_path):
+    path, archive_md5, files = archive
+    root = tmp_path / "data"
+    _download_and_extract(path.as_uri(), str(root), "batches", archive_md5, files)
+    (root / "batches" / "test_batch").write_bytes(b"corrupted")
+
+    _download_and_extract(path.as_uri(), str(root), "batches", archive_md5, files)
+
+    assert (root / "batches" / "test_batch").read_bytes() == b"test batch" * 100
+    mock_print.assert_called_with("Extracted 2 files, skipped 2 intact files")
+
+
+def test_corrupted_archive(archive, tmp_path):
+    path, _, files = archive
+
+    with pytest.raises(RuntimeError, match="corrupted"):
+        _download_and_extract(path.as_uri(), str(tmp_path / "data"), "batches", "0" * 32, files)
+
+
+def test_unverified_members_wait_for_the_archive_checksum(archive, tmp_path):
+    path, archive_md5, files = archive
+    root = tmp_path / "data"
+
+    with pytest.raises(RuntimeError, match=r"Archive .* is corrupted"):
+        _download_and_extract(path.as_uri(), str(root), "batches", "0" * 32, files)
+    assert sorted(os.listdir(root)) == ["batches"]
+
+    _download_and_extract(path.as_uri(), str(root), "batches", archive_md5, files)
+    assert (root / "README").read_bytes() == b"readme"
+    assert sorted(os.listdir(root)) == ["README", "batches"]
+
+
+def test_corrupted_member(archive, tmp_path):
+    path, archive_md5, files = archive
+    files[0][1] = "0" * 32
+
+    with pytest.raises(RuntimeError, match="data_batch_1 is corrupted"):
+        _download_and_extract(path.as_uri(), str(tmp_path / "data"), "batches", archive_md5, files)
+    assert not (tmp_path / "data" / "batches" / "data_batch_1").exists()
+
+
+def test_http(archive, tmp_path):
+    path, archive_md5, files = archive
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(path.parent))
+    handler.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/{path.name}"
+        _download_and_extract(url, str(tmp_path / "data"), "batches", archive_md5, files)
+    finally:
+        server.shutdown()
+
+    assert sorted(os.listdir(tmp_path / "data" / "batches")) == [".integrity.json", *sorted(name for name, _ in files)]
+
+
+def test_google_drive(archive, tmp_path):
+    path, archive_md5, files = archive
+    root = tmp_path / "data"
+
+    def download(file_id, folder, filename):
+        shutil.copy(path, os.path.join(folder, filename))
+
+    with patch("rgc.utils.datasets.download_file_from_google_drive", side_effect=download) as mock_download:
+        _download_and_extract("https://drive.google.com/file/d/abc123", str(root), "batches", archive_md5, files)
+
+    assert mock_download.call_args.args[0] == "abc123"
+    assert (root / "batches" / "data_batch_1").read_bytes() == b"first batch" * 100
+    # The temporary download is removed
+    assert sorted(os.listdir(root)) == ["README", "batches"]
+
+
+def test_https_falls_back_to_http(archive, tmp_path):
+    path, archive_md5, files = archive
+    urls = []
+
+    def urlopen(url):
+        urls.append(url)
+        if url.startswith("https:"):
+            raise urllib.error.URLError("certificate verify failed")  # noqa: TRY003
+        return path.open("rb")
+
+    with patch("rgc.utils.datasets.urllib.request.urlopen", side_effect=urlopen):
+        _download_and_extract(
+            "https://example.org/archive.tar.gz", str(tmp_path / "data"), "batches", archive_md5, files
+        )
+
+    assert urls == ["https://example.org/archive.tar.gz", "http://example.org/archive.tar.gz"]
+    assert (tmp_path / "data" / "batches" / "test_batch").read_bytes() == b"test batch" * 100
+
+
+def test_dataset_download(mirabest_root, tmp_path):
+    folder = os.path.join(mirabest_root, MiraBest.base_folder)
+    path = tmp_path / "mirabest.tar.gz"
+    with tarfile.open(path, "w:gz") as tar:
+        tar.add(folder, arcname=MiraBest.base_folder)
+
+    def listed(files):
+        return [[name, md5(pathlib.Path(folder, name).read_bytes())] for name, _ in files]
+
+    class LocalMiraBest(MiraBest):
+        url = path.as_uri()
+        tgz_md5 = md5(path.read_bytes())
+        train_list: ClassVar[list] = listed(MiraBest.train_list)
+        test_list: ClassVar[list] = listed(MiraBest.test_list)
+        meta: ClassVar[dict] = {**MiraBest.meta, "md5": listed([[MiraBest.meta["filename"], None]])[0][1]}
+
+    dataset = LocalMiraBest(str(tmp_path / "download"), train=False, download=True)
+
+    assert len(dataset) == len(MiraBest(mirabest_root, train=False))
@@ -0,0 +1,38 @@
+import numpy as np
+from e2cnn.kernels import irreps_basis, utils
+
+from rgc.models._e2cnn_compat import _NumPy1Array, patch_e2cnn
+
+
+def test_patch_is_idempotent():
+    patch_e2cnn()
+    patch_e2cnn()
+
+    if np.lib.NumpyVersion(np.__version__) >= "2.0.0":
+        assert isinstance(utils.np, _NumPy1Array)
+    assert utils.np.pi == np.pi
+
+
+def test_array_copies_only_when_asked():
+    array = np.arange(4.0)
+
+    assert _NumPy1Array.array(array, copy=False) is array
+    assert _NumPy1Array.array(array) is not array
+    np.testing.assert_array_equal(_NumPy1Array.array([1, 2], copy=False), [1, 2])
+
+
+def test_equal_kernel_bases_hash_equal():
+    from e2cnn import gspaces
+
+    patch_e2cnn()
+    gspace = gspaces.FlipRot2dOnR2(N=16)
+    irrep = gspace.fibergroup.irrep(1, 1)
+    first = irreps_basis.R2FlipsDiscreteRotationsSolution(
+        gspace.fibergroup, irrep.name, irrep.name, axis=0.0, max_frequency=4
+    )
+    second = irreps_basis.R2FlipsDiscreteRotationsSolution(
+        gspace.fibergroup, irrep.name, irrep.name, axis=0.0, max_frequency=4
+    )
+
+    assert first == second
+    assert hash(first) == hash(second)
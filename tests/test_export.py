@@ -0,0 +1,31 @@
+import pytest
+import torch
+
+from rgc.models.dstreeablelenet import DSteerableLeNet
+
+
+@pytest.fixture(params=[False, True], ids=["finetuning", "pretraining"])
+def model(request):
+    torch.manual_seed(0)
+    return DSteerableLeNet(imsize=51, pre_training=request.param)
+
+
+def test_export_matches_model(model):
+    images = torch.randn(3, 1, 51, 51)
+
+    exported = model.export()
+
+    assert model.training
+    assert all(type(module).__module__.startswith("torch.nn") for module in exported.modules())
+    with torch.no_grad():
+        torch.testing.assert_close(exported(images), model.eval()(images), rtol=1e-5, atol=1e-6)
+
+
+def test_export_is_scriptable(model, tmp_path):
+    images = torch.randn(2, 1, 51, 51)
+    exported = model.export()
+
+    torch.jit.save(torch.jit.script(exported), tmp_path / "model.pt")
+    loaded = torch.jit.load(tmp_path / "model.pt")
+
+    torch.testing.assert_close(loaded(images), exported(images))
@@ -49,6 +49,35 @@ class TestFitsToPng(unittest.TestCase):
         np.testing.assert_array_equal(args[0].T, expected_image)
         self.assertEqual(kwargs.get("mode"), "L")
 
+    @patch("rgc.utils.data.fits.getdata")
+    @patch("rgc.utils.data.fits.getheader")
+    @patch("rgc.utils.data.Image.fromarray")
+    def test_fits_to_png_with_clip(self, mock_fromarray, mock_getheader, mock_getdata):
+        # Mock FITS data with a bright outlier
+        mock_getdata.return_value = np.array([[1, 2], [3, 1000]], dtype=np.float32)
+        mock_getheader.return_value = {"NAXIS1": 2, "NAXIS2": 2}
+
+        # Call function with clipping bounds
+        fits_to_png("mock.fits", clip=(1, 4))
+
+        # The outlier is clipped and the stretch uses the bounds
+        args, _ = mock_fromarray.call_args
+        np.testing.assert_array_equal(args[0], np.array([[0, 85], [170, 255]], dtype=np.uint8))
+
+    @patch("rgc.utils.data.fits.getdata")
+    @patch("rgc.utils.data.fits.getheader")
+    @patch("rgc.utils.data.Image.fromarray")
+    def test_fits_to_png_constant_image(self, mock_fromarray, mock_getheader, mock_getdata):
+        mock_getheader.return_value = {"NAXIS1": 2, "NAXIS2": 2}
+
+        # A constant image, and degenerate bounds such as a sketch of a single value
+        for clip in (None, (3, 3)):
+            mock_getdata.return_value = np.full((2, 2), 3, dtype=np.float32)
+            fits_to_png("mock.fits", clip=clip)
+
+            args, _ = mock_fromarray.call_args
+            np.testing.assert_array_equal(args[0], np.zeros((2, 2), dtype=np.uint8))
+
     @patch("rgc.utils.data.fits.getdata")
     @patch("rgc.utils.data.fits.getheader")
     def test_fits_to_png_file_not_found(self, mock_getheader, mock_getdata):
@@ -20,22 +20,26 @@ class TestFitsToPngBulk(unittest.TestCase):
 
         # Mock the image returned by fits_to_png (valid case)
         mock_image = MagicMock()
-        mock_fits_to_png.side_effect = [mock_image, None, mock_image]  # Second call returns None
+        mock_fits_to_png.side_effect = [mock_image, OSError("corrupt file"), mock_image]  # Second file is corrupt
 
-        # Call the function
-        fits_to_png_bulk("fits_dir", "png_dir", img_size=(100, 100))
+        # Call the function, which reports the corrupt file and carries on
+        with patch("builtins.print") as mock_print:
+            summary = fits_to_png_bulk("fits_dir", "png_dir", img_size=(100, 100))
+
+        self.assertEqual((summary.total, summary.failed), (3, 1))
+        mock_print.assert_called_once_with(f"Failed to run convert for {Path('file1.fits')}. corrupt file")
 
         # Assertions
         mock_rglob.assert_called_once_with("*.fits")
         mock_mkdir.assert_called()
         self.assertEqual(mock_fits_to_png.call_count, 3)
 
-        # Verify that save is called only for non-None images
-        self.assertEqual(mock_image.save.call_count, 2)  # save called twice, not on None
+        # Verify that save is called only for the readable files
+        self.assertEqual(mock_image.save.call_count, 2)
         mock_image.save.assert_any_call("png_dir/file0.png")
         mock_image.save.assert_any_call("png_dir/file2.png")
 
-        # Ensure save is not called for the None image
+        # Ensure save is not called for the corrupt file
         self.assertNotIn("png_dir/file1.png", [call[0][0] for call in mock_image.save.call_args_list])
 
 
@@ -0,0 +1,89 @@
+import os
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import torch
+from astropy.io import fits
+from PIL import Image
+
+from rgc.utils.datasets import FolderDataset
+
+
+class ToTensor:
+    accepts_arrays = True
+
+    def __call__(self, img):
+        return torch.from_numpy(img)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    rng = np.random.default_rng(0)
+    images = {}
+    for name in ["200_J1+2.png", "100_J3-4.png", "_J5+6.png", "100_J7_8.png"]:
+        images[name] = rng.integers(0, 256, size=(6, 5), dtype=np.uint8)
+        Image.fromarray(images[name], mode="L").save(tmp_path / name)
+    (tmp_path / "notes.txt").write_text("not an image")
+    return str(tmp_path), images
+
+
+def test_labels_from_filenames(folder):
+    root, images = folder
+
+    dataset = FolderDataset(root, transform=ToTensor())
+
+    assert dataset.names.tolist() == ["100_J3-4.png", "100_J7_8.png", "200_J1+2.png", "_J5+6.png"]
+    assert dataset.classes == ["100", "200"]
+    assert dataset.targets.tolist() == [0, 0, 1, -1]
+    assert dataset.shapes.tolist() == [[6, 5]] * 4
+
+    image, target = dataset[2]
+    np.testing.assert_array_equal(image.numpy(), images["200_J1+2.png"])
+    assert target == 1
+
+
+def test_given_classes(folder):
+    dataset = FolderDataset(folder[0], classes=["200", "100"])
+
+    assert dataset.targets.tolist() == [1, 1, 0, -1]
+
+
+def test_manifest_reads_only_new_files(folder):
+    root, _ = folder
+    FolderDataset(root)
+    Image.fromarray(np.zeros((6, 5), dtype=np.uint8), mode="L").save(os.path.join(root, "300_new.png"))
+
+    with patch("rgc.utils.datasets._image_shape", return_value=(6, 5)) as mock_shape:
+        dataset = FolderDataset(root)
+
+    mock_shape.assert_called_once_with(os.path.join(root, "300_new.png"))
+    assert len(dataset) == 5
+
+
+def test_decode_cache(folder):
+    root, images = folder
+
+    dataset = FolderDataset(root, transform=ToTensor(), cache=True)
+
+    assert isinstance(dataset.data, np.memmap)
+    batch = dataset.__getitems__([0, 3])
+    np.testing.assert_array_equal(batch[0][0].numpy(), images["100_J3-4.png"])
+    np.testing.assert_array_equal(batch[1][0].numpy(), images["_J5+6.png"])
+
+
+def test_fits_images(tmp_path):
+    data = np.arange(12, dtype=np.float32).reshape(3, 4)
+    fits.writeto(tmp_path / "100_J1+2.fits", data)
+
+    dataset = FolderDataset(str(tmp_path))
+
+    assert dataset.shapes.tolist() == [[3, 4]]
+    image, target = dataset[0]
+    np.testing.assert_array_equal(image, data)
+    assert target == 0
+
+
+def test_empty_folder(tmp_path):
+    with pytest.raises(RuntimeError):
+        FolderDataset(str(tmp_path))
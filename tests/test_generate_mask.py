@@ -1,126 +1,119 @@
+import os
+import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
-from rgc.utils.data import generate_mask
+import pandas as pd
+
+from rgc.utils.data import generate_mask, generate_mask_bulk
+
+
+def _export_image(outfile, **kwargs):
+    Path(outfile).write_bytes(b"mask")
 
 
 class TestGenerateMask(unittest.TestCase):
-    @patch("rgc.utils.data.bdsf.process_image", return_value=MagicMock())
-    @patch("rgc.utils.data.Path.mkdir")
-    @patch("rgc.utils.data.Path.name", new_callable=MagicMock(return_value="image.fits"))
-    @patch("rgc.utils.data.Path", autospec=True)
-    @patch("rgc.utils.data.print")
-    def test_generate_mask_success(self, mock_print, mock_path, mock_name, mock_mkdir, mock_process_image):
-        # Setup mocks
-        mock_path_instance = mock_path.return_value
-        # Ensure that the truediv operator returns the correct Path
-        mock_path_instance.__truediv__.return_value = Path("path/to/mask_dir/image.fits")
-        mock_path_instance.parent.mkdir.return_value = None
-        mock_path_instance.name = "image.fits"  # Correct the name attribute
-
-        # Setup test parameters
-        image_path = "path/to/image.fits"
-        mask_dir = "path/to/mask_dir"
-        freq = 1400.0
-        beam = (5.0, 5.0, 5.0)
-        dilation = 2
-        threshold_pixel = 5.0
-        threshold_island = 3.0
-
-        # Run the function
-        generate_mask(
-            image_path=image_path,
-            mask_dir=mask_dir,
-            freq=freq,
-            beam=beam,
-            dilation=dilation,
-            threshold_pixel=threshold_pixel,
-            threshold_island=threshold_island,
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.image_path = os.path.join(self.test_dir.name, "images", "image.fits")
+        self.mask_dir = os.path.join(self.test_dir.name, "masks")
+        self.scratch_dir = os.path.join(self.test_dir.name, "scratch")
+        os.makedirs(os.path.dirname(self.image_path))
+        os.makedirs(self.scratch_dir)
+        Path(self.image_path).write_bytes(b"image")
+
+        self.freq = 1400.0
+        self.beam = (5.0, 5.0, 5.0)
+        self.dilation = 2
+        self.threshold_pixel = 5.0
+        self.threshold_island = 3.0
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def _generate_mask(self):
+        return generate_mask(
+            image_path=self.image_path,
+            mask_dir=self.mask_dir,
+            freq=self.freq,
+            beam=self.beam,
+            dilation=self.dilation,
+            threshold_pixel=self.threshold_pixel,
+            threshold_island=self.threshold_island,
+            scratch_dir=self.scratch_dir,
         )
 
-        # Verify that print was not called
-        mock_print.assert_not_called()
-
-        # Verify that the mask file path was generated correctly
-        expected_mask_file = Path(mask_dir) / "image.fits"
-        mock_path_instance.__truediv__.assert_called_once_with("image.fits")
+    @patch("rgc.utils.data.bdsf.process_image")
+    @patch("rgc.utils.data.print")
+    def test_generate_mask_success(self, mock_print, mock_process_image):
+        mock_process_image.return_value = MagicMock(export_image=MagicMock(side_effect=_export_image))
 
-        # Verify that the parent directory was created
-        mock_path_instance.parent.mkdir.assert_called_once_with(parents=True, exist_ok=True)
+        self.assertTrue(self._generate_mask())
 
-        # Verify that process_image was called correctly
-        mock_process_image.assert_called_once_with(
-            image_path, beam=beam, thresh_isl=threshold_island, thresh_pix=threshold_pixel, frequency=freq
-        )
+        # Verify that print was not called
+        mock_print.assert_not_called()
 
-        # Verify that export_image is called on the mock returned by process_image
-        mock_process_image.return_value.export_image.assert_called_once_with(
-            img_type="island_mask",
-            outfile=expected_mask_file,
-            clobber=True,
-            mask_dilation=dilation,
-        )
+        # Verify that PyBDSF ran in a scratch directory
+        _, kwargs = mock_process_image.call_args
+        self.assertEqual(mock_process_image.call_args[0], (self.image_path,))
+        self.assertEqual(kwargs["beam"], self.beam)
+        self.assertEqual(kwargs["thresh_isl"], self.threshold_island)
+        self.assertEqual(kwargs["thresh_pix"], self.threshold_pixel)
+        self.assertEqual(kwargs["frequency"], self.freq)
+        self.assertEqual(os.path.dirname(kwargs["outdir"]), self.scratch_dir)
+
+        _, export_kwargs = mock_process_image.return_value.export_image.call_args
+        self.assertEqual(export_kwargs["img_type"], "island_mask")
+        self.assertEqual(export_kwargs["mask_dilation"], self.dilation)
+        self.assertTrue(export_kwargs["outfile"].startswith(kwargs["outdir"]))
+
+        # Verify that only the mask left the scratch directory
+        self.assertEqual(os.listdir(self.mask_dir), ["image.fits"])
+        self.assertEqual(os.listdir(self.scratch_dir), [])
+        self.assertEqual(os.listdir(os.path.dirname(self.image_path)), ["image.fits"])
 
     @patch("rgc.utils.data.bdsf.process_image", return_value=MagicMock())
-    @patch("rgc.utils.data.Path.mkdir", side_effect=PermissionError("Permission denied"))
-    @patch("rgc.utils.data.Path.parent", new_callable=MagicMock)
-    @patch("rgc.utils.data.Path.name", new_callable=MagicMock(return_value="image.fits"))
-    @patch("rgc.utils.data.Path", autospec=True)
+    @patch("pathlib.Path.mkdir", side_effect=PermissionError("Permission denied"))
     @patch("rgc.utils.data.print")
-    def test_generate_mask_permission_error(
-        self, mock_print, mock_path, mock_name, mock_parent, mock_mkdir, mock_process_image
-    ):
-        # Setup mocks
-        mock_path.return_value = Path("/mock/path")
-        mock_parent.return_value = mock_path
-        mock_process_image.return_value = MagicMock()
-
-        # Setup test parameters
-        image_path = "path/to/image.fits"
-        mask_dir = "path/to/mask_dir"
-        freq = 1400.0
-        beam = (5.0, 5.0, 5.0)
-        dilation = 2
-        threshold_pixel = 5.0
-        threshold_island = 3.0
-
-        # Run the function
-        generate_mask(
-            image_path=image_path,
-            mask_dir=mask_dir,
-            freq=freq,
-            beam=beam,
-            dilation=dilation,
-            threshold_pixel=threshold_pixel,
-            threshold_island=threshold_island,
-        )
+    def test_generate_mask_permission_error(self, mock_print, mock_mkdir, mock_process_image):
+        self._generate_mask()
 
         # Verify that print was called with the correct error message
         mock_print.assert_called_once_with("Failed to generate mask.")
+        self.assertEqual(os.listdir(self.scratch_dir), [])
 
     @patch("rgc.utils.data.bdsf.process_image", side_effect=Exception("Process failed"))
     @patch("rgc.utils.data.print")
     def test_generate_mask_failure(self, mock_print, mock_process_image):
-        # Setup test parameters
-        image_path = "path/to/image.fits"
-        mask_dir = "path/to/mask_dir"
-        freq = 1400.0
-        beam = (5.0, 5.0, 5.0)
-        dilation = 2
-        threshold_pixel = 5.0
-        threshold_island = 3.0
-
-        # Run the function
-        generate_mask(
-            image_path=image_path,
-            mask_dir=mask_dir,
-            freq=freq,
-            beam=beam,
-            dilation=dilation,
-            threshold_pixel=threshold_pixel,
-            threshold_island=threshold_island,
-        )
+        self.assertFalse(self._generate_mask())
 
         # Verify that print was called with the correct error message
         mock_print.assert_called_once_with("Failed to generate mask.")
+        self.assertFalse(os.path.exists(self.mask_dir))
+        self.assertEqual(os.listdir(self.scratch_dir), [])
+
+    @patch("rgc.utils.data.bdsf.process_image", side_effect=Exception("Process failed"))
+    @patch("rgc.utils.data.print")
+    def test_stale_mask_does_not_count_as_success(self, mock_print, mock_process_image):
+        os.makedirs(self.mask_dir)
+        Path(self.mask_dir, "image.fits").write_bytes(b"mask of an earlier run")
+
+        summary = generate_mask_bulk(
+            catalog=pd.DataFrame({
+                "filename": ["image"],
+                "dilation": [self.dilation],
+                "background sigma": [self.threshold_pixel],
+                "foreground sigma": [self.threshold_island],
+            }),
+            img_dir=os.path.dirname(self.image_path),
+            mask_dir=self.mask_dir,
+            freq=self.freq,
+            beam=self.beam,
+        )
+
+        self.assertEqual((summary.total, summary.failed), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
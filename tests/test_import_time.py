@@ -0,0 +1,40 @@
+import json
+import subprocess
+import sys
+
+# Budget for `import rgc.utils.data` in a fresh interpreter. numpy, pandas and
+# PIL take a few hundred milliseconds; bdsf, torch or astropy would blow it.
+IMPORT_BUDGET_SECONDS = 1.5
+
+HEAVY_MODULES = ["bdsf", "torch", "astropy", "astroquery", "torchvision", "pytorch_lightning", "e2cnn", "wandb"]
+
+
+def _import_in_subprocess(module):
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout  # noqa: S603
+    return json.loads(output.splitlines()[-1])
+
+
+def test_import_data_skips_heavy_dependencies():
+    result = _import_in_subprocess("rgc.utils.data")
+
+    assert result["loaded"] == []
+    assert result["elapsed"] < IMPORT_BUDGET_SECONDS, f"import rgc.utils.data took {result['elapsed']:.2f} s"
+
+
+def test_import_models_is_lazy():
+    result = _import_in_subprocess("rgc.models")
+
+    assert result["loaded"] == []
+
+
+def test_import_inference_skips_torch():
+    result = _import_in_subprocess("rgc.models.inference")
+
+    assert result["loaded"] == []
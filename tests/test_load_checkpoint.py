@@ -0,0 +1,86 @@
+import pytest
+import torch
+from pytorch_lightning.utilities.parsing import AttributeDict
+
+from rgc.models.dstreeablelenet import DSteerableLeNet
+
+
+def build(pre_training):
+    return DSteerableLeNet(imsize=51, pre_training=pre_training)
+
+
+def test_only_the_head_of_the_mode_is_built():
+    pretraining, finetuning = build(True), build(False)
+
+    assert hasattr(pretraining, "fc") and not hasattr(pretraining, "fc1")
+    assert hasattr(finetuning, "fc1") and not hasattr(finetuning, "fc")
+    assert not hasattr(finetuning, "mask")
+
+
+def test_finetuning_starts_from_pretraining(tmp_path):
+    torch.manual_seed(0)
+    pretraining, finetuning = build(True), build(False)
+    torch.save({"model_state_dict": pretraining.eval().state_dict()}, tmp_path / "best.pt")
+
+    missing, unexpected = finetuning.load_checkpoint(tmp_path / "best.pt")
+
+    assert missing == [f"fc{i}.{name}" for i in (1, 2, 3) for name in ("weight", "bias")]
+    assert unexpected == ["fc.weight", "fc.bias"]
+    assert finetuning.training
+    torch.testing.assert_close(finetuning.conv1.weights, pretraining.conv1.weights)
+    torch.testing.assert_close(finetuning.conv2.weights, pretraining.conv2.weights)
+
+
+def test_same_mode_round_trip():
+    images = torch.randn(2, 1, 51, 51)
+    torch.manual_seed(0)
+    source = build(False).eval()
+    torch.manual_seed(1)
+    target = build(False).eval()
+
+    assert target.load_checkpoint(source.state_dict()) == ([], [])
+
+    # The expanded filters of the evaluation mode follow the loaded weights
+    with torch.no_grad():
+        torch.testing.assert_close(target(images), source(images))
+
+
+def test_lightning_checkpoint():
+    source, target = build(True), build(True)
+    state_dict = {f"model.{key}": value for key, value in source.state_dict().items()}
+    state_dict["train_accuracy.tp"] = torch.zeros(2)
+
+    assert target.load_checkpoint({"state_dict": state_dict, "epoch": 3}) == ([], [])
+    torch.testing.assert_close(target.fc.weight, source.fc.weight)
+
+
+def test_lightning_checkpoint_from_disk(tmp_path):
+    source, target = build(False), build(False)
+    checkpoint = {
+        "state_dict": {f"model.{key}": value for key, value in source.state_dict().items()},
+        "hyper_parameters": AttributeDict(num_classes=2, learning_rate=1e-3),
+        "epoch": 3,
+    }
+    torch.save(checkpoint, tmp_path / "last.ckpt")
+
+    assert target.load_checkpoint(tmp_path / "last.ckpt") == ([], [])
+    torch.testing.assert_close(target.fc3.weight, source.fc3.weight)
+
+
+def test_legacy_checkpoint_with_both_heads():
+    source, target = build(True), build(False)
+    state_dict = {**source.state_dict(), **build(False).state_dict(), "mask.mask": torch.ones(1, 51, 51)}
+
+    missing, unexpected = target.load_checkpoint(state_dict)
+
+    assert missing == []
+    assert unexpected == ["fc.weight", "fc.bias", "mask.mask"]
+
+
+def test_missing_backbone_raises():
+    source, target = build(False), build(False)
+    state_dict = source.state_dict()
+    del state_dict["conv2.weights"]
+
+    with pytest.raises(RuntimeError, match=r"conv2\.weights"):
+        target.load_checkpoint(state_dict)
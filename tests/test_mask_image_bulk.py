@@ -115,6 +115,18 @@ class TestMaskImageBulk(unittest.TestCase):
         shutil.rmtree(extra_image_dir)
         shutil.rmtree(extra_mask_dir)
 
+    def test_unreadable_image_does_not_abort_the_run(self):
+        for directory in (self.image_dir, self.mask_dir):
+            Image.fromarray(self.image_array, mode="L").save(Path(directory) / "a_image.png")
+        (Path(self.image_dir) / "a_image.png").write_bytes(b"not a png")
+
+        with patch("builtins.print") as mock_print:
+            summary = mask_image_bulk(self.image_dir, self.mask_dir, self.masked_dir)
+
+        self.assertEqual((summary.total, summary.failed), (2, 1))
+        self.assertEqual(os.listdir(self.masked_dir), ["test_image.png"])
+        self.assertIn("a_image.png", mock_print.call_args[0][0])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+import unittest
+from contextlib import nullcontext
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+from astropy.io import fits
+
+from rgc.utils import metrics
+from rgc.utils.data import celestial_capture_bulk, fits_to_png_bulk
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(metrics.active())
+        self.assertIsInstance(metrics.timer("bdsf"), nullcontext)
+        metrics.count("bdsf", "failures")
+
+    def test_summary_and_merge(self):
+        recorder = metrics.Metrics()
+        recorder.observe("bdsf", 1.0)
+        recorder.observe("bdsf", 3.0)
+
+        other = metrics.Metrics()
+        other.observe("bdsf", 2.0)
+        other.add("bdsf", "bytes_read", 10)
+        other.add("skyview", "retries", 2)
+        recorder.merge(other)
+
+        summary = recorder.summary()
+        self.assertEqual(summary["bdsf"]["count"], 3)
+        self.assertEqual(summary["bdsf"]["total_seconds"], 6.0)
+        self.assertEqual(summary["bdsf"]["p50_seconds"], 2.0)
+        self.assertEqual(summary["bdsf"]["bytes_read"], 10)
+        self.assertEqual(summary["skyview"]["retries"], 2)
+        self.assertEqual(summary["skyview"]["count"], 0)
+
+    def test_exports(self):
+        recorder = metrics.Metrics()
+        recorder.observe("png_encode", 0.5)
+        recorder.add("png_encode", "bytes_written", 42)
+
+        json_path = os.path.join(self.test_dir.name, "metrics.json")
+        prom_path = os.path.join(self.test_dir.name, "rgc.prom")
+        recorder.write_json(json_path)
+        recorder.write_prometheus(prom_path)
+
+        with open(json_path) as infile:
+            self.assertEqual(json.load(infile)["png_encode"]["bytes_written"], 42)
+
+        with open(prom_path) as infile:
+            prom = infile.read()
+        self.assertIn('rgc_stage_seconds_count{stage="png_encode"} 1', prom)
+        self.assertIn('rgc_stage_seconds{stage="png_encode",quantile="0.5"} 0.5', prom)
+        self.assertIn('rgc_bytes_written_total{stage="png_encode"} 42', prom)
+        self.assertEqual(sorted(os.listdir(self.test_dir.name)), ["metrics.json", "rgc.prom"])
+
+    def test_bulk_conversion_in_workers(self):
+        fits_dir = os.path.join(self.test_dir.name, "fits")
+        os.makedirs(fits_dir)
+        for i in range(3):
+            fits.writeto(os.path.join(fits_dir, f"{i}.fits"), np.arange(16, dtype=np.float32).reshape(4, 4))
+
+        with metrics.collect() as recorder:
+            fits_to_png_bulk(fits_dir, os.path.join(self.test_dir.name, "png"), workers=2)
+
+        self.assertIsNone(metrics.active())
+        summary = recorder.summary()
+        self.assertEqual(summary["convert"]["count"], 3)
+        self.assertEqual(summary["fits_decode"]["count"], 3)
+        self.assertEqual(summary["png_encode"]["count"], 3)
+        self.assertGreater(summary["fits_decode"]["bytes_read"], 0)
+        self.assertGreater(summary["png_encode"]["bytes_written"], 0)
+
+    @patch("rgc.utils.data.celestial_tag", return_value="10h00m00s +10d00m00s")
+    @patch("rgc.utils.data.SkyCoord", return_value=MagicMock(ra=MagicMock(deg=10), dec=MagicMock(deg=20)))
+    @patch("rgc.utils.data.celestial_capture", side_effect=[Exception("Timeout"), None])
+    def test_capture_retries(self, mock_celestial_capture, mock_SkyCoord, mock_celestial_tag):
+        catalog = pd.DataFrame({"label": ["WAT"]})
+
+        with metrics.collect() as recorder:
+            summary = celestial_capture_bulk(catalog, "VLA FIRST (1.4 GHz)", "/path/to/images", retries=1)
+
+        self.assertEqual(summary.failed, 0)
+        self.assertEqual(mock_celestial_capture.call_count, 2)
+        self.assertEqual(recorder.summary()["skyview"]["retries"], 1)
+        self.assertEqual(recorder.summary()["capture"]["failures"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+import torch
+
+from rgc.models.inference import OnnxModel, export_onnx
+
+pytest.importorskip("onnxruntime")
+
+
+def backbone():
+    torch.manual_seed(0)
+    return torch.nn.Sequential(
+        torch.nn.Conv2d(1, 4, 3),
+        torch.nn.BatchNorm2d(4),
+        torch.nn.ReLU(),
+        torch.nn.AdaptiveAvgPool2d(6),
+        torch.nn.Flatten(),
+        torch.nn.Dropout(0.5),
+        torch.nn.Linear(144, 2),
+    )
+
+
+def eager(model, images):
+    with torch.no_grad():
+        return model.eval()(torch.from_numpy(images)).numpy()
+
+
+@pytest.mark.parametrize("batch_size", [1, 5])
+def test_backbone_parity(tmp_path, batch_size):
+    model = backbone()
+    path = export_onnx(model, tmp_path / "model.onnx", input_shape=(1, 20, 20))
+    images = np.random.default_rng(0).standard_normal((batch_size, 1, 20, 20), dtype=np.float32)
+
+    assert model.training
+    onnx_model = OnnxModel(path, intra_op_num_threads=1)
+    np.testing.assert_allclose(onnx_model(images), eager(model, images), rtol=1e-5, atol=1e-5)
+    np.testing.assert_array_equal(onnx_model.predict(images), eager(model, images).argmax(axis=1))
+
+
+def test_classifier_is_exported_through_its_backbone(tmp_path):
+    classifier_module = pytest.importorskip("rgc.models.classifier")
+    model = backbone()
+    path = export_onnx(classifier_module.Classifier(model, num_classes=2), tmp_path / "model.onnx", (1, 20, 20))
+    images = np.ones((2, 1, 20, 20), dtype=np.float32)
+
+    np.testing.assert_allclose(OnnxModel(path)(images), eager(model, images), rtol=1e-5, atol=1e-5)
+
+
+def test_dsteerablelenet_parity(tmp_path):
+    from rgc.models.dstreeablelenet import DSteerableLeNet
+
+    torch.manual_seed(0)
+    model = DSteerableLeNet(imsize=51)
+    path = export_onnx(model, tmp_path / "model.onnx")
+    images = np.random.default_rng(0).standard_normal((3, 1, 51, 51), dtype=np.float32)
+
+    np.testing.assert_allclose(OnnxModel(path)(images), eager(model, images), rtol=1e-4, atol=1e-5)
+
+
+def test_export_without_dynamo_keyword(tmp_path, monkeypatch):
+    export = torch.onnx.export
+
+    # torch.onnx.export before torch 2.5 has no dynamo keyword and only the TorchScript exporter
+    def legacy_export(model, args, f, **kwargs):
+        assert "dynamo" not in kwargs
+        return export(model, args, f, dynamo=False, **kwargs)
+
+    monkeypatch.setattr(torch.onnx, "export", legacy_export)
+    path = export_onnx(backbone(), tmp_path / "model.onnx", input_shape=(1, 20, 20))
+
+    assert OnnxModel(path)(np.zeros((2, 1, 20, 20))).shape == (2, 2)
+
+
+def test_input_shape_required_for_backbones(tmp_path):
+    with pytest.raises(ValueError, match="input shape"):
+        export_onnx(backbone(), tmp_path / "model.onnx")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_threads_are_configured(tmp_path):
+    path = export_onnx(backbone(), tmp_path / "model.onnx", input_shape=(1, 20, 20))
+
+    options = OnnxModel(path, intra_op_num_threads=2, inter_op_num_threads=1).session.get_session_options()
+
+    assert options.intra_op_num_threads == 2
+    assert options.inter_op_num_threads == 1
+
+
+def test_serving_does_not_import_torch(tmp_path):
+    path = export_onnx(backbone(), tmp_path / "model.onnx", input_shape=(1, 20, 20))
+    code = (
+        "import sys\n"
+        "import numpy as np\n"
+        "from rgc.models import OnnxModel\n"
+        f"print(OnnxModel({str(path)!r})(np.zeros((1, 1, 20, 20))).shape)\n"
+        "assert 'torch' not in sys.modules\n"
+    )
+
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout  # noqa: S603
+
+    assert output.strip() == "(1, 2)"
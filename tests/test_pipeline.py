@@ -0,0 +1,222 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+from astropy.io import fits
+from PIL import Image
+
+from rgc.utils.pipeline import (
+    Pipeline,
+    Stage,
+    _PipelineCycleError,
+    _UnknownStageError,
+    _UnsupportedExecutorError,
+    catalog_items,
+    preprocessing_pipeline,
+)
+
+CALLS = []
+
+
+def _source(output, inputs, item, scale):
+    CALLS.append(("source", item["value"]))
+    Path(output).write_text(str(item["value"] * scale))
+
+
+def _double(output, inputs, item):
+    CALLS.append(("double", item["value"]))
+    (source,) = inputs.values()
+    Path(output).write_text(str(2 * int(Path(source).read_text())))
+
+
+def _combine(output, inputs, item):
+    CALLS.append(("combine", item["value"]))
+    total = int(Path(inputs["source"]).read_text()) + int(Path(inputs["double"]).read_text())
+    Path(output).write_text(str(total))
+
+
+def _fail_on_two(output, inputs, item):
+    if item["value"] == 2:
+        raise ValueError("Mocked error")  # noqa: TRY003
+    _double(output, inputs, item)
+
+
+def _fail_early(output, inputs, item):
+    raise ValueError("early")
+
+
+def _fail_late(output, inputs, item):
+    time.sleep(0.2)
+    raise ValueError("late")
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        CALLS.clear()
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def _pipeline(self, scale=1, double=_double):
+        return Pipeline(
+            [
+                Stage("combine", _combine, inputs=("source", "double"), suffix=".txt"),
+                Stage("source", _source, suffix=".txt", fields=("value",), params={"scale": scale}, workers=2),
+                Stage("double", double, inputs=("source",), suffix=".txt", workers=2),
+            ],
+            self.work_dir.name,
+        )
+
+    def test_run_follows_dependencies(self):
+        pipeline = self._pipeline()
+        self.assertEqual(pipeline.order, ["source", "double", "combine"])
+
+        outputs = pipeline.run({"a": {"value": 1}, "b": {"value": 3}})
+
+        self.assertEqual(Path(outputs["a"]["combine"]).read_text(), "3")
+        self.assertEqual(Path(outputs["b"]["combine"]).read_text(), "9")
+        self.assertEqual(len(CALLS), 6)
+        self.assertFalse([name for name in os.listdir(Path(outputs["a"]["source"]).parent) if name.startswith(".")])
+
+    def test_run_skips_unchanged_work(self):
+        first = self._pipeline().run({"a": {"value": 1}})
+        CALLS.clear()
+
+        second = self._pipeline().run({"a": {"value": 1}})
+        self.assertEqual(first, second)
+        self.assertEqual(CALLS, [])
+
+        self._pipeline(scale=2).run({"a": {"value": 1}})
+        self.assertEqual(sorted(CALLS), [("combine", 1), ("double", 1), ("source", 1)])
+
+    def test_run_isolates_failures(self):
+        pipeline = self._pipeline(double=_fail_on_two)
+
+        outputs = pipeline.run({"a": {"value": 1}, "b": {"value": 2}})
+
+        self.assertIn("combine", outputs["a"])
+        self.assertEqual(set(outputs["b"]), {"source"})
+        self.assertEqual(pipeline.failures["b"][0], "double")
+
+    def test_run_keeps_the_first_failure(self):
+        pipeline = Pipeline(
+            [Stage("late", _fail_late), Stage("early", _fail_early)],
+            self.work_dir.name,
+        )
+
+        pipeline.run({"a": {}})
+
+        name, err = pipeline.failures["a"]
+        self.assertEqual(name, "early")
+        self.assertEqual(str(err), "early")
+
+    def test_threads_write_separate_partial_files(self):
+        partials = []
+        barrier = threading.Barrier(2)
+
+        def write(output, inputs, item):
+            partials.append(output)
+            barrier.wait(timeout=5)
+            Path(output).write_text("same")
+
+        # Both objects have the same content address
+        pipeline = Pipeline([Stage("write", write, suffix=".txt", workers=2)], self.work_dir.name)
+        outputs = pipeline.run({"a": {}, "b": {}})
+
+        self.assertEqual(len(set(partials)), 2)
+        self.assertEqual(outputs["a"]["write"], outputs["b"]["write"])
+        self.assertEqual(pipeline.failures, {})
+
+    def test_export(self):
+        pipeline = self._pipeline()
+        outputs = pipeline.run({"a": {"value": 1}})
+
+        out_dir = os.path.join(self.work_dir.name, "final")
+        pipeline.export(outputs, "combine", out_dir)
+
+        self.assertEqual(Path(out_dir, "a.txt").read_text(), "3")
+
+    def test_invalid_graphs(self):
+        with self.assertRaises(_UnknownStageError):
+            Pipeline([Stage("a", _source, inputs=("missing",))], self.work_dir.name)
+
+        with self.assertRaises(_PipelineCycleError):
+            Pipeline([Stage("a", _source, inputs=("b",)), Stage("b", _source, inputs=("a",))], self.work_dir.name)
+
+        with self.assertRaises(_UnsupportedExecutorError):
+            Stage("a", _source, executor="cluster")
+
+
+def test_catalog_items():
+    catalog = pd.DataFrame({
+        "RAJ2000": ["10 00 00.0"],
+        "DEJ2000": ["10 00 00"],
+        "label": ["WAT"],
+        "dilation": [2],
+    })
+
+    items = catalog_items(catalog, {"WAT": 100}, "label")
+
+    (name,) = items
+    assert name == "100_10 00 00.0+10 00 00"
+    assert abs(items[name]["ra"] - 150.0) < 1e-6
+    assert abs(items[name]["dec"] - 10.0) < 1e-6
+    assert items[name]["dilation"] == 2
+
+
+def _capture(survey, ra, dec, filename):
+    data = np.zeros((8, 8), dtype=np.float32)
+    data[2:6, 2:6] = ra
+    fits.PrimaryHDU(data).writeto(filename)
+
+
+def _export_mask(outfile, **kwargs):
+    mask = np.zeros((8, 8), dtype=np.float32)
+    mask[3:5, 3:5] = 1
+    fits.PrimaryHDU(mask).writeto(outfile)
+
+
+@patch("rgc.utils.data.bdsf.process_image", return_value=MagicMock(export_image=MagicMock(side_effect=_export_mask)))
+@patch("rgc.utils.data.celestial_capture", side_effect=_capture)
+def test_preprocessing_pipeline(mock_capture, mock_process_image, tmp_path):
+    catalog = pd.DataFrame({
+        "RAJ2000": ["10 00 00.0", "11 00 00.0"],
+        "DEJ2000": ["10 00 00", "20 00 00"],
+        "label": ["WAT", "NAT"],
+    })
+    items = catalog_items(catalog, {"WAT": 100, "NAT": 101}, "label")
+    pipeline = preprocessing_pipeline(
+        "VLA FIRST (1.4 GHz)", str(tmp_path / "work"), 1400.0, (5.0, 5.0, 5.0), img_size=(8, 8), cpu_workers=1
+    )
+    # The mocks do not reach process workers
+    for stage in pipeline.stages.values():
+        stage.executor = "thread"
+
+    outputs = pipeline.run(items)
+    pipeline.export(outputs, "masked", str(tmp_path / "masked"))
+
+    assert pipeline.failures == {}
+    assert mock_capture.call_count == 2
+    assert mock_capture.call_args_list[0].args[0] == "VLA FIRST (1.4 GHz)"
+    assert mock_process_image.call_args.kwargs["frequency"] == 1400.0
+    assert sorted(os.listdir(tmp_path / "masked")) == sorted(f"{name}.png" for name in items)
+    with Image.open(outputs["100_10 00 00.0+10 00 00"]["masked"]) as masked:
+        masked_array = np.array(masked)
+    assert masked_array.shape == (8, 8)
+    assert masked_array[4, 4] == 255
+    assert not masked_array[2, 2]
+
+    pipeline.run(items)
+    assert mock_capture.call_count == 2
+    assert pipeline.cache_hits == dict.fromkeys(pipeline.order, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
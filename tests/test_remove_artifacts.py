@@ -2,6 +2,7 @@ import os
 import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 from rgc.utils.data import remove_artifacts
 
@@ -38,6 +39,20 @@ class TestRemoveArtifacts(unittest.TestCase):
         self.assertNotIn("file4.png", remaining_files)
         self.assertNotIn("file5.csv", remaining_files)
 
+    @patch("builtins.print")
+    def test_remove_artifacts_dry_run(self, mock_print):
+        os.mkdir(os.path.join(self.test_dir.name, "subdir"))
+
+        removed = remove_artifacts(self.test_dir.name, [".txt", ".jpg"], dry_run=True)
+
+        # Nothing is removed but the artifacts are reported
+        self.assertEqual(sorted(os.listdir(self.test_dir.name)), sorted([*self.test_files, "subdir"]))
+        self.assertEqual(
+            sorted(os.path.basename(path) for path in removed),
+            ["file4.png", "file5.csv"],
+        )
+        self.assertEqual(mock_print.call_count, 3)
+
 
 if __name__ == "__main__":
     unittest.main()
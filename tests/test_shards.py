@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import DataLoader
+
+from rgc.utils.shards import ShardedDataset, list_shards, write_shards
+
+
+class ToTensor:
+    accepts_arrays = True
+
+    def __call__(self, img):
+        return torch.from_numpy(img)
+
+
+@pytest.fixture
+def shards(tmp_path):
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 256, size=(50, 8, 8, 1), dtype=np.uint8)
+    write_shards(zip(images, range(50)), str(tmp_path), shard_size=8)
+    return list_shards(str(tmp_path)), images
+
+
+def targets(dataset, **kwargs):
+    return [int(target) for _, batch in DataLoader(dataset, batch_size=4, **kwargs) for target in batch]
+
+
+def test_write_shards(shards):
+    paths, images = shards
+
+    assert len(paths) == 7
+    assert np.load(paths[-1] + ".images.npy").shape == (2, 8, 8)
+
+    dataset = ShardedDataset(paths, transform=ToTensor())
+    batch, _ = next(iter(DataLoader(dataset, batch_size=3)))
+    np.testing.assert_array_equal(batch.numpy(), images[:3, ..., 0])
+    assert targets(dataset) == list(range(50))
+
+
+def test_shuffle_changes_with_epoch(shards):
+    dataset = ShardedDataset(shards[0], transform=ToTensor(), shuffle=True, buffer_size=5, seed=1)
+
+    first = targets(dataset)
+    assert targets(dataset) == first
+    dataset.set_epoch(1)
+    second = targets(dataset)
+
+    assert sorted(first) == sorted(second) == list(range(50))
+    assert first != second
+
+
+def test_split_between_workers(shards):
+    dataset = ShardedDataset(shards[0], transform=ToTensor(), shuffle=True)
+
+    assert sorted(targets(dataset, num_workers=2)) == list(range(50))
+
+
+def test_split_between_ranks(shards):
+    ranks = [ShardedDataset(shards[0], transform=ToTensor(), shuffle=True, rank=r, world_size=3) for r in range(3)]
+
+    assert {len(dataset.rank_shards()) for dataset in ranks} == {3}
+    seen = [target for dataset in ranks for target in targets(dataset)]
+    assert set(seen) == set(range(50))
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from rgc.utils.data import compute_mean_std, compute_quantiles
+from rgc.utils.stats import QuantileSketch, RunningMeanStd, _SketchMismatchError
+
+
+def test_running_mean_std_matches_numpy():
+    rng = np.random.default_rng(0)
+    data = rng.normal(loc=1e4, scale=0.5, size=(37, 3, 5, 5)).astype(np.float32)
+
+    running = RunningMeanStd()
+    for start in range(0, len(data), 8):
+        running.update(data[start : start + 8])
+
+    values = data.astype(np.float64).transpose(1, 0, 2, 3).reshape(3, -1)
+    assert running.count == values.shape[1]
+    np.testing.assert_allclose(running.mean, values.mean(axis=1), rtol=1e-12)
+    np.testing.assert_allclose(running.std(), values.std(axis=1, ddof=1), rtol=1e-9)
+
+
+def test_running_mean_std_merge():
+    rng = np.random.default_rng(1)
+    data = rng.integers(0, 256, size=(20, 1, 4, 4), dtype=np.uint8)
+
+    whole = RunningMeanStd()
+    whole.update(data)
+
+    first, second = RunningMeanStd(), RunningMeanStd()
+    first.update(data[:7])
+    second.update(data[7:])
+    first.merge(second)
+    first.merge(RunningMeanStd())
+
+    assert first.count == whole.count
+    np.testing.assert_allclose(first.mean, whole.mean)
+    np.testing.assert_allclose(first.std(ddof=0), whole.std(ddof=0))
+
+
+def test_compute_mean_std_matches_full_tensor():
+    generator = torch.Generator().manual_seed(0)
+    data = torch.rand(50, 2, 6, 6, generator=generator)
+    dataloader = DataLoader(TensorDataset(data, torch.zeros(50)), batch_size=7)
+
+    mean, std = compute_mean_std(dataloader)
+
+    assert mean.dtype == torch.float32
+    assert torch.allclose(mean, data.mean(dim=(0, 2, 3)), atol=1e-6)
+    assert torch.allclose(std, data.std(dim=(0, 2, 3)), atol=1e-6)
+
+
+def test_quantile_sketch_relative_accuracy():
+    rng = np.random.default_rng(2)
+    values = np.concatenate([rng.normal(0, 1e-3, 100_000), rng.pareto(1.5, 1_000) * 0.01, [np.nan, np.inf]])
+    quantiles = np.array([0.001, 0.01, 0.5, 0.99, 0.999])
+
+    sketch = QuantileSketch(alpha=0.01)
+    for chunk in np.array_split(values, 13):
+        sketch.update(chunk)
+
+    expected = np.quantile(values[np.isfinite(values)], quantiles, method="lower")
+    assert sketch.total == values.size - 2
+    np.testing.assert_allclose(sketch.quantile(quantiles), expected, rtol=0.02)
+    assert sketch.quantile(0.0) == np.nanmin(values)
+    assert sketch.quantile(1.0) == values[np.isfinite(values)].max()
+
+
+def test_quantile_sketch_merge():
+    rng = np.random.default_rng(3)
+    values = rng.lognormal(size=10_000)
+
+    whole = QuantileSketch()
+    whole.update(values)
+    first, second = QuantileSketch(), QuantileSketch()
+    first.update(values[:3_000])
+    second.update(values[3_000:])
+    first.merge(second)
+
+    np.testing.assert_array_equal(first.quantile([0.1, 0.5, 0.9]), whole.quantile([0.1, 0.5, 0.9]))
+    assert np.isnan(QuantileSketch().quantile(0.5))
+    with pytest.raises(_SketchMismatchError):
+        first.merge(QuantileSketch(alpha=0.05))
+
+
+def test_compute_quantiles():
+    data = torch.arange(2 * 2 * 10 * 10, dtype=torch.float32).reshape(2, 2, 10, 10)
+    dataloader = DataLoader(TensorDataset(data, torch.zeros(2)), batch_size=1)
+
+    quantiles = compute_quantiles(dataloader, quantiles=(0.0, 0.5, 1.0))
+
+    assert quantiles.shape == (2, 3)
+    assert quantiles[0, 0] == 0 and quantiles[1, 2] == 399
+    assert quantiles[0, 1] == pytest.approx(data[:, 0].median(), rel=0.02)
@@ -0,0 +1,88 @@
+import albumentations
+import cv2
+import numpy as np
+import torch
+from albumentations.pytorch import ToTensorV2
+from torch.utils.data import DataLoader
+
+from rgc.utils.datasets import Bent, Transforms
+from rgc.utils.transform_cache import LRUDataset, MaterializedDataset, cache_transform_outputs
+
+
+class CountingTransform:
+    accepts_arrays = True
+    deterministic = True
+
+    def __init__(self):
+        self.calls = torch.zeros(1, dtype=torch.long).share_memory_()
+
+    def __call__(self, img):
+        self.calls += 1
+        return torch.from_numpy(img.astype(np.float32) / 255)
+
+
+def test_transforms_deterministic():
+    evaluation = albumentations.Compose([
+        albumentations.PadIfNeeded(min_height=151, min_width=151, border_mode=cv2.BORDER_CONSTANT, fill=0),
+        albumentations.CenterCrop(height=151, width=151),
+        albumentations.Normalize(mean=(0.0032), std=(0.0376)),
+        ToTensorV2(),
+    ])
+    augmentation = albumentations.Compose([albumentations.Affine(rotate=(-360, 360)), ToTensorV2()])
+
+    assert Transforms(evaluation).deterministic
+    assert not Transforms(augmentation).deterministic
+    assert not Transforms(albumentations.Compose([albumentations.CenterCrop(height=4, width=4, p=0.5)])).deterministic
+
+
+def test_materialized_dataset_computes_samples_once(bent_root):
+    transform = CountingTransform()
+    dataset = Bent(bent_root, train=False, transform=transform)
+    cached = cache_transform_outputs(dataset)
+
+    assert isinstance(cached, MaterializedDataset)
+    for num_workers in (2, 0):
+        loader = DataLoader(cached, batch_size=3, num_workers=num_workers)
+        images = torch.cat([images for images, _ in loader])
+
+    assert cached.complete
+    assert transform.calls.item() == len(dataset)
+    torch.testing.assert_close(images, torch.stack([dataset[i][0] for i in range(len(dataset))]))
+    assert cached[1][1] == dataset.target[1]
+    assert cached.data is dataset.data
+
+
+def test_materialized_dataset_caches_only_given_indices(bent_root):
+    transform = CountingTransform()
+    dataset = Bent(bent_root, train=False, transform=transform)
+    cached = cache_transform_outputs(dataset, indices=[3, 1, 3])
+
+    assert cached.images.shape[0] == 2
+    images = torch.stack([image for image, _ in cached.__getitems__([1, 3])])
+    torch.testing.assert_close(images, torch.stack([dataset[1][0], dataset[3][0]]))
+    assert cached.complete
+
+    calls = transform.calls.item()
+    cached.__getitems__([1, 3])
+    assert transform.calls.item() == calls
+    # Samples outside the indices are computed on every access
+    torch.testing.assert_close(cached[0][0], dataset[0][0])
+    assert transform.calls.item() == calls + 2
+
+
+def test_lru_dataset_caches_decoded_images(bent_root):
+    flip = albumentations.Compose([albumentations.HorizontalFlip(p=0.5), ToTensorV2()])
+    dataset = Bent(bent_root, train=False, transform=Transforms(flip))
+    cached = cache_transform_outputs(dataset, lru_size=2)
+
+    assert isinstance(cached, LRUDataset)
+    for index in (0, 1, 0, 2):
+        image, target = cached[index]
+        image = image.numpy()[0]
+        assert np.array_equal(image, dataset.data[index, ..., 0]) or np.array_equal(
+            image[:, ::-1], dataset.data[index, ..., 0]
+        )
+        assert target == dataset.target[index]
+
+    assert list(cached._cache) == [0, 2]
+    assert dataset.transform is cached.transform